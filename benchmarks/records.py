@@ -0,0 +1,154 @@
+"""
+Memory, build and serialisation time of scraped results kept as dicts of strings, as the parser built them before
+solutions.records, versus record classes.
+
+    python -m benchmarks.records [containers]
+"""
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from solutions import utils
+from solutions.records import Activity, ContainerResult, ContainerSummary, DetentionAndDemurrage, Routing
+
+ACTIVITIES = 12
+
+
+def _cells(i):
+    number = f"OOLU{i:07d}"
+    summary = [number, "40' GP", '1,234 Package(s)', '22,000.50 KGS', '24,100.00 KGS', 'Discharged from Vessel',
+               'Rotterdam, Zuid-Holland, Netherlands', '18 Oct 2024, 14:35 CST', 'Rotterdam']
+    routing = ['Shanghai', 'Shanghai CY', 'Shanghai CY', 'Shanghai', 'OOCL EUROPE 123W', 'Rotterdam',
+               'Rotterdam', 'Rotterdam', 'Rotterdam CY', 'Merchant']
+    detention = [number, '01 Oct 2024, 08:00', '05 Oct 2024', '7 Day(s)', '25 Oct 2024', '5 Day(s)',
+                 '23 Oct 2024', '3 Day(s)', '21 Oct 2024', '2 Day(s)', '20 Oct 2024']
+    # Event times vary per container, about 8000 distinct values over the run
+    activities = [['Gate In', 'Shanghai Terminal', 'Shanghai', 'Truck',
+                   f'{1 + (i + j) % 28:02d} Oct 2024, {i % 24:02d}:{j:02d} CST', ''] for j in range(ACTIVITIES)]
+    return summary, routing, detention, activities
+
+
+def build_dicts(cells):
+    """ Output document as the parser built it before the record classes """
+    summary, routing, detention, activities = cells
+    return {
+        'containers': {
+            'container_number': summary[0],
+            'container_size_type': summary[1],
+            'quantity': summary[2],
+            'gross_weight': summary[3],
+            'verified_gross_mass': summary[4],
+            'latest_event': {
+                'event': summary[5],
+                'location': summary[6],
+                'time': summary[7],
+            },
+            'final_destination': summary[8],
+        },
+        'routing': dict(zip(Routing.__slots__, routing)),
+        'detention_and_demurrage': {
+            'container_number': detention[0],
+            'at_origin': {
+                'earliest_empty_pickup_date': detention[1],
+                'detention_last_free_date': detention[2],
+            },
+            'at_destination': {
+                'combined_dem/det_(2in1)_last_free_date': {
+                    'free_time': detention[3],
+                    'last_free_date': detention[4],
+                },
+                'inbound_demurrage': {
+                    'free_time': detention[5],
+                    'last_free_date': detention[6],
+                },
+                'inbound_detention': {
+                    'free_time': detention[7],
+                    'last_free_date': detention[8],
+                },
+                'quay_rent': {
+                    'free_time': detention[9],
+                    'last_free_date': detention[10],
+                }
+            }
+        },
+        'equipment_activities': [dict(zip(Activity.__slots__, activity)) for activity in activities],
+    }
+
+
+def build_records(cells):
+    summary, routing, detention, activities = cells
+    return ContainerResult(
+        containers=ContainerSummary.from_cells(summary),
+        routing=Routing.from_cells(routing),
+        detention_and_demurrage=DetentionAndDemurrage.from_cells(detention),
+        equipment_activities=[Activity.from_cells(activity) for activity in activities],
+    )
+
+
+def _timed(function, results):
+    gc.collect()
+    start = time.perf_counter()
+    for result in results:
+        function(result)
+    return time.perf_counter() - start
+
+
+def measure(build, all_cells):
+    # Timed without tracemalloc, which slows allocations down several times. The parse_datetime cache is cleared
+    # first so neither variant finds the dates of the other one parsed already.
+    utils._parse_datetime_text.cache_clear()
+    gc.collect()
+    start = time.perf_counter()
+    results = [build(cells) for cells in all_cells]
+    seconds = time.perf_counter() - start
+    del results
+    gc.collect()
+    utils._parse_datetime_text.cache_clear()
+    tracemalloc.start()
+    results = [build(cells) for cells in all_cells]
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return results, retained, seconds
+
+
+def serialise(results):
+    """
+    Seconds to turn the results into output documents, NDJSON lines and Parquet rows, as Spider.write_output does
+    :return: dict of step -> seconds, the Parquet export is left out without pyarrow
+    """
+    timings = {}
+    if isinstance(results[0], ContainerResult):
+        timings['to_dict'] = _timed(ContainerResult.to_dict, results)
+        # to_json includes the to_dict
+        timings['ndjson'] = _timed(ContainerResult.to_json, results)
+    else:
+        timings['ndjson'] = _timed(lambda data: json.dumps(data, ensure_ascii=False, separators=(',', ':')), results)
+    try:
+        from solutions.export import ParquetExporter
+        with tempfile.TemporaryDirectory() as directory, ParquetExporter(directory) as exporter:
+            scraped_at = datetime.now()
+            timings['parquet'] = _timed(lambda data: exporter.write(data, scraped_at), results)
+    except ImportError:
+        pass
+    return timings
+
+
+def main():
+    containers = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    all_cells = [_cells(i) for i in range(containers)]
+    for name, build in (('dicts of strings', build_dicts), ('records', build_records)):
+        # The cells themselves are shared by both and not counted
+        results, retained, seconds = measure(build, all_cells)
+        print(f"{name:>16}: {retained / 1024 ** 2:6.1f} MB retained, {seconds:.2f} s build "
+              f"({seconds / containers * 1e6:.0f} us per container)")
+        timings = serialise(results)
+        print(f"{'':>16}  " + ', '.join(f"{step} {seconds:.2f} s" for step, seconds in timings.items()))
+        del results
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,16 @@
 import datetime
+import json
 import logging
 import os
 
 from solutions import Scraper
+from solutions.logs import setup_logging
+from solutions.support.driver import CommandAccounting, ProxyPool
+from solutions.support.model import RemoteModel
 
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
 logfile = f"logs/oocl_scraping_{datetime.datetime.now().strftime('%Y%m%d%H%M')}.log"
-os.makedirs(os.path.dirname(logfile), exist_ok=True)
-
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_format = logging.Formatter('[%(asctime)s] %(message)s', datefmt='%H:%M:%S')
-console_handler.setFormatter(console_format)
-
-file_handler = logging.FileHandler(logfile, mode='w', encoding='utf-8')
-file_handler.setLevel(logging.DEBUG)
-file_format = logging.Formatter('[%(asctime)s] %(levelname)s:%(name)s:%(funcName)s:%(lineno)d %(message)s',
-                                datefmt='%Y-%m-%d %H:%M:%S')
-file_handler.setFormatter(file_format)
-
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+setup_logging(logfile)
 
 logging.getLogger('uc').setLevel(logging.WARNING)
 logging.getLogger('undetected_chromedriver').setLevel(logging.WARNING)
@@ -31,16 +20,28 @@ logging.getLogger('solutions.support.driver.driver').setLevel(logging.WARNING)
 MAXIMUM_RETRIES = 3
 INPUT_FILENAME = "./ToScrape/oocl.json"
 OUTPUT_FILENAME = "./Outputs/oocl.json"
+HEADLESS = os.environ.get('OOCL_HEADLESS') == '1'
+# Solve captchas over the browser's DevTools websocket instead of chromedriver (needs websocket-client)
+DEVTOOLS = os.environ.get('OOCL_DEVTOOLS') == '1'
+# Socket of a shared inference server (python -m solutions.support.model.server), default a local model
+INFERENCE_ADDRESS = os.environ.get('OOCL_INFERENCE')
+# WebDriver round trips allowed per container, e.g. {"total": 150}; exceeding it fails the run (test mode)
+COMMAND_BUDGET = os.environ.get('OOCL_COMMAND_BUDGET')
+# File with one proxy per line; the browser restarts on another proxy when its proxy is evicted or cooling down
+PROXIES = os.environ.get('OOCL_PROXIES')
 
 
 def main():
     attempt = 0
+    pool = ProxyPool.from_file(PROXIES) if PROXIES else None
     while attempt < MAXIMUM_RETRIES:
         try:
             logger.info("Starting attempt %d", attempt + 1)
-            scraper = Scraper("uc", start=True)
+            scraper = Scraper("uc", proxy=pool, headless2=HEADLESS, devtools=DEVTOOLS, start=True)
             try:
-                scraper(INPUT_FILENAME, OUTPUT_FILENAME)
+                model = RemoteModel(INFERENCE_ADDRESS) if INFERENCE_ADDRESS else None
+                accounting = CommandAccounting(json.loads(COMMAND_BUDGET), strict=True) if COMMAND_BUDGET else None
+                scraper(INPUT_FILENAME, OUTPUT_FILENAME, model=model, accounting=accounting)
             except Exception as e:
                 logger.error("Error occurred during scraper execution on attempt %d: %s", attempt + 1, e)
             else:
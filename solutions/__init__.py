@@ -1,3 +1,9 @@
-from .scraper import Scraper
+__all__ = ['Scraper', ]
 
-__all__ = ['Scraper', ]
\ No newline at end of file
+
+def __getattr__(name):
+    # Scraper pulls in selenium, bs4, PIL and onnxruntime, so it is only imported when used
+    if name == 'Scraper':
+        from .scraper import Scraper
+        return Scraper
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from solutions.parser import parse_document
+
+logger = logging.getLogger(__name__)
+
+
+class PageArchive:
+    """
+    Archive of raw results pages, so pages can be parsed after the browser moved on and re-parsed offline
+    after a parser fix instead of re-scraping.
+
+    Layout of the archive directory:
+        pages/<sha256[:2]>/<sha256>.html.zst    zstd compressed page HTML, named after the hash of the HTML
+        index.sqlite                            captures: container number, capture time and page hash
+
+    Identical pages (e.g. a container re-scraped without changes) are stored once. Requires `zstandard`.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS captures (
+        id INTEGER PRIMARY KEY,
+        container_number TEXT NOT NULL,
+        captured REAL NOT NULL,
+        page_hash TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS captures_container ON captures (container_number, captured);
+    """
+
+    def __init__(self, directory, level=10):
+        """
+        :param directory: archive directory
+        :param level: zstd compression level
+        """
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstandard is required for the page archive: pip install zstandard")
+        self.directory = Path(directory).resolve()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.connection = sqlite3.connect(self.directory / 'index.sqlite', timeout=60)
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def _path(self, page_hash):
+        return self.directory / 'pages' / page_hash[:2] / f'{page_hash}.html.zst'
+
+    def add(self, container_number, html):
+        """
+        Store the results page of a container
+        :return: hash of the page
+        """
+        content = html.encode('utf-8')
+        page_hash = hashlib.sha256(content).hexdigest()
+        path = self._path(page_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.compressor.compress(content))
+            os.replace(tmp_path, path)
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO captures (container_number, captured, page_hash) VALUES (?, ?, ?)",
+                (container_number, time.time(), page_hash)
+            )
+        return page_hash
+
+    def read(self, page_hash):
+        """ HTML of an archived page """
+        return self.decompressor.decompress(self._path(page_hash).read_bytes()).decode('utf-8')
+
+    def captures(self, since=0.0, latest=True):
+        """
+        Captures to parse
+        :param since: only captures taken from this unix time on
+        :param latest: only the latest capture of every container
+        :return: list of (container_number, captured, page_hash)
+        """
+        if latest:
+            sql = ("SELECT container_number, MAX(captured), page_hash FROM captures WHERE captured >= ? "
+                   "GROUP BY container_number ORDER BY container_number")
+        else:
+            sql = "SELECT container_number, captured, page_hash FROM captures WHERE captured >= ? ORDER BY id"
+        return self.connection.execute(sql, (since,)).fetchall()
+
+
+_worker_archives = {}
+
+
+def _parse_archived(args):
+    directory, page_hash = args
+    archive = _worker_archives.get(directory)
+    if archive is None:
+        archive = _worker_archives[directory] = PageArchive(directory)
+    return parse_document(archive.read(page_hash))
+
+
+def reparse(archive, output_filename, processes=None, since=0.0, latest=True):
+    """
+    Parse archived pages again in a process pool, e.g. after a parser fix, and write the documents as NDJSON
+    :return: number of pages parsed, number of pages that failed
+    """
+    rows = archive.captures(since, latest)
+    parsed = failed = 0
+    with ProcessPoolExecutor(processes) as pool, open(output_filename, 'w', encoding='utf-8') as f:
+        futures = [(row, pool.submit(_parse_archived, (str(archive.directory), row[2]))) for row in rows]
+        for (container_number, captured, page_hash), future in futures:
+            try:
+                data = future.result()
+            except Exception as e:
+                logger.error(f"Failed to parse page {page_hash} of {container_number}: {e}")
+                failed += 1
+                continue
+            f.write(data.to_json() + '\n')
+            parsed += 1
+    logger.info(f"Re-parsed {parsed} pages into {output_filename}, {failed} failed")
+    return parsed, failed
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    logging.getLogger('solutions.parser').setLevel(logging.WARNING)
+    reparse(PageArchive(sys.argv[1]), sys.argv[2])
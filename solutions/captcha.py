@@ -0,0 +1,102 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LinearSearch:
+    """ Fixed step search of the captcha slider offset: 50px, then 7px at a time """
+
+    def __init__(self, start=50, step=7, max_moves=35):
+        self.start = start
+        self.step = step
+        self.max_moves = max_moves
+        self.offset = 0
+        self.moves = 0
+        self.trace = []
+
+    def first_move(self):
+        self.offset = self.start
+        return self.start
+
+    def next_move(self, confidence):
+        """ Offset to slide by next, None when the search is exhausted """
+        self.trace.append((self.offset, confidence))
+        if self.moves >= self.max_moves:
+            return None
+        self.moves += 1
+        self.offset += self.step
+        return self.step
+
+
+class SlideSearch(LinearSearch):
+    """
+    Coarse to fine search of the captcha slider offset driven by the model confidence (probability that
+    the piece is in place). Steps are large while the confidence is low and shrink as it rises. When the
+    confidence drops clearly below its peak the piece went past the target, so the direction is reversed
+    and the step halved.
+    """
+    STEPS = ((0.2, 21), (0.5, 10), (0.8, 5), (float('inf'), 3))
+
+    def __init__(self, start=50, steps=STEPS, min_step=2, max_moves=35, max_offset=300, overshoot_margin=0.15):
+        """
+        :param start: first offset in pixels
+        :param steps: tuple of (confidence upper bound, step in pixels), ordered by confidence
+        :param min_step: smallest step after repeated overshoots
+        :param max_moves: maximum number of moves after the first one
+        :param max_offset: maximum offset of the slider
+        :param overshoot_margin: confidence drop below the peak considered an overshoot
+        """
+        super().__init__(start=start, max_moves=max_moves)
+        self.steps = steps
+        self.min_step = min_step
+        self.max_offset = max_offset
+        self.overshoot_margin = overshoot_margin
+        self.direction = 1
+        self.step_cap = None
+        self.peak = 0.0
+
+    def next_move(self, confidence):
+        """ Offset to slide by next, None when the search is exhausted """
+        self.trace.append((self.offset, confidence))
+        if self.moves >= self.max_moves:
+            return None
+
+        step = next(step for limit, step in self.steps if confidence < limit)
+        if self.peak - confidence > self.overshoot_margin:
+            self.direction = -self.direction
+            self.step_cap = max((self.step_cap or step) // 2, self.min_step)
+            self.peak = confidence
+            logger.debug(f"Captcha overshoot at offset {self.offset}, reversing with step {self.step_cap}")
+        else:
+            self.peak = max(self.peak, confidence)
+        if self.step_cap is not None:
+            step = min(step, self.step_cap)
+
+        target = min(max(self.offset + self.direction * step, 0), self.max_offset)
+        if target == self.offset:
+            # Reached the end of the slider without finding the piece, sweep back with a finer step
+            self.direction = -self.direction
+            step = self.step_cap = max(step // 2, self.min_step)
+            target = min(max(self.offset + self.direction * step, 0), self.max_offset)
+        move = target - self.offset
+        self.offset = target
+        self.moves += 1
+        return move
+
+
+def replay(search, confidence_at, is_solved):
+    """
+    Run a search offline against a recorded captcha
+    :param search: LinearSearch or SlideSearch
+    :param confidence_at: function of slider offset -> model confidence
+    :param is_solved: function of slider offset -> whether the captcha counts as solved
+    :return: solved, number of model round trips
+    """
+    search.first_move()
+    round_trips = 0
+    while True:
+        round_trips += 1
+        if is_solved(search.offset):
+            return True, round_trips
+        if search.next_move(confidence_at(search.offset)) is None:
+            return False, round_trips
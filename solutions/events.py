@@ -0,0 +1,118 @@
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+from solutions.utils import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class EventStore:
+    """
+    SQLite store of equipment activities keyed by (container_number, event, time, location).
+    Repeated activities are ignored, so every scrape only adds the activities that are new.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS activities (
+        container_number TEXT NOT NULL,
+        event TEXT NOT NULL,
+        time TEXT NOT NULL,
+        location TEXT NOT NULL,
+        facility TEXT,
+        mode TEXT,
+        remarks TEXT,
+        timestamp REAL,
+        first_seen REAL NOT NULL,
+        PRIMARY KEY (container_number, event, time, location)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS activities_container_timestamp ON activities (container_number, timestamp);
+    CREATE INDEX IF NOT EXISTS activities_event_timestamp ON activities (event, timestamp);
+    """
+    COLUMNS = ('event', 'time', 'location', 'facility', 'mode', 'remarks')
+
+    def __init__(self, filename):
+        self.filename = Path(filename).resolve()
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.filename)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(self.SCHEMA)
+        logger.info(f"Event store opened at {self.filename}")
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, container_number, activities):
+        """
+        Insert equipment activities of a container, skipping the ones already stored
+        :param container_number: container number
+        :param activities: Activity records of Scraper.scrape_equipment_activities_table
+        :return: list of activities that were not stored before
+        """
+        new = []
+        now = time.time()
+        with self.connection:
+            for activity in activities:
+                values = activity.to_dict()
+                timestamp = parse_datetime(activity.time)
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO activities "
+                    "(container_number, event, time, location, facility, mode, remarks, timestamp, first_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (container_number, *(values[c] or '' for c in self.COLUMNS),
+                     timestamp.timestamp() if timestamp else None, now)
+                )
+                if cursor.rowcount:
+                    new.append(activity)
+        logger.info(f"Stored {len(new)} new of {len(activities)} activities for container {container_number}")
+        return new
+
+    def known(self, container_numbers):
+        """ Subset of the given container numbers that have stored activities """
+        known = set()
+        container_numbers = list(container_numbers)
+        for i in range(0, len(container_numbers), 500):
+            chunk = container_numbers[i:i + 500]
+            rows = self.connection.execute(
+                f"SELECT DISTINCT container_number FROM activities "
+                f"WHERE container_number IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            known.update(row['container_number'] for row in rows)
+        return known
+
+    def latest_event(self, container_number):
+        """ Latest stored activity of a container or None """
+        row = self.connection.execute(
+            "SELECT * FROM activities WHERE container_number = ? ORDER BY timestamp DESC LIMIT 1",
+            (container_number,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def latest_events(self):
+        """ Latest stored activity per container as dict of container_number -> activity """
+        rows = self.connection.execute(
+            "SELECT *, MAX(timestamp) FROM activities GROUP BY container_number"
+        ).fetchall()
+        return {row['container_number']: {k: row[k] for k in row.keys() if k != 'MAX(timestamp)'} for row in rows}
+
+    def containers_with_event(self, event, since=None):
+        """
+        Containers that had the given event
+        :param event: event name as shown on the website, e.g. "Vessel Departed"
+        :param since: datetime or date string, only consider activities at or after it
+        :return: sorted list of container numbers
+        """
+        since = parse_datetime(since)
+        if since is None:
+            rows = self.connection.execute(
+                "SELECT DISTINCT container_number FROM activities WHERE event = ? ORDER BY container_number",
+                (event,)
+            ).fetchall()
+        else:
+            rows = self.connection.execute(
+                "SELECT DISTINCT container_number FROM activities WHERE event = ? AND timestamp >= ? "
+                "ORDER BY container_number",
+                (event, since.timestamp())
+            ).fetchall()
+        return [row['container_number'] for row in rows]
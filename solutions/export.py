@@ -0,0 +1,260 @@
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from solutions.utils import parse_datetime, parse_number
+
+logger = logging.getLogger(__name__)
+
+CHARGE_COLUMNS = {
+    'combined_dem/det_(2in1)_last_free_date': 'combined',
+    'inbound_demurrage': 'inbound_demurrage',
+    'inbound_detention': 'inbound_detention',
+    'quay_rent': 'quay_rent',
+}
+ROUTING_COLUMNS = ('origin', 'empty_pickup_location', 'full_return_location', 'port_of_load', 'vessel_voyage',
+                   'port_of_discharge', 'final_destination_hub', 'destination', 'empty_return_location', 'haulage')
+
+
+def _schemas():
+    import pyarrow as pa
+
+    ts = pa.timestamp('s')
+    key = [('scraped_at', ts), ('container_number', pa.string())]
+    dnd = [
+        ('earliest_empty_pickup_date', ts),
+        ('detention_last_free_date', ts),
+    ]
+    for column in CHARGE_COLUMNS.values():
+        dnd += [(f'{column}_free_time', pa.int32()), (f'{column}_last_free_date', ts)]
+    return {
+        'containers': pa.schema(key + [
+            ('container_size_type', pa.string()),
+            ('quantity', pa.int32()),
+            ('gross_weight', pa.float64()),
+            ('verified_gross_mass', pa.float64()),
+            ('latest_event', pa.string()),
+            ('latest_event_location', pa.string()),
+            ('latest_event_time', ts),
+            ('final_destination', pa.string()),
+        ]),
+        'routing': pa.schema(key + [(column, pa.string()) for column in ROUTING_COLUMNS]),
+        'detention_and_demurrage': pa.schema(key + dnd),
+        'equipment_activities': pa.schema(key + [
+            ('sequence', pa.int32()),
+            ('event', pa.string()),
+            ('facility', pa.string()),
+            ('location', pa.string()),
+            ('mode', pa.string()),
+            ('time', ts),
+            ('remarks', pa.string()),
+        ]),
+    }
+
+
+def flatten(data, scraped_at):
+    """
+    Flatten one output document, as read back from a JSON output file, into typed rows
+    :param data: dict with containers, routing, detention_and_demurrage and equipment_activities
+    :param scraped_at: datetime of the scrape
+    :return: dict of table name -> list of rows
+    """
+    containers = data['containers']
+    key = {'scraped_at': scraped_at, 'container_number': containers['container_number']}
+    latest_event = containers.get('latest_event', {})
+
+    dnd = data.get('detention_and_demurrage', {})
+    at_origin = dnd.get('at_origin', {})
+    at_destination = dnd.get('at_destination', {})
+    dnd_row = {
+        **key,
+        'earliest_empty_pickup_date': parse_datetime(at_origin.get('earliest_empty_pickup_date')),
+        'detention_last_free_date': parse_datetime(at_origin.get('detention_last_free_date')),
+    }
+    for charge, column in CHARGE_COLUMNS.items():
+        values = at_destination.get(charge, {})
+        dnd_row[f'{column}_free_time'] = parse_number(values.get('free_time'), int)
+        dnd_row[f'{column}_last_free_date'] = parse_datetime(values.get('last_free_date'))
+
+    return {
+        'containers': [{
+            **key,
+            'container_size_type': containers.get('container_size_type'),
+            'quantity': parse_number(containers.get('quantity'), int),
+            'gross_weight': parse_number(containers.get('gross_weight')),
+            'verified_gross_mass': parse_number(containers.get('verified_gross_mass')),
+            'latest_event': latest_event.get('event'),
+            'latest_event_location': latest_event.get('location'),
+            'latest_event_time': parse_datetime(latest_event.get('time')),
+            'final_destination': containers.get('final_destination'),
+        }],
+        'routing': [{**key, **{column: data.get('routing', {}).get(column) for column in ROUTING_COLUMNS}}],
+        'detention_and_demurrage': [dnd_row],
+        'equipment_activities': [
+            {
+                **key,
+                'sequence': i,
+                'event': activity.get('event'),
+                'facility': activity.get('facility'),
+                'location': activity.get('location'),
+                'mode': activity.get('mode'),
+                'time': parse_datetime(activity.get('time')),
+                'remarks': activity.get('remarks'),
+            }
+            for i, activity in enumerate(data.get('equipment_activities', []))
+        ],
+    }
+
+
+def flatten_result(result, scraped_at):
+    """
+    Flatten a ContainerResult of parser.parse_document (see Scraper.capture) into typed rows, the same as flatten
+    does for its output document
+    :param result: ContainerResult
+    :param scraped_at: datetime of the scrape
+    :return: dict of table name -> list of rows
+    """
+    containers = result.containers
+    key = {'scraped_at': scraped_at, 'container_number': containers.container_number}
+    latest_event = containers.latest_event
+
+    dnd = result.detention_and_demurrage
+    dnd_row = {
+        **key,
+        'earliest_empty_pickup_date': parse_datetime(dnd.earliest_empty_pickup_date),
+        'detention_last_free_date': parse_datetime(dnd.detention_last_free_date),
+    }
+    for column in CHARGE_COLUMNS.values():
+        values = getattr(dnd, column)
+        dnd_row[f'{column}_free_time'] = parse_number(values.free_time, int)
+        dnd_row[f'{column}_last_free_date'] = parse_datetime(values.last_free_date)
+
+    return {
+        'containers': [{
+            **key,
+            'container_size_type': containers.container_size_type,
+            'quantity': parse_number(containers.quantity, int),
+            'gross_weight': parse_number(containers.gross_weight),
+            'verified_gross_mass': parse_number(containers.verified_gross_mass),
+            'latest_event': latest_event.event,
+            'latest_event_location': latest_event.location,
+            'latest_event_time': parse_datetime(latest_event.time),
+            'final_destination': containers.final_destination,
+        }],
+        'routing': [{**key, **{column: getattr(result.routing, column) for column in ROUTING_COLUMNS}}],
+        'detention_and_demurrage': [dnd_row],
+        'equipment_activities': [
+            {
+                **key,
+                'sequence': i,
+                'event': activity.event,
+                'facility': activity.facility,
+                'location': activity.location,
+                'mode': activity.mode,
+                'time': parse_datetime(activity.time),
+                'remarks': activity.remarks,
+            }
+            for i, activity in enumerate(result.equipment_activities)
+        ],
+    }
+
+
+class ParquetExporter:
+    """
+    Streaming export of scraped documents into typed Parquet tables.
+
+    Files are written to `<output_dir>/<table>/scrape_date=<YYYY-MM-DD>/part-<timestamp>.parquet`.
+    Rows are buffered per table and flushed as a row group every `row_group_size` rows, so memory stays
+    bounded regardless of the number of containers. Requires `pyarrow`.
+    """
+
+    def __init__(self, output_dir, row_group_size=10000, compression='zstd'):
+        """
+        :param output_dir: root directory of the partitioned tables
+        :param row_group_size: number of rows per row group
+        :param compression: parquet compression codec
+        """
+        try:
+            import pyarrow  # noqa
+        except ImportError:
+            raise ImportError("pyarrow is required for the Parquet export: pip install pyarrow")
+
+        self.output_dir = Path(output_dir).resolve()
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.schemas = _schemas()
+        self._rows = {table: [] for table in self.schemas}
+        self._writers = {}
+        self._scrape_date = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data, scraped_at=None):
+        """
+        Add one output document
+        :param data: ContainerResult of parser.parse_document (see Scraper.capture), or its dict as read back
+            from a JSON output file
+        """
+        scraped_at = (scraped_at or datetime.now()).replace(microsecond=0)
+        if self._scrape_date is not None and scraped_at.date() != self._scrape_date:
+            self.close()
+        self._scrape_date = scraped_at.date()
+
+        rows_by_table = flatten(data, scraped_at) if isinstance(data, dict) else flatten_result(data, scraped_at)
+        for table, rows in rows_by_table.items():
+            self._rows[table].extend(rows)
+            if len(self._rows[table]) >= self.row_group_size:
+                self._flush(table)
+
+    def _writer(self, table):
+        import pyarrow.parquet as pq
+
+        writer = self._writers.get(table)
+        if writer is None:
+            directory = self.output_dir / table / f'scrape_date={self._scrape_date.isoformat()}'
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'part-{datetime.now():%H%M%S%f}.parquet'
+            logger.info(f"Writing {table} to {path}")
+            writer = self._writers[table] = pq.ParquetWriter(path, self.schemas[table], compression=self.compression)
+        return writer
+
+    def _flush(self, table):
+        import pyarrow as pa
+
+        rows = self._rows[table]
+        if not rows:
+            return
+        self._writer(table).write_table(pa.Table.from_pylist(rows, schema=self.schemas[table]))
+        logger.debug(f"Flushed {len(rows)} rows to {table}")
+        self._rows[table] = []
+
+    def close(self):
+        """ Flush buffered rows and close all open files """
+        for table in self._rows:
+            self._flush(table)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+
+def export_json(input_filename, output_dir, scraped_at=None, **kwargs):
+    """
+    Convert an existing JSON output file (./Outputs/oocl.json) into Parquet tables
+    :param input_filename: JSON array of scraped documents
+    :param output_dir: root directory of the partitioned tables
+    :param scraped_at: datetime used for partitioning, default the modification time of the input file
+    :param kwargs: passed to ParquetExporter
+    """
+    input_filename = Path(input_filename)
+    scraped_at = scraped_at or datetime.fromtimestamp(input_filename.stat().st_mtime)
+    with open(input_filename, 'r', encoding='utf-8') as f:
+        documents = json.load(f)
+    with ParquetExporter(output_dir, **kwargs) as exporter:
+        for data in documents:
+            exporter.write(data, scraped_at)
+    logger.info(f"Exported {len(documents)} documents from {input_filename} to {output_dir}")
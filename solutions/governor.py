@@ -0,0 +1,195 @@
+import logging
+import socket
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from solutions.support.driver.clock import get_clock
+
+logger = logging.getLogger(__name__)
+
+
+class RateGovernor:
+    """
+    Request rate governor shared by all workers of a host or cluster through a SQLite file.
+
+    Every search takes a token from a global bucket (and from a per proxy bucket if a proxy is given) and
+    holds one of `concurrency` search slots. Both the rate and the concurrency adapt with AIMD: they grow
+    additively while searches succeed and are cut multiplicatively when a captcha fails validation or a
+    search is blocked. Solved captchas count as a warning sign: the rate is held while the captcha share of
+    recent searches is above `captcha_ratio`.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS buckets (
+        name TEXT PRIMARY KEY,
+        rate REAL NOT NULL,
+        tokens REAL NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS state (
+        name TEXT PRIMARY KEY,
+        value REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS slots (
+        holder TEXT PRIMARY KEY,
+        expires REAL NOT NULL
+    );
+    """
+    GLOBAL = 'global'
+
+    def __init__(self, filename, rate=6.0, min_rate=1.0, max_rate=60.0, per_proxy_rate=None, burst=2.0,
+                 concurrency=2, max_concurrency=16, increase=0.5, decrease=0.5, captcha_ratio=0.5,
+                 slot_timeout=600):
+        """
+        :param filename: SQLite file shared by all workers
+        :param rate: initial searches per minute
+        :param min_rate: lower bound of the searches per minute
+        :param max_rate: upper bound of the searches per minute
+        :param per_proxy_rate: searches per minute allowed through a single proxy, default None means unlimited
+        :param burst: maximum number of tokens that can be saved up
+        :param concurrency: initial number of simultaneous searches
+        :param max_concurrency: upper bound of simultaneous searches
+        :param increase: searches per minute added after every successful search
+        :param decrease: factor applied to the rate and concurrency after a failed search
+        :param captcha_ratio: captcha share of recent searches above which the rate is not increased
+        :param slot_timeout: seconds after which a slot of a crashed worker is freed
+        """
+        self.filename = Path(filename).resolve()
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.per_proxy_rate = per_proxy_rate
+        self.burst = burst
+        self.initial_concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.captcha_ratio = captcha_ratio
+        self.slot_timeout = slot_timeout
+        self.holder_prefix = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+        self.connection = sqlite3.connect(self.filename, timeout=60, isolation_level=None)
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def _transaction(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def _get(self, name, default):
+        row = self.connection.execute("SELECT value FROM state WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set(self, name, value):
+        self.connection.execute("INSERT OR REPLACE INTO state (name, value) VALUES (?, ?)", (name, value))
+
+    @property
+    def rate(self):
+        return self._get('rate', self.initial_rate)
+
+    @property
+    def concurrency(self):
+        return int(self._get('concurrency', self.initial_concurrency))
+
+    def _take(self, name, rate, now):
+        """ Take a token from a bucket, return the seconds to wait if it is empty """
+        row = self.connection.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * rate / 60)
+        if tokens < 1:
+            self.connection.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (name, rate, tokens, now))
+            return (1 - tokens) * 60 / rate
+        self.connection.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?)", (name, rate, tokens - 1, now))
+        return 0
+
+    def _try_acquire(self, holder, proxy_key):
+        """ Take a slot and the tokens in one transaction, return the seconds to wait or 0 on success """
+        now = get_clock().time()
+        connection = self._transaction()
+        try:
+            connection.execute("DELETE FROM slots WHERE expires < ?", (now,))
+            used = connection.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+            if used >= self.concurrency:
+                connection.execute("COMMIT")
+                return 1.0
+            wait = self._take(self.GLOBAL, self.rate, now)
+            if not wait and proxy_key is not None:
+                wait = self._take(proxy_key, self.per_proxy_rate, now)
+                if wait:
+                    # Give back the global token, the search will not happen yet
+                    connection.execute("UPDATE buckets SET tokens = tokens + 1 WHERE name = ?", (self.GLOBAL,))
+            if not wait:
+                connection.execute("INSERT INTO slots (holder, expires) VALUES (?, ?)",
+                                   (holder, now + self.slot_timeout))
+            connection.execute("COMMIT")
+            return wait
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def acquire(self, proxy=None, block=True):
+        """
+        Take a search slot and the tokens of a search
+        :param proxy: Proxy used for the search, also limited by per_proxy_rate
+        :param block: wait until a slot is free, else return None right away
+        :return: holder id of the slot, to pass to release
+        """
+        holder = f"{self.holder_prefix}-{uuid.uuid4().hex[:8]}"
+        proxy_key = f"proxy:{proxy.host}:{proxy.port}" if proxy is not None and self.per_proxy_rate else None
+        while True:
+            wait = self._try_acquire(holder, proxy_key)
+            if not wait:
+                return holder
+            if not block:
+                return None
+            logger.debug(f"[Governor] Waiting {wait:.1f} seconds for a search slot")
+            get_clock().sleep(min(wait, 5))
+
+    def release(self, holder):
+        self.connection.execute("DELETE FROM slots WHERE holder = ?", (holder,))
+
+    @contextmanager
+    def search(self, proxy=None):
+        """
+        Block until a search is allowed and hold a search slot while the block runs
+        :param proxy: Proxy used for the search, also limited by per_proxy_rate
+        """
+        holder = self.acquire(proxy)
+        try:
+            yield
+        finally:
+            self.release(holder)
+
+    def record(self, outcome):
+        """
+        Adapt rate and concurrency to the outcome of a search
+        :param outcome: 'ok' (no captcha), 'captcha' (captcha solved) or 'failed' (validation failed / blocked)
+        """
+        connection = self._transaction()
+        try:
+            rate, concurrency = self.rate, self.concurrency
+            captchas = self._get('captcha_share', 0.0) * 0.9 + (0.1 if outcome != 'ok' else 0.0)
+            successes = self._get('successes', 0)
+            if outcome == 'failed':
+                rate = max(rate * self.decrease, self.min_rate)
+                concurrency = max(int(concurrency * self.decrease), 1)
+                successes = 0
+            elif captchas <= self.captcha_ratio:
+                rate = min(rate + self.increase, self.max_rate)
+                successes += 1
+                if successes >= concurrency * 4:
+                    concurrency = min(concurrency + 1, self.max_concurrency)
+                    successes = 0
+            self._set('rate', rate)
+            self._set('concurrency', concurrency)
+            self._set('captcha_share', captchas)
+            self._set('successes', successes)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        logger.info(f"[Governor] {outcome}: {rate:.1f} searches/min, concurrency {concurrency}, "
+                    f"captcha share {captchas:.2f}")
@@ -0,0 +1,188 @@
+import argparse
+import csv
+import json
+import logging
+import re
+from itertools import islice
+from pathlib import Path
+
+from solutions.events import EventStore
+from solutions.negative_cache import NegativeCache
+from solutions.utils import is_valid_container_number, normalise_container_number
+from solutions.work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_COLUMN = re.compile(r'^(container|cntr)[\s_-]*(number|no\.?|nr|id)?$', re.IGNORECASE)
+
+
+def _iter_json_array(f, chunk_size=1 << 16):
+    """ Yield the values of a top level JSON array one by one, reading the file in chunks """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    position = None
+    while True:
+        if position is None:
+            start = buffer.find('[')
+            if start >= 0:
+                position = start + 1
+        else:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer):
+                if buffer[position] == ']':
+                    return
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # Only a separator after the value shows it is complete, e.g. a number may go on in the next chunk
+                    if eof or end < len(buffer) and buffer[end] in ' \t\r\n,]':
+                        yield value
+                        position = end
+                        continue
+        if eof:
+            if position is None:
+                raise ValueError("Input is not a JSON array")
+            raise ValueError("Unterminated JSON array")
+        if position:
+            # Drop what was consumed, so the buffer never holds more than the current item and a chunk
+            buffer, position = buffer[position:], 0
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def _iter_csv(f):
+    reader = csv.DictReader(f)
+    column = next((name for name in reader.fieldnames or () if CONTAINER_COLUMN.match(name.strip())),
+                  reader.fieldnames[0] if reader.fieldnames else None)
+    for row in reader:
+        item = {key.strip(): value for key, value in row.items() if key is not None and value not in (None, '')}
+        item['container_number'] = row.get(column)
+        yield item
+
+
+def iter_items(filename):
+    """
+    Stream queue items from a JSON array, NDJSON or CSV file in constant memory. Plain strings are taken as
+    container numbers, JSON objects and CSV rows need a container number field or column; the other fields
+    are kept. Items with a status other than INITIAL (e.g. an input file of the scraper) and values that are
+    neither a string nor an object are left out.
+    """
+    filename = Path(filename)
+    suffix = filename.suffix.lower()
+    with open(filename, 'r', encoding='utf-8-sig', newline='' if suffix == '.csv' else None) as f:
+        if suffix == '.csv':
+            values = _iter_csv(f)
+        elif suffix in ('.ndjson', '.jsonl'):
+            values = (json.loads(line) for line in f if line.strip())
+        else:
+            values = _iter_json_array(f)
+        for value in values:
+            item = {'container_number': value} if isinstance(value, str) else value
+            if not isinstance(item, dict):
+                logger.warning(f"Skipping {type(value).__name__} value {value!r} in {filename}, "
+                               f"expected a container number or an object")
+                continue
+            if item.get('status', 'INITIAL') != 'INITIAL':
+                continue
+            yield item
+
+
+class Ingestion:
+    """
+    Normalise, validate and dedupe container numbers from customer feeds and add them to a WorkQueue in batches.
+    Numbers that fail the ISO 6346 check are added with the final status INVALID, so they show up like in the
+    scraper's input file.
+
+    Duplicates are dropped against the queue's primary key, so containers already queued (or seen earlier in
+    the feed) are not added twice. Containers with stored results in an EventStore or a cached "no record"
+    result in a NegativeCache can be left out as well; both are looked up per batch through their indexes.
+    """
+
+    def __init__(self, work_queue, events=None, negative_cache=None, batch_size=5000):
+        """
+        :param work_queue: WorkQueue to add the containers to
+        :param events: EventStore, skip containers that already have stored activities
+        :param negative_cache: NegativeCache, skip containers the site recently had no record of
+        :param batch_size: number of containers per insert transaction
+        """
+        self.work_queue = work_queue
+        self.events = events
+        self.negative_cache = negative_cache
+        self.batch_size = batch_size
+        self.counts = dict.fromkeys(('read', 'invalid', 'scraped', 'no_record', 'added'), 0)
+
+    def _add_batch(self, items):
+        invalid = [item for item in items if item['status'] == 'INVALID']
+        if invalid:
+            self.work_queue.put_many(invalid)
+            items = [item for item in items if item['status'] != 'INVALID']
+        if self.events is not None:
+            scraped = self.events.known([item['container_number'] for item in items])
+            self.counts['scraped'] += sum(item['container_number'] in scraped for item in items)
+            items = [item for item in items if item['container_number'] not in scraped]
+        if self.negative_cache is not None:
+            negative = {item['container_number'] for item in items
+                        if self.negative_cache.get(item['container_number']) is not None}
+            self.counts['no_record'] += len(negative)
+            items = [item for item in items if item['container_number'] not in negative]
+        if items:
+            self.counts['added'] += self.work_queue.put_many(items)
+
+    def _items(self, filename):
+        """ Normalised items, with status INVALID if the number fails the check, items without number left out """
+        for item in iter_items(filename):
+            self.counts['read'] += 1
+            container_number = normalise_container_number(item.get('container_number') or '')
+            if not container_number:
+                logger.warning(f"Skipping item without container number: {item!r}")
+                self.counts['invalid'] += 1
+                continue
+            status = 'INITIAL'
+            if not is_valid_container_number(container_number):
+                logger.debug(f"Invalid container number {item.get('container_number')!r}")
+                self.counts['invalid'] += 1
+                status = 'INVALID'
+            yield {**item, 'container_number': container_number, 'status': status}
+
+    def ingest(self, filename):
+        """
+        Add the containers of a feed to the queue
+        :return: dict of counts (read, invalid, scraped, no_record, added) over all feeds so far
+        """
+        logger.info(f"Ingesting {filename}")
+        items = self._items(filename)
+        while batch := list(islice(items, self.batch_size)):
+            self._add_batch(batch)
+        logger.info(f"Ingested {filename}: {self.counts}")
+        return self.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add containers from JSON, NDJSON or CSV feeds to a work queue")
+    parser.add_argument('queue', help="WorkQueue SQLite file")
+    parser.add_argument('feeds', nargs='+', help="feed files (.json, .ndjson/.jsonl or .csv)")
+    parser.add_argument('--events', help="EventStore SQLite file, skip containers that already have results")
+    parser.add_argument('--negative-cache', help="NegativeCache SQLite file, skip containers without record")
+    parser.add_argument('--shards', type=int, default=16, help="number of queue shards, same as the workers")
+    parser.add_argument('--batch-size', type=int, default=5000, help="containers per insert transaction")
+    args = parser.parse_args()
+
+    ingestion = Ingestion(
+        WorkQueue(args.queue, shards=args.shards),
+        events=EventStore(args.events) if args.events else None,
+        negative_cache=NegativeCache(args.negative_cache) if args.negative_cache else None,
+        batch_size=args.batch_size
+    )
+    for feed in args.feeds:
+        ingestion.ingest(feed)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    main()
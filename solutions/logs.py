@@ -0,0 +1,162 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import socket
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# Container (or comma joined containers of a batch search) the current thread is working on
+_correlation = ContextVar('correlation', default=None)
+
+HOSTNAME = socket.gethostname()
+
+
+def set_correlation(container_number):
+    """
+    Tag the log records of the current thread (or task) with a container number, None to clear it
+    :return: token to restore the previous container with `_correlation.reset`, see `correlation`
+    """
+    if isinstance(container_number, (list, tuple)):
+        container_number = ','.join(container_number)
+    return _correlation.set(container_number)
+
+
+@contextmanager
+def correlation(container_number):
+    """ Tag the log records of the block with a container number, the previous one is restored after it """
+    token = set_correlation(container_number)
+    try:
+        yield
+    finally:
+        _correlation.reset(token)
+
+
+def get_correlation():
+    return _correlation.get()
+
+
+class CorrelationFilter(logging.Filter):
+    """ Adds the correlation id as `container`, on the thread that logs, before the record is queued """
+
+    def filter(self, record):
+        record.container = _correlation.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps every record of INFO and above, and of DEBUG records the first `burst` and then one in `every` per call
+    site (logger and line), so chatty polling loops cost the same however long they run or how many workers
+    log to the same place.
+    """
+
+    def __init__(self, every=100, burst=10):
+        super().__init__()
+        self.every = every
+        self.burst = burst
+        self._counts = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        key = (record.name, record.lineno)
+        count = self._counts.get(key, 0) + 1
+        self._counts[key] = count
+        if count <= self.burst or count % self.every == 0:
+            record.sampled = 1 if count <= self.burst else self.every
+            return True
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line """
+
+    def format(self, record):
+        document = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'line': record.lineno,
+            'message': record.getMessage(),
+            'container': getattr(record, 'container', None),
+            'host': HOSTNAME,
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        if getattr(record, 'sampled', 1) > 1:
+            document['sampled'] = record.sampled
+        if record.exc_info:
+            document['exception'] = self.formatException(record.exc_info)
+        return json.dumps(document, ensure_ascii=False, default=str)
+
+
+class RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """ Rotates when the file reaches `max_bytes` or is `interval` seconds old, whichever comes first """
+
+    def __init__(self, filename, max_bytes=50 * 1024 ** 2, interval=24 * 3600, backup_count=10, encoding='utf-8'):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+    def shouldRollover(self, record):
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only the message is merged with its args, formatting (e.g. to JSON) is left to the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(filename, level=logging.DEBUG, console_level=logging.INFO, debug_every=100, debug_burst=10,
+                  max_bytes=50 * 1024 ** 2, interval=24 * 3600, backup_count=10):
+    """
+    Log through a queue: the logging threads only filter and enqueue records, a listener thread formats them
+    as JSON lines into a rotating file and as text to the console.
+    :param filename: log file, rotated to filename.1, filename.2, ...
+    :param level: level of the root logger
+    :param console_level: level of the console output
+    :param debug_every: keep one in `debug_every` DEBUG records per call site after the first `debug_burst`,
+        0 keeps every record
+    :param max_bytes: rotate when the file reaches this size
+    :param interval: rotate after this many seconds
+    :param backup_count: number of rotated files to keep
+    :return: the QueueListener, stopped at exit
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s', datefmt='%H:%M:%S'))
+    file_handler = RotatingFileHandler(filename, max_bytes, interval, backup_count)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(JsonFormatter())
+
+    queue_handler = _QueueHandler(queue.SimpleQueue())
+    if debug_every:
+        queue_handler.addFilter(SamplingFilter(debug_every, debug_burst))
+    queue_handler.addFilter(CorrelationFilter())
+    listener = logging.handlers.QueueListener(queue_handler.queue, console_handler, file_handler,
+                                              respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
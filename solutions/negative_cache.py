@@ -0,0 +1,59 @@
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class NegativeCache:
+    """
+    Container numbers the site had no record of, remembered for `ttl` seconds so they are not searched (and
+    their captcha not solved) again and again. Kept in a SQLite file to be shared between runs and workers, or
+    in memory for the current run only.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS negative (
+        container_number TEXT PRIMARY KEY,
+        reason TEXT,
+        expires REAL NOT NULL
+    );
+    """
+
+    def __init__(self, filename=':memory:', ttl=24 * 3600):
+        """
+        :param filename: SQLite file, default ':memory:' keeps the cache for this process only
+        :param ttl: seconds a negative result stays valid
+        """
+        if filename != ':memory:':
+            filename = Path(filename).resolve()
+            filename.parent.mkdir(parents=True, exist_ok=True)
+        self.filename = filename
+        self.ttl = ttl
+        # check_same_thread=False: the tracking API uses the cache from its request threads, one at a time
+        self.connection = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, container_number, reason=None):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO negative (container_number, reason, expires) VALUES (?, ?, ?)",
+                (container_number, reason, time.time() + self.ttl)
+            )
+        logger.info(f"Container {container_number} has no record, skipping it for {self.ttl / 3600:.0f} hours")
+
+    def get(self, container_number):
+        """ :return: (reason, expires) of a cached negative result, None if there is none or it expired """
+        row = self.connection.execute(
+            "SELECT reason, expires FROM negative WHERE container_number = ? AND expires > ?",
+            (container_number, time.time())
+        ).fetchone()
+        return None if row is None else tuple(row)
+
+    def purge(self):
+        """ Delete expired entries """
+        with self.connection:
+            self.connection.execute("DELETE FROM negative WHERE expires <= ?", (time.time(),))
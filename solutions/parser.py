@@ -0,0 +1,72 @@
+import logging
+import re
+
+from bs4 import BeautifulSoup
+
+from solutions.records import Activity, ContainerResult, ContainerSummary, DetentionAndDemurrage, Routing
+
+logger = logging.getLogger(__name__)
+
+NO_RECORD = re.compile(r'\bno (matching )?records?\b', re.IGNORECASE)
+
+
+class NoRecordError(Exception):
+    """ The site has no record of the container number """
+
+
+def scrape_containers_table(soup):
+    logger.info("Scraping containers table.")
+    table = soup.find('table', {'id': 'summaryTable'})
+    tbody_rows = table.find('tbody').find_all('tr')
+    table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tbody_rows[2].find_all('td')]
+    return ContainerSummary.from_cells(table_data)
+
+
+def scrape_detention_table(soup):
+    logger.info("Scraping detention table.")
+    table = soup.find('table', {'id': 'dndTable'})
+    tbody_rows = table.find('tbody').find_all('tr')
+    table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tbody_rows[-1].find_all('td')]
+    return DetentionAndDemurrage.from_cells(table_data)
+
+
+def scrape_routing_table(soup):
+    logger.info("Scraping routing table.")
+    table = soup.find('table', {'id': 'eventListTable'})
+    tbody_rows = table.find('tbody').find_all('tr')
+    table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tbody_rows[-1].find_all('td')]
+    return Routing.from_cells(table_data)
+
+
+def scrape_equipment_activities_table(soup):
+    logger.info("Scraping equipment activities table.")
+    data = []
+    table = soup.find('div', {'id': 'Tab2'}).find('table', {'id': 'eventListTable'})
+    tbody_rows = table.find('tbody').find_all('tr')
+    for tr in tbody_rows[1:]:
+        table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tr.find_all('td')]
+        data.append(Activity.from_cells(table_data))
+    return data
+
+
+def parse_result_page(html):
+    """ ContainerResult of the results page HTML of one container """
+    soup = BeautifulSoup(html, features="html.parser")
+    if soup.find('table', {'id': 'summaryTable'}) is None:
+        if NO_RECORD.search(soup.get_text(' ')):
+            raise NoRecordError("No record found.")
+        raise ValueError("Results page has no summary table.")
+    return ContainerResult(
+        containers=scrape_containers_table(soup),
+        routing=scrape_routing_table(soup),
+        detention_and_demurrage=scrape_detention_table(soup),
+        equipment_activities=scrape_equipment_activities_table(soup)
+    )
+
+
+def parse_document(html):
+    """
+    Output document of a results page. It stays a ContainerResult (which pickles back from a worker process) up to
+    where it is written as JSON, so the records are only turned into dicts there.
+    """
+    return parse_result_page(html)
@@ -0,0 +1,204 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Union
+
+from solutions.utils import parse_datetime, parse_number
+
+__all__ = ['LatestEvent', 'ContainerSummary', 'Routing', 'FreeTime', 'DetentionAndDemurrage', 'Activity',
+           'ContainerResult']
+
+
+def _text(value):
+    return value or None
+
+
+def _datetime(value) -> Union[datetime, str, None]:
+    """ Parsed datetime, the original text if it cannot be parsed, None if empty """
+    return parse_datetime(value) or _text(value)
+
+
+def _number(value, cast=float):
+    """ Parsed number, the original text if it holds no number, None if empty """
+    number = parse_number(value, cast)
+    return _text(value) if number is None else number
+
+
+def _serialise(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+@dataclass
+class LatestEvent:
+    __slots__ = ('event', 'location', 'time')
+    event: Optional[str]
+    location: Optional[str]
+    time: Union[datetime, str, None]
+
+    def to_dict(self):
+        return {'event': self.event, 'location': self.location, 'time': _serialise(self.time)}
+
+
+@dataclass
+class ContainerSummary:
+    __slots__ = ('container_number', 'container_size_type', 'quantity', 'gross_weight', 'verified_gross_mass',
+                 'latest_event', 'final_destination')
+    container_number: str
+    container_size_type: Optional[str]
+    quantity: Union[int, str, None]
+    gross_weight: Union[float, str, None]
+    verified_gross_mass: Union[float, str, None]
+    latest_event: LatestEvent
+    final_destination: Optional[str]
+
+    @classmethod
+    def from_cells(cls, cells):
+        """ Build from the cells of the summary table row """
+        return cls(
+            container_number=cells[0],
+            container_size_type=_text(cells[1]),
+            quantity=_number(cells[2], int),
+            gross_weight=_number(cells[3]),
+            verified_gross_mass=_number(cells[4]),
+            latest_event=LatestEvent(_text(cells[5]), _text(cells[6]), _datetime(cells[7])),
+            final_destination=_text(cells[8]),
+        )
+
+    def to_dict(self):
+        return {
+            'container_number': self.container_number,
+            'container_size_type': self.container_size_type,
+            'quantity': self.quantity,
+            'gross_weight': self.gross_weight,
+            'verified_gross_mass': self.verified_gross_mass,
+            'latest_event': self.latest_event.to_dict(),
+            'final_destination': self.final_destination,
+        }
+
+
+@dataclass
+class Routing:
+    __slots__ = ('origin', 'empty_pickup_location', 'full_return_location', 'port_of_load', 'vessel_voyage',
+                 'port_of_discharge', 'final_destination_hub', 'destination', 'empty_return_location', 'haulage')
+    origin: Optional[str]
+    empty_pickup_location: Optional[str]
+    full_return_location: Optional[str]
+    port_of_load: Optional[str]
+    vessel_voyage: Optional[str]
+    port_of_discharge: Optional[str]
+    final_destination_hub: Optional[str]
+    destination: Optional[str]
+    empty_return_location: Optional[str]
+    haulage: Optional[str]
+
+    @classmethod
+    def from_cells(cls, cells):
+        """ Build from the cells of the routing table row """
+        return cls(*(_text(cell) for cell in cells[:len(cls.__slots__)]))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+@dataclass
+class FreeTime:
+    __slots__ = ('free_time', 'last_free_date')
+    free_time: Union[int, str, None]
+    last_free_date: Union[datetime, str, None]
+
+    @classmethod
+    def from_cells(cls, free_time, last_free_date):
+        return cls(_number(free_time, int), _datetime(last_free_date))
+
+    def to_dict(self):
+        return {'free_time': self.free_time, 'last_free_date': _serialise(self.last_free_date)}
+
+
+@dataclass
+class DetentionAndDemurrage:
+    __slots__ = ('container_number', 'earliest_empty_pickup_date', 'detention_last_free_date', 'combined',
+                 'inbound_demurrage', 'inbound_detention', 'quay_rent')
+    container_number: str
+    earliest_empty_pickup_date: Union[datetime, str, None]
+    detention_last_free_date: Union[datetime, str, None]
+    combined: FreeTime
+    inbound_demurrage: FreeTime
+    inbound_detention: FreeTime
+    quay_rent: FreeTime
+
+    @classmethod
+    def from_cells(cls, cells):
+        """ Build from the cells of the detention and demurrage table row """
+        return cls(
+            container_number=cells[0],
+            earliest_empty_pickup_date=_datetime(cells[1]),
+            detention_last_free_date=_datetime(cells[2]),
+            combined=FreeTime.from_cells(cells[3], cells[4]),
+            inbound_demurrage=FreeTime.from_cells(cells[5], cells[6]),
+            inbound_detention=FreeTime.from_cells(cells[7], cells[8]),
+            quay_rent=FreeTime.from_cells(cells[9], cells[10]),
+        )
+
+    def to_dict(self):
+        return {
+            'container_number': self.container_number,
+            'at_origin': {
+                'earliest_empty_pickup_date': _serialise(self.earliest_empty_pickup_date),
+                'detention_last_free_date': _serialise(self.detention_last_free_date),
+            },
+            'at_destination': {
+                'combined_dem/det_(2in1)_last_free_date': self.combined.to_dict(),
+                'inbound_demurrage': self.inbound_demurrage.to_dict(),
+                'inbound_detention': self.inbound_detention.to_dict(),
+                'quay_rent': self.quay_rent.to_dict(),
+            }
+        }
+
+
+@dataclass
+class Activity:
+    __slots__ = ('event', 'facility', 'location', 'mode', 'time', 'remarks')
+    event: Optional[str]
+    facility: Optional[str]
+    location: Optional[str]
+    mode: Optional[str]
+    time: Union[datetime, str, None]
+    remarks: Optional[str]
+
+    @classmethod
+    def from_cells(cls, cells):
+        """ Build from the cells of an equipment activities table row """
+        return cls(_text(cells[0]), _text(cells[1]), _text(cells[2]), _text(cells[3]), _datetime(cells[4]),
+                   _text(cells[5]))
+
+    def to_dict(self):
+        return {
+            'event': self.event,
+            'facility': self.facility,
+            'location': self.location,
+            'mode': self.mode,
+            'time': _serialise(self.time),
+            'remarks': self.remarks,
+        }
+
+
+@dataclass
+class ContainerResult:
+    __slots__ = ('containers', 'routing', 'detention_and_demurrage', 'equipment_activities')
+    containers: ContainerSummary
+    routing: Routing
+    detention_and_demurrage: DetentionAndDemurrage
+    equipment_activities: List[Activity]
+
+    def to_dict(self):
+        """ Output document in the same layout as the JSON output file """
+        return {
+            'containers': self.containers.to_dict(),
+            'routing': self.routing.to_dict(),
+            'detention_and_demurrage': self.detention_and_demurrage.to_dict(),
+            'equipment_activities': [activity.to_dict() for activity in self.equipment_activities],
+        }
+
+    def to_json(self):
+        """ Compact single line JSON, suitable for NDJSON output """
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
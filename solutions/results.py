@@ -0,0 +1,50 @@
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ResultStore:
+    """
+    Latest output document of every scraped container with the time it was scraped, in a SQLite file shared by
+    the workers and the tracking API (see solutions.tracking).
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS results (
+        container_number TEXT PRIMARY KEY,
+        document TEXT NOT NULL,
+        scraped REAL NOT NULL
+    );
+    """
+
+    def __init__(self, filename):
+        self.filename = Path(filename).resolve()
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False: the tracking API uses the store from its request threads, one at a time
+        self.connection = sqlite3.connect(self.filename, timeout=60, check_same_thread=False)
+        self.connection.executescript(self.SCHEMA)
+        logger.info(f"Result store opened at {self.filename}")
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, container_number, document):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (container_number, document, scraped) VALUES (?, ?, ?)",
+                (container_number, json.dumps(document, ensure_ascii=False), time.time())
+            )
+
+    def get(self, container_number, max_age=None):
+        """
+        :param max_age: seconds, only return a result scraped at most this long ago
+        :return: (document, scraped) of the latest result, None if there is none
+        """
+        row = self.connection.execute(
+            "SELECT document, scraped FROM results WHERE container_number = ? AND scraped >= ?",
+            (container_number, 0 if max_age is None else time.time() - max_age)
+        ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime
+
+from solutions.utils import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Heap backed priority queue for containers waiting to be scraped.
+
+    Items are the dicts of the input file. Urgency is computed from optional item fields:
+        - eta: next estimated arrival time
+        - last_free_date: nearest demurrage/detention last free date
+        - last_changed: epoch seconds of the last time the latest event changed
+        - failures / next_attempt: failure backoff state
+    Lower keys are scraped first. Items whose `next_attempt` is in the future are parked in a
+    separate heap and moved to the ready heaps once due, so `pop` stays O(log n).
+    With `fairness` set, items are grouped by that field (e.g. 'customer' or 'source') and groups are
+    served in weighted round robin order.
+    """
+    HORIZON = 30 * 24 * 3600
+    WEIGHTS = {'eta': 1.0, 'last_free_date': 2.0, 'stale': 0.5}
+
+    def __init__(self, items=(), fairness=None, group_weights=None, weights=None, backoff=60, max_backoff=3600,
+                 rescrape_interval=None, clock=time.time):
+        """
+        :param items: iterable of queue items
+        :param fairness: item field used to group items for fair scheduling, default None means a single queue
+        :param group_weights: dict of group -> weight, groups not listed get weight 1
+        :param weights: overrides for the urgency weights (eta, last_free_date, stale)
+        :param backoff: base failure backoff in seconds, doubled on every consecutive failure
+        :param max_backoff: maximum backoff in seconds
+        :param rescrape_interval: seconds before a scraped container is scraped again, default None means never
+        :param clock: function returning epoch seconds
+        """
+        self.fairness = fairness
+        self.group_weights = group_weights or {}
+        self.weights = {**self.WEIGHTS, **(weights or {})}
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rescrape_interval = rescrape_interval
+        self.clock = clock
+
+        self._counter = itertools.count()
+        self._ready = {}
+        self._groups = []
+        self._vtime = {}
+        self._delayed = []
+        self._size = 0
+        for item in items:
+            self.push(item)
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def _group(self, item):
+        return item.get(self.fairness) if self.fairness else None
+
+    @staticmethod
+    def _seconds_until(value, now):
+        dt = parse_datetime(value)
+        if dt is None:
+            return None
+        return dt.timestamp() - now
+
+    def urgency(self, item, now=None):
+        """ Urgency key of an item, lower is more urgent """
+        now = self.clock() if now is None else now
+        key = 0.0
+        for field in ('eta', 'last_free_date'):
+            seconds = self._seconds_until(item.get(field), now)
+            seconds = self.HORIZON if seconds is None else min(max(seconds, 0), self.HORIZON)
+            key += self.weights[field] * seconds
+        last_changed = item.get('last_changed')
+        stale = self.HORIZON if last_changed is None else min(max(now - last_changed, 0), self.HORIZON)
+        key -= self.weights['stale'] * stale
+        return key
+
+    def push(self, item):
+        """ Add item to the queue, parked until `next_attempt` if it is in the future """
+        now = self.clock()
+        next_attempt = item.get('next_attempt')
+        self._size += 1
+        if next_attempt is not None and next_attempt > now:
+            heapq.heappush(self._delayed, (next_attempt, next(self._counter), item))
+        else:
+            self._push_ready(item, now)
+
+    def _push_ready(self, item, now):
+        group = self._group(item)
+        heap = self._ready.get(group)
+        if heap is None:
+            heap = self._ready[group] = []
+        if not heap:
+            vtime = max(self._vtime.get(group, 0.0), self._groups[0][0] if self._groups else 0.0)
+            self._vtime[group] = vtime
+            heapq.heappush(self._groups, (vtime, next(self._counter), group))
+        heapq.heappush(heap, (self.urgency(item, now), next(self._counter), item))
+
+    def _promote(self, now):
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, item = heapq.heappop(self._delayed)
+            self._push_ready(item, now)
+
+    def pop(self):
+        """
+        Remove and return the most urgent ready item
+        :return: item or None if nothing is ready yet
+        """
+        self._promote(self.clock())
+        if not self._groups:
+            return None
+        vtime, _, group = heapq.heappop(self._groups)
+        heap = self._ready[group]
+        _, _, item = heapq.heappop(heap)
+        vtime += 1.0 / self.group_weights.get(group, 1)
+        self._vtime[group] = vtime
+        if heap:
+            heapq.heappush(self._groups, (vtime, next(self._counter), group))
+        self._size -= 1
+        return item
+
+    def next_ready_in(self):
+        """ Seconds until the next item becomes ready, 0 if one is ready now, None if empty """
+        if self._groups:
+            return 0
+        if not self._delayed:
+            return None
+        return max(self._delayed[0][0] - self.clock(), 0)
+
+    def fail(self, item):
+        """ Record a failed attempt and requeue the item with exponential backoff """
+        item['failures'] = item.get('failures', 0) + 1
+        delay = min(self.backoff * 2 ** (item['failures'] - 1), self.max_backoff)
+        item['next_attempt'] = self.clock() + delay
+        logger.info(f"Container {item.get('container_number')} failed {item['failures']} time(s), "
+                    f"retrying in {delay} seconds")
+        self.push(item)
+
+    def observe(self, item, data):
+        """
+        Update the scheduling fields of an item from a scraped result
+        :param item: queue item
+        :param data: ContainerResult of parser.parse_document (see Scraper.capture)
+        """
+        now = self.clock()
+        item.pop('failures', None)
+        item.pop('next_attempt', None)
+
+        # The item is written back to the input file, so it keeps the JSON form of the latest event
+        latest_event = data.containers.latest_event.to_dict()
+        if latest_event != item.get('latest_event') or 'last_changed' not in item:
+            item['latest_event'] = latest_event
+            item['last_changed'] = now
+
+        free_dates = []
+        dnd = data.detention_and_demurrage
+        for charge in (dnd.combined, dnd.inbound_demurrage, dnd.inbound_detention, dnd.quay_rent):
+            dt = parse_datetime(charge.last_free_date)
+            if dt is not None:
+                free_dates.append(dt)
+        item['last_free_date'] = min(free_dates).strftime('%Y-%m-%d %H:%M') if free_dates else None
+
+        upcoming = []
+        for activity in data.equipment_activities:
+            dt = parse_datetime(activity.time)
+            if dt is not None and dt.timestamp() > now:
+                upcoming.append(dt)
+        item['eta'] = min(upcoming).strftime('%Y-%m-%d %H:%M') if upcoming else None
+
+    def reschedule(self, item):
+        """
+        Requeue a scraped item if re-scraping is enabled. Urgent containers (close to their ETA or last free
+        date) are re-scraped sooner than the configured interval.
+        :return: True if the item was requeued
+        """
+        if self.rescrape_interval is None:
+            return False
+        now = self.clock()
+        nearest = self.HORIZON
+        for field in ('eta', 'last_free_date'):
+            seconds = self._seconds_until(item.get(field), now)
+            if seconds is not None and seconds > 0:
+                nearest = min(nearest, seconds)
+        item['next_attempt'] = now + min(self.rescrape_interval, max(nearest / 4, self.backoff))
+        logger.info(f"Container {item.get('container_number')} rescheduled at "
+                    f"{datetime.fromtimestamp(item['next_attempt']):%Y-%m-%d %H:%M}")
+        self.push(item)
+        return True
@@ -1,24 +1,57 @@
 import logging
 import random
-import re
-import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
 from io import BytesIO
 from pathlib import Path
 
 from PIL import Image
-from bs4 import BeautifulSoup
 
+from solutions import parser
+from solutions.archive import PageArchive
+from solutions.captcha import SlideSearch
+from solutions.ingest import Ingestion
+from solutions.logs import correlation
+from solutions.negative_cache import NegativeCache
+from solutions.parser import NoRecordError
+from solutions.results import ResultStore
+from solutions.scheduler import Scheduler
 from solutions.spider import Spider
+from solutions.tabs import TabTask, Throughput
+from solutions.utils import is_valid_container_number
 from solutions.support.driver import *
 from solutions.support.model import ONNXModel
 
 logger = logging.getLogger(__name__)
 
 
+class PageLoadError(Exception):
+    """ The search form didn't load (yet). Slow pages happen on any proxy, so it isn't counted as a block """
+
+
 class Scraper(Selenium):
     URL = "https://www.oocl.com/eng/ourservices/eservices/cargotracking/Pages/cargotracking.aspx"
+    # The short "no record" message itself, not scripts, templates or longer help texts that mention it
+    NO_RECORD_XPATH = ('//*[not(ancestor-or-self::script or ancestor-or-self::template or ancestor-or-self::noscript)]'
+                       '[contains(translate(normalize-space(text()), "NORECD", "norecd"), "no record")]'
+                       '[string-length(normalize-space(text())) < 80]')
+    CAPTCHA_ATTEMPTS = 3
+    # Maximum number of container numbers the tracking form accepts in one search
+    SEARCH_BATCH_LIMIT = 20
+    governor = None
+    telemetry = None
+    monitor = None
+    negative_cache = None
+    archive = None
+    results = None
+    parse_pool = None
+    throughput = None
+    current_search = None
 
     def initiate_search(self, container_number):
+        """ Submit a search for one container number or a list of container numbers """
+        if isinstance(container_number, (list, tuple)):
+            container_number = ','.join(container_number)
         logger.info(f"Initiating search for container: {container_number}")
         self.get(self.URL)
 
@@ -26,30 +59,45 @@ class Scraper(Selenium):
         i = 0
         for i in range(timeout):
             try:
-                if self.find_element(By.ID, 'allowAll'):
-                    logger.info("Clicking on 'Allow All' button.")
-                    self.click_js((By.ID, 'allowAll'))
-                logger.info("Selecting cargo type 'Container ID'.")
-                Select(self.find_element(By.ID, 'ooclCargoSelector')).select_by_value('cont')
-                self.find_element(By.ID, 'SEARCH_NUMBER').send_keys(container_number)
-                self.click_js((By.ID, 'container_btn'))
+                self.submit_search_form(container_number)
             except Exception as e:
                 logger.debug(f"Exception occurred: {e}. Retrying... ({i + 1}/{timeout})")
-                time.sleep(1)
+                get_clock().sleep(1)
             else:
                 logger.info("Search initiated successfully.")
                 break
         else:
-            raise Exception(f"Page failed to load in {timeout} seconds.")
+            raise PageLoadError(f"Page failed to load in {timeout} seconds.")
 
-    def detect(self):
+    def submit_search_form(self, container_number):
+        """ Fill in and submit the search form of the current page, raise if it isn't loaded yet """
+        if self.find_element(By.ID, 'allowAll'):
+            logger.info("Clicking on 'Allow All' button.")
+            self.click_js((By.ID, 'allowAll'))
+        logger.info("Selecting cargo type 'Container ID'.")
+        Select(self.find_element(By.ID, 'ooclCargoSelector')).select_by_value('cont')
+        self.find_element(By.ID, 'SEARCH_NUMBER').send_keys(container_number)
+        self.click_js((By.ID, 'container_btn'))
+
+    def detect_confidence(self, attempt=None, offset=None):
+        """
+        Whether the captcha piece is in place and the model probability that it is
+        :param attempt: CaptchaAttempt to record the frame in, if any
+        :param offset: current slider offset, recorded with the frame
+        """
         logger.info("Detecting captcha result.")
-        screenshot = self.find_element(By.ID, 'imgCanvas').screenshot_as_png
+        screenshot = self.element_screenshot(By.ID, 'imgCanvas')
         image = Image.open(BytesIO(screenshot))
         input_data = self.model.preprocess_image(image)
-        result = self.model.infer(input_data)
-        logger.info(f"Captcha detection result: {result}")
-        return result
+        scores = self.model.scores(input_data)
+        solved, confidence = self.model.is_solved(scores), float(self.model.softmax(scores)[0])
+        logger.info(f"Captcha detection result: {solved} (confidence {confidence:.3f})")
+        if attempt is not None:
+            attempt.frame(screenshot, offset, float(scores[0]), confidence, solved)
+        return solved, confidence
+
+    def detect(self):
+        return self.detect_confidence()[0]
 
     def slide(self, x):
         y = random.choice([1, -1]) * random.randint(10, 25)
@@ -58,16 +106,27 @@ class Scraper(Selenium):
 
     def handle_captcha(self):
         logger.info("Handling captcha.")
+        with self.direct_transport():
+            return self._handle_captcha()
+
+    def _handle_captcha(self):
         slider = self.wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@class="verify-move-block"]')))
         self.move_human(slider)
-        self.actions.click_and_hold(slider).perform()
-        self.slide(50)
-        for i in range(35):
-            self.slide(7)
-            if self.detect():
-                logger.info("Captcha solved.")
+        self.click_and_hold(slider)
+        attempt = self.telemetry.start(self.current_search, self._proxy and self._proxy.proxy_str,
+                                       self.model.threshold) if self.telemetry is not None else None
+        search = SlideSearch()
+        self.slide(search.first_move())
+        while True:
+            solved, confidence = self.detect_confidence(attempt, search.offset)
+            if solved:
+                logger.info(f"Captcha solved in {search.moves + 1} moves.")
                 break
-        self.actions.release(slider).perform()
+            move = search.next_move(confidence)
+            if move is None:
+                break
+            self.slide(move)
+        self.release(slider)
 
         result_index = self.multiWait([
             (By.XPATH, '//*[text()="Validation failed"]'),
@@ -77,155 +136,582 @@ class Scraper(Selenium):
             logger.error("Captcha validation failed.")
         else:
             logger.info("Captcha validation successful.")
+        if attempt is not None:
+            attempt.finish('failed' if result_index == 0 else 'solved', search.moves + 1, search.offset)
         return result_index
 
-    @staticmethod
-    def scrape_containers_table(soup):
-        logger.info("Scraping containers table.")
-        table = soup.find('table', {'id': 'summaryTable'})
-        tbody_rows = table.find('tbody').find_all('tr')
-        table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tbody_rows[2].find_all('td')]
-        return {
-            'container_number': table_data[0],
-            'container_size_type': table_data[1],
-            'quantity': table_data[2],
-            'gross_weight': table_data[3],
-            'verified_gross_mass': table_data[4],
-            'latest_event': {
-                'event': table_data[5],
-                'location': table_data[6],
-                'time': table_data[7],
-            },
-            'final_destination': table_data[8],
-        }
-
-    @staticmethod
-    def scrape_detention_table(soup):
-        logger.info("Scraping detention table.")
-        table = soup.find('table', {'id': 'dndTable'})
-        tbody_rows = table.find('tbody').find_all('tr')
-        table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tbody_rows[-1].find_all('td')]
-        return {
-            'container_number': table_data[0],
-            'at_origin': {
-                'earliest_empty_pickup_date': table_data[1],
-                'detention_last_free_date': table_data[2],
-            },
-            'at_destination': {
-                'combined_dem/det_(2in1)_last_free_date': {
-                    'free_time': table_data[3],
-                    'last_free_date': table_data[4],
-                },
-                'inbound_demurrage': {
-                    'free_time': table_data[5],
-                    'last_free_date': table_data[6],
-                },
-                'inbound_detention': {
-                    'free_time': table_data[7],
-                    'last_free_date': table_data[8],
-                },
-                'quay_rent': {
-                    'free_time': table_data[9],
-                    'last_free_date': table_data[10],
-                }
-            }
-        }
-
-    @staticmethod
-    def scrape_routing_table(soup):
-        logger.info("Scraping routing table.")
-        table = soup.find('table', {'id': 'eventListTable'})
-        tbody_rows = table.find('tbody').find_all('tr')
-        table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tbody_rows[-1].find_all('td')]
-        return {
-            "origin": table_data[0],
-            "empty_pickup_location": table_data[1],
-            "full_return_location": table_data[2],
-            "port_of_load": table_data[3],
-            "vessel_voyage": table_data[4],
-            "port_of_discharge": table_data[5],
-            "final_destination_hub": table_data[6],
-            "destination": table_data[7],
-            "empty_return_location": table_data[8],
-            "haulage": table_data[9]
-        }
-
-    @staticmethod
-    def scrape_equipment_activities_table(soup):
-        logger.info("Scraping equipment activities table.")
-        data = []
-        table = soup.find('div', {'id': 'Tab2'}).find('table', {'id': 'eventListTable'})
-        tbody_rows = table.find('tbody').find_all('tr')
-        for tr in tbody_rows[1:]:
-            table_data = [re.sub(r'(\n|\t)+', '\\n', element.text.strip()) for element in tr.find_all('td')]
-            data.append(
-                {
-                    'event': table_data[0],
-                    'facility': table_data[1],
-                    'location': table_data[2],
-                    'mode': table_data[3],
-                    'time': table_data[4],
-                    'remarks': table_data[5]
-                }
-            )
-        return data
+    scrape_containers_table = staticmethod(parser.scrape_containers_table)
+    scrape_detention_table = staticmethod(parser.scrape_detention_table)
+    scrape_routing_table = staticmethod(parser.scrape_routing_table)
+    scrape_equipment_activities_table = staticmethod(parser.scrape_equipment_activities_table)
 
-    def _scrape(self, container_number):
+    def capture(self, container_number):
+        """
+        Archive the results page shown, if there is an archive, and parse it, in the parse pool if there is one
+        :return: Future of the output document
+        """
         logger.info(f"Scraping data for container number {container_number}.")
-        content = self.driver.page_source
-        soup = BeautifulSoup(content, features="html.parser")
-        return {
-            'containers': self.scrape_containers_table(soup),
-            'routing': self.scrape_routing_table(soup),
-            'detention_and_demurrage': self.scrape_detention_table(soup),
-            'equipment_activities': self.scrape_equipment_activities_table(soup)
-        }
-
-    def scrape_container(self, item):
-        container_number = item['container_number']
+        html = self.driver.page_source
+        if self.archive is not None:
+            self.archive.add(container_number, html)
+        if self.parse_pool is not None:
+            return self.parse_pool.submit(parser.parse_document, html)
+        future = Future()
+        try:
+            future.set_result(parser.parse_document(html))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def write_result(self, container_number, future, check=False):
+        """
+        Wait for the parsed page of a container and write the output document
+        :param check: raise if the page shows another container, for multi container searches
+        """
+        data = future.result()
+        if check and data.containers.container_number != container_number:
+            raise Exception(f"Result shows {data.containers.container_number} instead.")
+        if self.results is not None:
+            self.results.add(container_number, data.to_dict())
+        self.spider.write_output(data)
+        return data
+
+    def report_proxy(self, **outcome):
+        """ Feed the outcome of a search back to the proxy pool, if the proxy comes from one """
+        if self._proxy is not None and self._proxy.pool is not None:
+            self._proxy.pool.record(self._proxy, **outcome)
+
+    def governed(self):
+        """ Wait for the rate governor, if any, before a search """
+        return self.governor.search(self._proxy) if self.governor is not None else nullcontext()
+
+    def report_governor(self, outcome):
+        """ Feed the outcome of a search ('ok', 'captcha' or 'failed') back to the rate governor, if any """
+        if self.governor is not None:
+            self.governor.record(outcome)
+
+    def search(self, container_number):
+        """
+        Search the container, return True if a captcha has to be solved
+        :raise: NoRecordError if the site answers right away that it has no record of the container
+        """
+        self.current_search = container_number if isinstance(container_number, str) else ','.join(container_number)
+        if self.monitor is not None and self.monitor.check(self):
+            self.move_to_lower_right_corner()
         self.initiate_search(container_number)
         self.driver.switch_to.window(self.driver.window_handles[-1])
-        if self.multiWait(
-                [
-                    {'ec': EC.visibility_of_element_located((By.XPATH, '//*[@class="verify-move-block"]'))},
-                    (By.XPATH, '//*[text()="Cargo Tracking"]'),
-                ]
-        ) == 0:
-            if not self.handle_captcha():
-                logger.error("Captcha not solved.")
-                raise Exception("Captcha not solved.")
-        data = self._scrape(container_number)
-        self.spider.write_output(data)
+        result_index = self.multiWait(
+            [
+                {'ec': EC.visibility_of_element_located((By.XPATH, '//*[@class="verify-move-block"]'))},
+                {'ec': EC.visibility_of_any_elements_located((By.XPATH, self.NO_RECORD_XPATH))},
+                (By.XPATH, '//*[text()="Cargo Tracking"]'),
+            ]
+        )
+        if result_index == 1:
+            raise NoRecordError("No record found.")
+        return result_index == 0
+
+    def no_record_shown(self):
+        """ Whether the page shows the site's "no record" message """
+        try:
+            return any(element.is_displayed()
+                       for element in self.driver.find_elements(By.XPATH, self.NO_RECORD_XPATH))
+        except StaleElementReferenceException:
+            # The page changed under the check, the next round looks again
+            return False
+
+    def search_and_solve(self, container_number):
+        """
+        Search one or several container numbers and solve the captcha, retrying with a fresh captcha
+        :raise: Exception("Captcha not solved.") if all attempts failed
+        """
+        start = get_clock().time()
+        captcha_failed = None
+        for attempt in range(self.CAPTCHA_ATTEMPTS):
+            if self.rotate_proxy():
+                self.move_to_lower_right_corner()
+            with self.governed():
+                try:
+                    captcha = self.search(container_number)
+                except NoRecordError:
+                    self.report_governor('ok')
+                    raise
+                except PageLoadError:
+                    raise
+                except Exception:
+                    self.report_proxy(blocked=True)
+                    self.report_governor('failed')
+                    raise
+                if not captcha:
+                    self.report_governor('ok')
+                    break
+                captcha_failed = not self.handle_captcha()
+                self.report_governor('failed' if captcha_failed else 'captcha')
+                if not captcha_failed:
+                    break
+            logger.warning(f"Captcha attempt {attempt + 1}/{self.CAPTCHA_ATTEMPTS} failed, retrying with a fresh one.")
+        self.report_proxy(latency=get_clock().time() - start, captcha_failed=captcha_failed)
+        if captcha_failed:
+            logger.error("Captcha not solved.")
+            raise Exception("Captcha not solved.")
+
+    def scrape_container(self, item, defer=False):
+        """
+        :param defer: return the Future of the parsed page instead of waiting for it and writing the output
+        """
+        container_number = item['container_number']
+        with correlation(container_number):
+            self.search_and_solve(container_number)
+            future = self.capture(container_number)
+            return future if defer else self.write_result(container_number, future)
+
+    def select_container(self, container_number):
+        """ Show the result of one container of a multi container search """
+        link = self.find_element(By.XPATH, f'//a[normalize-space(text())="{container_number}"]')
+        if link is not None:
+            logger.info(f"Selecting result of container {container_number}.")
+            self.click_js(link)
+        self.multiWait([
+            (By.XPATH, f'//table[@id="summaryTable"]//td[contains(normalize-space(.), "{container_number}")]')
+        ])
+
+    def scrape_batch(self, items, defer=False):
+        """
+        Search several containers with one submission and one captcha, then parse the result of each container
+        :param items: queue items, at most SEARCH_BATCH_LIMIT
+        :param defer: return Futures of the parsed pages instead of waiting for them and writing the output
+        :return: dict of container_number -> output document (or Future), or the exception if that container failed
+        :raise: Exception if the search itself failed, in which case no container was scraped
+        """
+        container_numbers = [item['container_number'] for item in items]
+        with correlation(container_numbers):
+            try:
+                self.search_and_solve(container_numbers)
+            except NoRecordError:
+                if len(items) == 1:
+                    raise
+                # The site doesn't say which number it has no record of, so only a single container search confirms
+                return self.split_batch(items, defer)
+            results = {}
+            for container_number in container_numbers:
+                try:
+                    self.select_container(container_number)
+                    future = self.capture(container_number)
+                    data = future if defer else self.write_result(container_number, future, check=True)
+                except Exception as e:
+                    logger.error(f"Exception occurred while scraping container {container_number} of batch: {e}")
+                    results[container_number] = e
+                else:
+                    results[container_number] = data
+            return results
 
-    def scrape_containers(self):
+    def split_batch(self, items, defer=False):
+        """
+        Search the halves of a batch the site had no record of, down to single containers, so only the containers
+        without a record fail with NoRecordError and the others are still scraped
+        :return: dict of container_number -> output document (or Future), or the exception if that container failed
+        """
+        logger.warning(f"No record of some of {len(items)} containers, searching them again in halves.")
+        results = {}
+        half = len(items) // 2
+        for part in (items[:half], items[half:]):
+            try:
+                if len(part) == 1:
+                    results[part[0]['container_number']] = self.scrape_container(part[0], defer)
+                else:
+                    results.update(self.scrape_batch(part, defer))
+            except NoRecordError as e:
+                logger.info(f"No record of container {part[0]['container_number']}.")
+                results[part[0]['container_number']] = e
+            except Exception as e:
+                logger.error(f"Exception occurred while scraping containers of batch: {e}")
+                results.update({item['container_number']: e for item in part})
+        return results
+
+    def skip(self, item):
+        """
+        Reason not to search a container at all: 'INVALID' if the number fails the ISO 6346 check digit,
+        'NO_RECORD' if the site had no record of it within the negative cache TTL, else None
+        """
+        container_number = item['container_number']
+        if not is_valid_container_number(container_number):
+            logger.warning(f"Container number {container_number} fails the ISO 6346 check, skipping it.")
+            return 'INVALID'
+        if self.negative_cache is not None and self.negative_cache.get(container_number) is not None:
+            logger.info(f"Container {container_number} had no record recently, skipping it.")
+            return 'NO_RECORD'
+        return None
+
+    def negative_cache_expiry(self, reason, container_number):
+        """
+        When a container skipped for `reason` is worth a search again: the expiry of its negative cache entry for
+        NO_RECORD, None (never) for INVALID or without a negative cache
+        """
+        if reason != 'NO_RECORD' or self.negative_cache is None:
+            return None
+        entry = self.negative_cache.get(container_number)
+        # The entry may have expired since the check, the container is then claimable right away
+        return entry[1] if entry is not None else get_clock().time()
+
+    def pop_searchable(self, scheduler, data):
+        """ Pop the most urgent item worth a search, marking invalid numbers as INVALID on the way """
+        while (item := scheduler.pop()) is not None:
+            reason = self.skip(item)
+            if reason is None:
+                return item
+            if reason == 'INVALID':
+                self.spider.update_status(self.spider.index_of(item, data), 'INVALID', data)
+        return None
+
+    def settle(self, scheduler, data, item, result):
+        """
+        Update the scheduler and the input file after a container was scraped
+        :param result: output document, or the exception the container failed with
+        """
+        with correlation(item['container_number']):
+            index = self.spider.index_of(item, data)
+            # Commands since the previous container, failed containers are not held to the budget
+            commands = self.accounting.lap() if self.accounting is not None else None
+            if isinstance(result, NoRecordError):
+                # Left out of this run, searched again in a later run once the negative cache entry expired
+                if self.negative_cache is not None:
+                    self.negative_cache.add(item['container_number'], str(result))
+                self.spider.update_status(index, 'INITIAL', data)
+                return
+            if isinstance(result, Exception):
+                scheduler.fail(item)
+                self.spider.update_status(index, 'INITIAL', data)
+                return
+            if self.throughput is not None:
+                self.throughput.add(self.browser_rss())
+                logger.info(f"Throughput: {self.throughput}")
+            budget = ', '.join(f"{reason} {seconds:.1f}s" for reason, seconds in sorted(get_clock().lap().items()))
+            logger.info(f"Waited for container {item['container_number']}: {budget or 'nothing'}")
+            if commands is not None:
+                logger.info(f"WebDriver commands for container {item['container_number']}: "
+                            f"{self.accounting.summary(commands)}")
+                self.accounting.check(commands, f"for container {item['container_number']}")
+            scheduler.observe(item, result)
+            if scheduler.reschedule(item):
+                self.spider.update_status(index, 'INITIAL', data)
+            else:
+                self.spider.delete_object(index, data)
+
+    def collect(self, pending, scheduler, data, wait=False):
+        """
+        Write the output of and settle the containers whose page was parsed in the parse pool
+        :param pending: dict of container_number -> (item, Future of the output document, check)
+        :param wait: wait for every pending page instead of only taking the parsed ones
+        """
+        for container_number, (item, future, check) in list(pending.items()):
+            if not (wait or future.done()):
+                continue
+            del pending[container_number]
+            try:
+                result = self.write_result(container_number, future, check)
+            except Exception as e:
+                logger.error(f"Exception occurred while parsing container {container_number}: {e}")
+                result = e
+            self.settle(scheduler, data, item, result)
+
+    def scrape_containers(self, batch_size=1, tabs=1, **scheduler_options):
+        """
+        Scrape queued containers, most urgent first
+        :param batch_size: number of containers per search, up to SEARCH_BATCH_LIMIT
+        :param tabs: number of searches running at the same time in tabs of the browser, see scrape_tabs
+        :param scheduler_options: keyword arguments passed to Scheduler (fairness, rescrape_interval, ...)
+        """
+        if tabs > 1:
+            return self.scrape_tabs(tabs, **scheduler_options)
         logger.info("Starting to scrape containers.")
+        batch_size = min(max(batch_size, 1), self.SEARCH_BATCH_LIMIT)
         data = self.spider.read_data()
-        while data:
-            item = data[0]
-            self.spider.update_status(0, 'SCRAPING', data)
+        scheduler = Scheduler(data, **{'clock': get_clock().time, **scheduler_options})
+        self.throughput = Throughput()
+        pending = {}
+        defer = self.parse_pool is not None
+        while scheduler or pending:
+            batch = []
+            while len(batch) < batch_size and (item := self.pop_searchable(scheduler, data)) is not None:
+                batch.append(item)
+            if not batch and pending:
+                self.collect(pending, scheduler, data, wait=True)
+                continue
+            if not batch:
+                wait = scheduler.next_ready_in()
+                logger.info(f"No container ready, sleeping for {wait:.0f} seconds.")
+                get_clock().sleep(wait)
+                continue
+            for item in batch:
+                self.spider.update_status(self.spider.index_of(item, data), 'SCRAPING', data)
+
             try:
-                self.scrape_container(item)
+                if len(batch) == 1:
+                    results = {batch[0]['container_number']: self.scrape_container(batch[0], defer)}
+                else:
+                    results = self.scrape_batch(batch, defer)
             except Exception as e:
                 logger.error(f"Exception occurred while scraping container: {e}")
-                self.spider.update_status(0, 'INITIAL', data)
-                if str(e) == 'Captcha not solved.':
-                    raise e
-            else:
-                self.spider.delete_object(0, data)
+                results = {item['container_number']: e for item in batch}
+
+            for item in batch:
+                result = results[item['container_number']]
+                if isinstance(result, Future):
+                    pending[item['container_number']] = (item, result, len(batch) > 1)
+                else:
+                    self.settle(scheduler, data, item, result)
+            self.collect(pending, scheduler, data)
+            for result in results.values():
+                if isinstance(result, Exception) and str(result) == 'Captcha not solved.':
+                    self.collect(pending, scheduler, data, wait=True)
+                    raise result
+
+    def open_tab(self, url):
+        """ Open url in a new tab without waiting for it to load, return the window handle of the tab """
+        self.driver.switch_to.new_window('tab')
+        self.driver.execute_script("window.location.href = arguments[0];", url)
+        return self.driver.current_window_handle
+
+    def submit_in_tab(self, task, timeout=5):
+        """
+        Submit the search of a task and follow the result window the site opens, if any. The rate governor's
+        search slot is held until the task is done (see release_slot); while no slot is free the task keeps
+        waiting for a later round, so the tabs holding one can finish.
+        :raise: PageLoadError if the form isn't loaded yet, the task stays LOADING
+        """
+        if self.governor is not None and task.slot is None:
+            task.slot = self.governor.acquire(self._proxy, block=False)
+            if task.slot is None:
+                return
+        before = set(self.driver.window_handles)
+        try:
+            self.submit_search_form(task.container_number)
+        except Exception as e:
+            # E.g. the cargo selector isn't there yet
+            raise PageLoadError(e) from e
+        task.set_state(TabTask.SEARCHING)
+        deadline = get_clock().time() + timeout
+        while get_clock().time() < deadline:
+            opened = set(self.driver.window_handles) - before
+            if opened:
+                self.driver.close()
+                task.handle = opened.pop()
+                self.driver.switch_to.window(task.handle)
+                return
+            get_clock().sleep(0.1)
+
+    def release_slot(self, task):
+        """ Give back the rate governor's search slot of a tab task """
+        if task.slot is not None:
+            self.governor.release(task.slot)
+            task.slot = None
+
+    def advance_tab(self, task, timeout=60):
+        """
+        Take one non-blocking step of a tab task: submit the form once it's loaded, solve the captcha once it
+        shows (captchas are solved one at a time, on the tab brought to the front) and scrape the result
+        :raise: Exception if the tab is stuck longer than `timeout` seconds or the captcha wasn't solved
+        """
+        with correlation(task.container_number):
+            self.driver.switch_to.window(task.handle)
+            if task.state == TabTask.LOADING:
+                try:
+                    if self.find_element(By.ID, 'SEARCH_NUMBER') is None:
+                        raise PageLoadError("Search field not loaded yet.")
+                    self.submit_in_tab(task)
+                except PageLoadError as e:
+                    # Like initiate_search, keep trying in later rounds until the timeout
+                    if task.waited() > timeout:
+                        raise PageLoadError(f"Page failed to load in {timeout} seconds.") from e
+                    logger.debug(f"Search form of {task.container_number} not ready: {e}")
+                return
+
+            slider = self.find_element(By.XPATH, '//*[@class="verify-move-block"]')
+            if slider is not None and slider.is_displayed():
+                self.driver.execute_cdp_cmd('Page.bringToFront', {})
+                self.current_search = task.container_number
+                task.captcha_attempts += 1
+                task.captcha_failed = not self.handle_captcha()
+                self.report_governor('failed' if task.captcha_failed else 'captcha')
+                if task.captcha_failed:
+                    if task.captcha_attempts >= self.CAPTCHA_ATTEMPTS:
+                        self.report_proxy(latency=get_clock().time() - task.started, captcha_failed=True)
+                        raise Exception("Captcha not solved.")
+                    logger.warning(f"Captcha attempt {task.captcha_attempts}/{self.CAPTCHA_ATTEMPTS} failed for "
+                                   f"{task.container_number}, retrying with a fresh one.")
+                    self.driver.execute_script("window.location.href = arguments[0];", self.URL)
+                    task.set_state(TabTask.LOADING)
+            elif self.find_element(By.XPATH, '//*[text()="Cargo Tracking"]') is not None:
+                if not task.captcha_attempts:
+                    self.report_governor('ok')
+                self.report_proxy(latency=get_clock().time() - task.started, captcha_failed=task.captcha_failed)
+                future = self.capture(task.container_number)
+                task.finish(future if self.parse_pool is not None else self.write_result(task.container_number, future))
+            elif self.no_record_shown():
+                raise NoRecordError("No record found.")
+            elif task.waited() > timeout:
+                raise Exception(f"No search result in {timeout} seconds.")
+
+    def scrape_tabs(self, tabs=3, timeout=60, poll_interval=0.2, **scheduler_options):
+        """
+        Scrape queued containers with up to `tabs` searches in flight in tabs of the same browser. Page loads
+        overlap, captchas are solved one at a time. Every task owns its window handle explicitly.
+        :param tabs: number of tabs
+        :param timeout: seconds a tab may wait for the form or the result
+        :param poll_interval: seconds between rounds over the tabs
+        :param scheduler_options: keyword arguments passed to Scheduler (fairness, rescrape_interval, ...)
+        """
+        logger.info(f"Starting to scrape containers in {tabs} tabs.")
+        data = self.spider.read_data()
+        scheduler = Scheduler(data, **{'clock': get_clock().time, **scheduler_options})
+        home = self.driver.current_window_handle
+        tasks = []
+        pending = {}
+        self.throughput = Throughput()
+        while scheduler or tasks or pending:
+            # A recycle or a proxy switch waits until the tabs in flight are done
+            while len(tasks) < tabs and not (tasks and (self.monitor is not None and self.monitor.recycle_pending
+                                                        or not self.proxy_healthy())):
+                item = self.pop_searchable(scheduler, data)
+                if item is None:
+                    break
+                if not tasks and self.rotate_proxy():
+                    home = self.driver.current_window_handle
+                    self.move_to_lower_right_corner()
+                if self.monitor is not None and self.monitor.check(self, [home, *(t.handle for t in tasks)],
+                                                                   busy=bool(tasks)):
+                    home = self.driver.current_window_handle
+                    self.move_to_lower_right_corner()
+                self.spider.update_status(self.spider.index_of(item, data), 'SCRAPING', data)
+                tasks.append(TabTask(item, self.open_tab(self.URL)))
+                logger.info(f"Opened tab for container {item['container_number']}.")
+            if not tasks and pending:
+                self.collect(pending, scheduler, data, wait=True)
+                continue
+            if not tasks:
+                wait = scheduler.next_ready_in()
+                logger.info(f"No container ready, sleeping for {wait:.0f} seconds.")
+                get_clock().sleep(wait)
+                continue
+
+            for task in tasks:
+                try:
+                    self.advance_tab(task, timeout)
+                except Exception as e:
+                    logger.error(f"Exception occurred while scraping container {task.container_number}: {e}")
+                    if isinstance(e, NoRecordError):
+                        self.report_governor('ok')
+                    elif not isinstance(e, PageLoadError) and str(e) != 'Captcha not solved.':
+                        self.report_proxy(blocked=True)
+                        self.report_governor('failed')
+                    task.finish(e)
+
+            for task in [task for task in tasks if task.state == TabTask.DONE]:
+                tasks.remove(task)
+                self.release_slot(task)
+                if task.handle in self.driver.window_handles:
+                    self.driver.switch_to.window(task.handle)
+                    self.driver.close()
+                self.driver.switch_to.window(home)
+                if isinstance(task.result, Future):
+                    pending[task.container_number] = (task.item, task.result, False)
+                    continue
+                self.settle(scheduler, data, task.item, task.result)
+                if isinstance(task.result, Exception) and str(task.result) == 'Captcha not solved.':
+                    for other in tasks:
+                        self.release_slot(other)
+                        self.spider.update_status(self.spider.index_of(other.item, data), 'INITIAL', data)
+                    self.collect(pending, scheduler, data, wait=True)
+                    raise task.result
+            self.collect(pending, scheduler, data)
+            get_clock().sleep(poll_interval)
+
+    def scrape_queue(self, work_queue, drain=True):
+        """
+        Scrape containers claimed from a WorkQueue shared with other workers until its shards are drained
+        :param work_queue: WorkQueue instance
+        :param drain: stop once the shards are drained, False keeps waiting for new containers (tracking API)
+        """
+        logger.info(f"Starting to scrape containers from {work_queue.filename}.")
+        while True:
+            items = work_queue.claim()
+            if not items:
+                if drain and not work_queue.pending():
+                    break
+                get_clock().sleep(work_queue.poll_interval)
+                continue
+            item = items[0]
+            container_number = item['container_number']
+            reason = self.skip(item)
+            if reason is not None:
+                work_queue.complete(container_number, reason, self.negative_cache_expiry(reason, container_number))
+                continue
+            with work_queue.heartbeat(container_number):
+                try:
+                    self.scrape_container(item)
+                except NoRecordError as e:
+                    if self.negative_cache is not None:
+                        self.negative_cache.add(container_number, str(e))
+                    work_queue.complete(container_number, 'NO_RECORD',
+                                        self.negative_cache_expiry('NO_RECORD', container_number))
+                except Exception as e:
+                    logger.error(f"Exception occurred while scraping container: {e}")
+                    work_queue.release(container_number, failed=True)
+                    if str(e) == 'Captcha not solved.':
+                        raise e
+                else:
+                    work_queue.complete(container_number)
 
     def move_to_lower_right_corner(self):
-        """Move to lower right corner to avoid mouse binding with captcha."""
+        """
+        Move to lower right corner to avoid mouse binding with captcha.
+        The page cursor is parked through CDP so this works headless; the OS cursor is only moved when a
+        display and pyautogui are available.
+        """
         logger.info("Moving mouse to lower right corner.")
-        screen_width, screen_height = self.auto.auto.size()
-        self.auto.auto.moveTo(screen_width - 1, screen_height - 1)
+        width, height = self.driver.execute_script("return [window.innerWidth, window.innerHeight];")
+        self.driver.execute_cdp_cmd('Input.dispatchMouseEvent', {'type': 'mouseMoved', 'x': width - 1, 'y': height - 1})
+        if self.auto is not None:
+            screen_width, screen_height = self.auto.auto.size()
+            self.auto.auto.moveTo(screen_width - 1, screen_height - 1)
 
     def __call__(self, *args, **kwargs):
         input_filename = Path(args[0]).resolve()
         output_filename = Path(args[1]).resolve()
         output_filename.parent.mkdir(parents=True, exist_ok=True)
 
-        self.spider = Spider(input_filename, output_filename)
-        self.auto = Auto()
+        self.spider = Spider(input_filename, output_filename, kwargs.pop('events_filename', None),
+                             kwargs.pop('parquet_dir', None))
+        self.auto = Auto() if Auto is not None and not (self._headless or self._headless2) else None
         self.move_to_lower_right_corner()
-        self.model = ONNXModel()
-        self.scrape_containers()
+        self.model = kwargs.pop('model', None) or ONNXModel()
+        work_queue = kwargs.pop('work_queue', None)
+        self.governor = kwargs.pop('governor', None)
+        self.telemetry = kwargs.pop('telemetry', None)
+        self.monitor = kwargs.pop('monitor', ResourceMonitor())
+        self.accounting = kwargs.pop('accounting', None) or CommandAccounting()
+        if self.driver is not None:
+            self.accounting.install(self.driver)
+        self.negative_cache = kwargs.pop('negative_cache', None) or \
+            NegativeCache(output_filename.parent / 'negative_cache.sqlite')
+        result_store = kwargs.pop('result_store', None)
+        self.results = ResultStore(result_store) if result_store else None
+        drain = kwargs.pop('drain', True)
+        archive_dir = kwargs.pop('archive_dir', None)
+        self.archive = PageArchive(archive_dir) if archive_dir else None
+        parse_processes = kwargs.pop('parse_processes', 0)
+        self.parse_pool = ProcessPoolExecutor(parse_processes) if parse_processes else None
+        try:
+            if work_queue is not None:
+                Ingestion(work_queue, negative_cache=self.negative_cache).ingest(self.spider.input_filename)
+                self.scrape_queue(work_queue, drain)
+            else:
+                self.scrape_containers(**kwargs)
+        finally:
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown()
+            if self.archive is not None:
+                self.archive.close()
+            if self.results is not None:
+                self.results.close()
+            self.spider.close()
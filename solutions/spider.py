@@ -1,13 +1,19 @@
+import dataclasses
 import json
 import logging
 
+from solutions.events import EventStore
+from solutions.export import ParquetExporter
+
 logger = logging.getLogger(__name__)
 
 
 class Spider:
-    def __init__(self, input_filename, output_filename):
+    def __init__(self, input_filename, output_filename, events_filename=None, parquet_dir=None):
         self.input_filename = input_filename
         self.output_filename = output_filename
+        self.events = EventStore(events_filename) if events_filename else None
+        self.exporter = ParquetExporter(parquet_dir) if parquet_dir else None
         logger.info(f"Spider initialized with input: {input_filename} and output: {output_filename}")
 
     def read_data(self):
@@ -29,6 +35,14 @@ class Spider:
             logger.error(f"Failed to write data to {self.input_filename}: {e}")
             raise
 
+    @staticmethod
+    def index_of(item, data):
+        """ Index of the given item object in data """
+        for i, obj in enumerate(data):
+            if obj is item:
+                return i
+        raise ValueError(f"Item {item.get('container_number')} is not in data")
+
     def update_status(self, index, status, data):
         try:
             data[index]['status'] = status
@@ -47,7 +61,25 @@ class Spider:
             logger.error(f"Failed to delete item at index {index}: {e}")
             raise
 
+    def close(self):
+        if self.events is not None:
+            self.events.close()
+        if self.exporter is not None:
+            self.exporter.close()
+
     def write_output(self, data):
+        """
+        Write one output document
+        :param data: ContainerResult of parser.parse_document (see Scraper.capture)
+        """
+        if self.exporter is not None:
+            self.exporter.write(data)
+        if self.events is not None:
+            container_number = data.containers.container_number
+            data = dataclasses.replace(data, equipment_activities=self.events.add(container_number,
+                                                                                  data.equipment_activities))
+        if str(self.output_filename).endswith('.ndjson'):
+            return self._append_ndjson(data)
         try:
             try:
                 with open(self.output_filename, 'r', encoding='utf-8') as file:
@@ -55,10 +87,20 @@ class Spider:
             except (FileNotFoundError, json.JSONDecodeError):
                 existing_data = []
 
-            existing_data.append(data)
+            existing_data.append(data.to_dict())
             with open(self.output_filename, 'w', encoding='utf-8') as file:
                 json.dump(existing_data, file, indent=4, ensure_ascii=False)
                 logger.info(f"Appended data to {self.output_filename}")
         except Exception as e:
             logger.error(f"Failed to write output to {self.output_filename}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def _append_ndjson(self, data):
+        """ Append one document per line instead of rewriting the whole output file """
+        try:
+            with open(self.output_filename, 'a', encoding='utf-8') as file:
+                file.write(data.to_json() + '\n')
+                logger.info(f"Appended data to {self.output_filename}")
+        except Exception as e:
+            logger.error(f"Failed to write output to {self.output_filename}: {e}")
+            raise
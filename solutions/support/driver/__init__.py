@@ -1,2 +1,37 @@
-from .driver import *
-from .auto import Auto
\ No newline at end of file
+import importlib
+
+CLOCK_NAMES = ('Clock', 'VirtualClock', 'get_clock', 'set_clock', 'use_clock')
+
+
+def _auto():
+    try:
+        from .auto import Auto
+    except Exception:  # pyautogui is optional and fails to import without a display
+        Auto = None
+    return Auto
+
+
+def __getattr__(name):
+    """
+    Selenium, pyautogui and OpenCV are imported on first use, so importing e.g. the proxy module stays cheap.
+    `from solutions.support.driver import *` resolves `__all__` here and therefore loads the driver module.
+    """
+    if name == 'Auto':
+        return _auto()
+    if name in ('Proxy', 'ProxyPool'):
+        return getattr(importlib.import_module('.proxy', __name__), name)
+    if name == 'ResourceMonitor':
+        return importlib.import_module('.monitor', __name__).ResourceMonitor
+    if name in ('DevTools', 'DevToolsError'):
+        return getattr(importlib.import_module('.devtools', __name__), name)
+    if name in ('CommandAccounting', 'CommandBudgetExceeded'):
+        return getattr(importlib.import_module('.accounting', __name__), name)
+    if name in CLOCK_NAMES:
+        return getattr(importlib.import_module('.clock', __name__), name)
+    driver = importlib.import_module('.driver', __name__)
+    if name == '__all__':
+        return [*driver.__all__, 'Auto', 'ResourceMonitor', 'CommandAccounting', 'CommandBudgetExceeded',
+                'DevTools', 'DevToolsError', *CLOCK_NAMES]
+    if name in driver.__all__:
+        return getattr(driver, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
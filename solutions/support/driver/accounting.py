@@ -0,0 +1,115 @@
+import json
+import logging
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class CommandBudgetExceeded(AssertionError):
+    pass
+
+
+class CommandStats:
+    __slots__ = ('count', 'bytes_sent', 'bytes_received', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return (f"{self.count} x {self.seconds / max(self.count, 1) * 1000:.0f} ms, "
+                f"{(self.bytes_sent + self.bytes_received) / 1024:.0f} KB")
+
+
+def _size(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    try:
+        return len(json.dumps(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+class CommandAccounting:
+    """
+    Counts the WebDriver round trips of the driver: number, bytes (JSON payload sizes) and latency per command
+    (findElement, executeScript, actions, executeCdpCommand, ...), between two calls of `lap`.
+
+    With a `budget` the commands of every lap are checked against it, e.g. {'total': 200, 'findElement': 60}.
+    In strict mode (tests) a lap over budget raises CommandBudgetExceeded, otherwise a warning is logged.
+    """
+
+    def __init__(self, budget=None, strict=False):
+        """
+        :param budget: dict of command name (or 'total') -> maximum number of round trips per lap
+        :param strict: raise CommandBudgetExceeded instead of logging a warning
+        """
+        self.budget = budget or {}
+        self.strict = strict
+        self.commands = defaultdict(CommandStats)
+
+    def install(self, driver):
+        """
+        Wrap the command executor of a WebDriver instance. Installing again, with this or another instance,
+        replaces the previous wrapper instead of wrapping it, so every command is counted once.
+        """
+        executor = driver.command_executor
+        if getattr(executor, '_accounting', None) is self:
+            return
+        # The unwrapped execute, kept on the executor by the first install
+        execute = getattr(executor, '_unaccounted_execute', None) or executor.execute
+        executor._unaccounted_execute = execute
+
+        def accounted_execute(command, params):
+            start = time.perf_counter()
+            response = None
+            try:
+                response = execute(command, params)
+            finally:
+                received = _size(response.get('value') if isinstance(response, dict) else response)
+                self.record(command, _size(params), received, time.perf_counter() - start)
+            return response
+
+        executor.execute = accounted_execute
+        executor._accounting = self
+
+    def record(self, command, bytes_sent=0, bytes_received=0, seconds=0.0):
+        stats = self.commands[command]
+        stats.count += 1
+        stats.bytes_sent += bytes_sent
+        stats.bytes_received += bytes_received
+        stats.seconds += seconds
+
+    def lap(self):
+        """ Commands since the last lap, as dict of command -> CommandStats """
+        commands, self.commands = dict(self.commands), defaultdict(CommandStats)
+        return commands
+
+    @staticmethod
+    def summary(commands, top=5):
+        total = sum(stats.count for stats in commands.values())
+        seconds = sum(stats.seconds for stats in commands.values())
+        size = sum(stats.bytes_sent + stats.bytes_received for stats in commands.values())
+        busiest = sorted(commands.items(), key=lambda item: item[1].seconds, reverse=True)[:top]
+        return (f"{total} round trips, {seconds:.1f}s, {size / 1024:.0f} KB"
+                + ''.join(f"; {command} {stats}" for command, stats in busiest))
+
+    def check(self, commands, label=''):
+        """ Compare the commands of a lap with the budget """
+        counts = {'total': sum(stats.count for stats in commands.values()),
+                  **{command: stats.count for command, stats in commands.items()}}
+        over = {name: (counts.get(name, 0), limit) for name, limit in self.budget.items()
+                if counts.get(name, 0) > limit}
+        if not over:
+            return True
+        message = f"WebDriver command budget exceeded {label}: " + ', '.join(
+            f"{name} {count} > {limit}" for name, (count, limit) in over.items())
+        if self.strict:
+            raise CommandBudgetExceeded(message)
+        logger.warning(message)
+        return False
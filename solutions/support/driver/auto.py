@@ -1,12 +1,14 @@
 import logging
 import os.path
 import random
-import time
 from pathlib import Path
 
+import cv2
+import numpy as np
 import pyautogui
 pyautogui.FAILSAFE = False
 
+from .clock import get_clock
 from .delays import Delay
 
 logger = logging.getLogger(__name__)
@@ -14,15 +16,24 @@ logger = logging.getLogger(__name__)
 
 class Auto:
     IMAGE_DIR = str(Path(__file__).resolve().parent.parent / "images")
+    ROI_PADDING = 50
 
-    def __init__(self):
+    def __init__(self, scale=1.0, interval=0.25):
+        """
+        :param scale: factor applied to the template images, e.g. 2 on a HiDPI screen
+        :param interval: seconds between two screenshots while waiting for an image
+        """
         self.auto = pyautogui
         self.delay = Delay()
+        self.scale = scale
+        self.interval = interval
+        self._templates = {}
+        self._last_found = {}
 
     def write(self, content):
         for c in content:
             self.auto.write(c)
-            time.sleep(random.uniform(0.01, 0.1))
+            get_clock().sleep(random.uniform(0.01, 0.1), 'human')
 
     def click_image(self, image_name, timeout=30, confidence=0.8, region=None, random_delay=True):
         pos = self.wait_until_image_found(image_name, timeout, confidence, region)
@@ -33,30 +44,87 @@ class Auto:
         if random_delay:
             self.delay.one10_one()
 
+    def _template(self, image_name):
+        """ Grayscale template loaded and scaled once """
+        template = self._templates.get(image_name)
+        if template is None:
+            image_path = os.path.join(self.IMAGE_DIR, image_name)
+            template = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if template is None:
+                raise FileNotFoundError(f"Image {image_path} not found!")
+            if self.scale != 1:
+                template = cv2.resize(template, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            self._templates[image_name] = template
+        return template
+
+    def grab(self, region=None):
+        """ Grayscale screenshot of the screen or region and its offset on screen """
+        screenshot = self.auto.screenshot(region=region)
+        screen = cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2GRAY)
+        return screen, (region[0], region[1]) if region else (0, 0)
+
+    @staticmethod
+    def _match(screen, template, confidence):
+        """ Top left corner of the best match in screen or None """
+        if screen.shape[0] < template.shape[0] or screen.shape[1] < template.shape[1]:
+            return None
+        _, score, _, location = cv2.minMaxLoc(cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED))
+        return location if score >= confidence else None
+
+    def locate(self, images, confidence=0.8, region=None):
+        """
+        Search all images on a single screenshot. The area around the last position of an image is searched
+        first, the whole screenshot only if it is not found there.
+        :return: i, position of image at center or None
+        """
+        screen, (offset_x, offset_y) = self.grab(region)
+        for i, image_name in enumerate(images):
+            template = self._template(image_name)
+            height, width = template.shape
+            location = None
+            last_found = self._last_found.get(image_name)
+            if last_found is not None:
+                x0 = max(last_found[0] - offset_x - self.ROI_PADDING, 0)
+                y0 = max(last_found[1] - offset_y - self.ROI_PADDING, 0)
+                roi = screen[y0:y0 + height + 2 * self.ROI_PADDING, x0:x0 + width + 2 * self.ROI_PADDING]
+                location = self._match(roi, template, confidence)
+                if location is not None:
+                    location = (location[0] + x0, location[1] + y0)
+            if location is None:
+                location = self._match(screen, template, confidence)
+            if location is not None:
+                x, y = location[0] + offset_x, location[1] + offset_y
+                self._last_found[image_name] = (x, y)
+                return i, (x + width // 2, y + height // 2)
+        return None
+
     def wait_until_image_found(self, image_name, timeout=30, confidence=0.8, region=None):
         """ Wait unless image found, return None or position """
-        image_path = os.path.join(self.IMAGE_DIR, image_name)
-
-        for i in range(timeout):
-            position = self.auto.locateCenterOnScreen(image_path, confidence=confidence, region=region)
-            if position is not None:
+        deadline = get_clock().monotonic() + timeout
+        polls = 0
+        while True:
+            found = self.locate([image_name], confidence, region)
+            if found is not None:
                 logger.info(f"Found {image_name}")
-                return position
-            logger.debug(f"{image_name} not found  | Polls: {i}")
-            time.sleep(1)
-        return None
+                return found[1]
+            logger.debug(f"{image_name} not found  | Polls: {polls}")
+            polls += 1
+            if get_clock().monotonic() + self.interval > deadline:
+                return None
+            get_clock().sleep(self.interval)
 
     def wait_until_image_hide(self, image_name, timeout=30, confidence=0.8, region=None):
-        image_path = os.path.join(self.IMAGE_DIR, image_name)
-
-        for i in range(timeout):
-            position = self.auto.locateCenterOnScreen(image_path, confidence=confidence, region=region)
-            if position is None:
+        deadline = get_clock().monotonic() + timeout
+        polls = 0
+        while True:
+            if self.locate([image_name], confidence, region) is None:
                 logger.info(f"Hide {image_name}")
-                return position
-            logger.debug(f"{image_name} still visible  | Polls: {i}")
-            time.sleep(1)
-        return None
+                return None
+            logger.debug(f"{image_name} still visible  | Polls: {polls}")
+            polls += 1
+            if get_clock().monotonic() + self.interval > deadline:
+                return None
+            get_clock().sleep(self.interval)
 
     def scroll_to_image(self, img_name, scroll_st=50):
         persistence = 0
@@ -71,13 +139,13 @@ class Auto:
                 if persistence == 2:
                     logger.info("Scrolled to interested image")
                     return True
-            time.sleep(1)
+            get_clock().sleep(1)
 
         raise Exception("Cannot scroll to image!")
 
     def multiWait(self, images, confidence=0.8, region=None, timeout=30):
         """
-        Wait until any image found on screen
+        Wait until any image found on screen, all images are searched on one screenshot per poll
         :param images: list of images paths
         :param confidence: percentage of image to match, default 0.8
         :param region: region where image might located, default None means anywhere
@@ -85,17 +153,17 @@ class Auto:
         :raise: TimeoutError
         :return: i, position of image at center
         """
-        polls = int(timeout / len(images))
-        for _ in range(polls + 1):
-            for i, img in enumerate(images):
-                pos = self.wait_until_image_found(image_name=img, confidence=confidence, region=region, timeout=1)
-                if pos is not None:
-                    return i, pos
-
-        raise TimeoutError("No image found on given region")
+        deadline = get_clock().monotonic() + timeout
+        while True:
+            found = self.locate(images, confidence, region)
+            if found is not None:
+                return found
+            if get_clock().monotonic() + self.interval > deadline:
+                raise TimeoutError("No image found on given region")
+            get_clock().sleep(self.interval)
 
     def click_any(self, images, confidence=0.8, region=None, timeout=30, random_delay=True):
-        pos = self.multiWait(images, confidence, region, timeout)
+        _, pos = self.multiWait(images, confidence, region, timeout)
         self.auto.click(*pos)
 
         if random_delay:
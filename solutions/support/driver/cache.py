@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """ Exclusive inter-process lock on a file, blocking until acquired """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a+b')
+        if sys.platform == 'win32':
+            import msvcrt
+            while True:
+                try:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if sys.platform == 'win32':
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+def _write_json_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+
+class DriverCache:
+    """
+    Host wide, content addressed chromedriver cache that is safe for concurrent workers.
+
+    Layout of the cache directory:
+        drivers/<sha256>/chromedriver    immutable driver binaries, named after their content hash
+        current.json                     pointer to the driver in use and the date of the last update check
+        .lock                            file lock serialising updates
+
+    Workers only read `current.json` unless the last check is older than `max_age` days. Updates are
+    downloaded under the lock and published with an atomic rename, so workers never see a half written
+    driver and never delete one another's binary. If the update fails (e.g. offline) the cached driver is
+    kept. The result is memoised per process, so the cache is checked once per process and once per
+    `max_age` per host. Resolving a driver touches its directory, and pruning spares the directories touched
+    within `GRACE` seconds; a memoised driver that was pruned all the same is resolved again.
+    """
+    KEEP = 3
+    GRACE = 24 * 3600
+    _resolved = {}
+
+    def __init__(self, cache_dir, max_age=7, patch_uc=False):
+        """
+        :param cache_dir: cache directory, shared by all workers of the host
+        :param max_age: days after which the driver is checked for updates
+        :param patch_uc: patch the cached binary for undetected_chromedriver once, under the lock
+        """
+        self.cache_dir = Path(cache_dir).resolve()
+        self.max_age = max_age
+        self.patch_uc = patch_uc
+        self.driver_name = 'chromedriver.exe' if sys.platform == 'win32' else 'chromedriver'
+        self.pointer_path = self.cache_dir / 'current.json'
+        self.lock_path = self.cache_dir / '.lock'
+
+    def _read_pointer(self):
+        try:
+            with open(self.pointer_path, 'r') as f:
+                pointer = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not (self.cache_dir / pointer.get('path', '')).is_file():
+            return None
+        return pointer
+
+    def _is_fresh(self, pointer):
+        return pointer is not None and time.time() - pointer.get('checked', 0) < self.max_age * 24 * 3600 and \
+            (pointer.get('patched') or not self.patch_uc)
+
+    def _download(self):
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        return Path(ChromeDriverManager().install()).resolve().parent / self.driver_name
+
+    def _publish(self, source):
+        """ Copy a driver binary into the cache under its content hash """
+        digest = hashlib.sha256(Path(source).read_bytes()).hexdigest()
+        target = self.cache_dir / 'drivers' / digest / self.driver_name
+        if not target.is_file():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix='.tmp')
+            os.close(fd)
+            shutil.copy2(source, tmp_path)
+            os.chmod(tmp_path, 0o755)
+            os.replace(tmp_path, target)
+        return target
+
+    def _patch(self, path):
+        """ Patch the binary for undetected_chromedriver once, so workers don't patch it concurrently """
+        try:
+            from undetected_chromedriver.patcher import Patcher
+            Patcher(executable_path=str(path)).auto()
+        except Exception as e:
+            logger.warning(f"Failed to patch {path} for undetected_chromedriver: {e}")
+            return False
+        return True
+
+    def _prune(self, keep_path):
+        now = time.time()
+        drivers = sorted((self.cache_dir / 'drivers').glob('*'), key=lambda p: p.stat().st_mtime, reverse=True)
+        for directory in drivers[self.KEEP:]:
+            # Other workers may still be using a driver they resolved recently
+            if directory != keep_path.parent and now - directory.stat().st_mtime >= self.GRACE:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def _update(self):
+        pointer = self._read_pointer()
+        if self._is_fresh(pointer):
+            return pointer
+
+        logger.info("Checking chromedriver for updates ...")
+        try:
+            path = self._publish(self._download())
+        except Exception as e:
+            if pointer is None:
+                raise
+            logger.warning(f"Chromedriver update failed, using cached driver: {e}")
+            path = self.cache_dir / pointer['path']
+        else:
+            logger.info(f"Chromedriver cached at {path}")
+
+        patched = pointer is not None and pointer.get('patched') and self.cache_dir / pointer['path'] == path
+        if self.patch_uc and not patched:
+            patched = self._patch(path)
+        pointer = {'path': str(path.relative_to(self.cache_dir)), 'checked': time.time(), 'patched': bool(patched)}
+        _write_json_atomic(self.pointer_path, pointer)
+        self._prune(path)
+        return pointer
+
+    def executable_path(self):
+        """ Path of the chromedriver binary, downloading or updating it if needed """
+        key = (self.cache_dir, self.patch_uc)
+        path = self._resolved.get(key)
+        if path is not None and path.is_file():
+            return path
+
+        pointer = self._read_pointer()
+        if not self._is_fresh(pointer):
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with FileLock(self.lock_path):
+                pointer = self._update()
+        path = self._resolved[key] = self.cache_dir / pointer['path']
+        try:
+            os.utime(path.parent)
+        except OSError as e:  # e.g. a read-only cache, pruning then only goes by the publish time
+            logger.debug(f"Failed to mark {path.parent} as used: {e}")
+        return path
@@ -0,0 +1,86 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Clock:
+    """
+    Time source and sleeper used by every delay, wait and retry of the driver and the scraper.
+
+    Sleeps are tagged with a reason: 'human' for humanlike pauses (typing, clicks, Delay) and 'poll' for
+    waiting on the page. Humanlike pauses are multiplied by `human_scale`, the single knob for how slow the
+    scraper behaves, and the time spent per reason is accounted so the delay budget of a container can be
+    measured (see `lap`).
+    """
+
+    def __init__(self, human_scale=1.0):
+        """
+        :param human_scale: factor applied to humanlike pauses, e.g. 0.5 to halve them
+        """
+        self.human_scale = human_scale
+        self.spent = defaultdict(float)
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def _sleep(self, seconds):
+        time.sleep(seconds)
+
+    def sleep(self, seconds, reason='poll'):
+        if reason == 'human':
+            seconds *= self.human_scale
+        if seconds <= 0:
+            return
+        self.spent[reason] += seconds
+        self._sleep(seconds)
+
+    def lap(self):
+        """ Seconds slept per reason since the last lap """
+        spent, self.spent = dict(self.spent), defaultdict(float)
+        return spent
+
+
+class VirtualClock(Clock):
+    """ Clock whose sleeps return immediately and only advance its time, for tests and offline benchmarks """
+
+    def __init__(self, start=0.0, human_scale=1.0):
+        super().__init__(human_scale)
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def _sleep(self, seconds):
+        self.now += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+_clock = Clock()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(clock):
+    """ Replace the clock used everywhere, return the previous one """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+@contextmanager
+def use_clock(clock):
+    previous = set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
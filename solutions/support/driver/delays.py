@@ -1,12 +1,14 @@
 import logging
 import random
 import sys
-import time
 
 from multiprocessing.context import TimeoutError
 from multiprocessing.pool import ThreadPool
 import concurrent.futures
 import functools
+
+from .clock import get_clock
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,7 +27,7 @@ class Delay:
 
     def _sleep(self, secs):
         logger.debug(f"[Delay] Sleeping for {secs} seconds")
-        time.sleep(secs)
+        get_clock().sleep(secs, 'human')
 
     def one100_one1000(self):
         """Sleep Program for Random Between 0.001 - 0.01 seconds"""
@@ -0,0 +1,196 @@
+import base64
+import json
+import logging
+import time
+
+from .clock import get_clock
+
+logger = logging.getLogger(__name__)
+
+# Finds the first element of a Selenium locator (by, value) in the page, used for queries over DevTools
+LOCATE_JS = """
+function locate(by, value) {
+    switch (by) {
+        case 'id': return document.getElementById(value);
+        case 'xpath': return document.evaluate(value, document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        case 'name': return document.getElementsByName(value)[0] || null;
+        case 'class name': return document.getElementsByClassName(value)[0] || null;
+        case 'tag name': return document.getElementsByTagName(value)[0] || null;
+        case 'link text': return [...document.links].find(a => a.textContent.trim() === value) || null;
+        default: return document.querySelector(value);
+    }
+}
+"""
+
+
+class DevToolsError(Exception):
+    pass
+
+
+class DevTools:
+    """
+    Direct connection to the DevTools websocket of one page target, next to chromedriver.
+
+    Commands can be sent without waiting for their response (`send`), so a series of mouse events or a query
+    and a screenshot cost one round trip instead of one chromedriver HTTP request each. Chrome accepts several
+    DevTools clients per target, so chromedriver keeps working on the same page for everything else.
+    """
+
+    def __init__(self, debugger_address, target_id, timeout=10, accounting=None):
+        """
+        :param debugger_address: host:port of the browser's remote debugging endpoint
+        :param target_id: id of the page target, the same as its Selenium window handle
+        :param timeout: seconds to wait for a response
+        :param accounting: CommandAccounting to record the round trips in, as "devtools:<method>" of the first
+            command sent in the round trip
+        """
+        try:
+            import websocket
+        except ImportError:
+            raise ImportError("websocket-client is required for the DevTools transport: pip install websocket-client")
+        self.target_id = target_id
+        self.timeout = timeout
+        self.accounting = accounting
+        self.pressed = None
+        self._last_id = 0
+        self._results = {}
+        self._sent = {}
+        # A timed out or dropped connection is reported as DevToolsError, so callers fall back to chromedriver
+        self._connection_errors = (websocket.WebSocketException, OSError)
+        url = f"ws://{debugger_address}/devtools/page/{target_id}"
+        # Without an Origin header Chrome accepts the connection regardless of --remote-allow-origins
+        self._ws = websocket.create_connection(url, timeout=timeout, suppress_origin=True)
+        logger.debug(f"Connected to DevTools of {target_id}")
+
+    @classmethod
+    def attach(cls, driver, handle=None, **kwargs):
+        """ Connect to the page of a window of a chromedriver (or undetected_chromedriver) session """
+        address = driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        if not address:
+            raise DevToolsError("Browser exposes no DevTools debugger address")
+        return cls(address, handle or driver.current_window_handle, **kwargs)
+
+    @property
+    def connected(self):
+        return self._ws is not None and self._ws.connected
+
+    def send(self, method, params=None):
+        """ Send a command without waiting for its response, return its id """
+        self._last_id += 1
+        message = json.dumps({'id': self._last_id, 'method': method, 'params': params or {}})
+        try:
+            self._ws.send(message)
+        except self._connection_errors as e:
+            raise DevToolsError(f"DevTools connection failed: {e!r}") from e
+        self._sent[self._last_id] = (method, len(message))
+        return self._last_id
+
+    def receive(self, ids):
+        """ Wait for the responses of the given command ids, return their results in the same order """
+        start = time.perf_counter()
+        received = 0
+        while not all(i in self._results for i in ids):
+            if time.perf_counter() - start > self.timeout:
+                raise DevToolsError(f"No DevTools response within {self.timeout} seconds")
+            try:
+                message = self._ws.recv()
+            except self._connection_errors as e:
+                raise DevToolsError(f"DevTools connection failed: {e!r}") from e
+            received += len(message)
+            message = json.loads(message)
+            # Events are ignored, no domain is enabled on this connection
+            if 'id' in message:
+                self._results[message['id']] = message
+        sent = [self._sent.pop(i) for i in ids]
+        if self.accounting is not None and sent:
+            self.accounting.record(f"devtools:{sent[0][0]}", sum(size for _, size in sent), received,
+                                   time.perf_counter() - start)
+        results = []
+        for i in ids:
+            message = self._results.pop(i)
+            if 'error' in message:
+                raise DevToolsError(message['error'].get('message', message['error']))
+            results.append(message.get('result', {}))
+        return results
+
+    def pipeline(self, commands):
+        """
+        Send all commands, then wait for all responses
+        :param commands: iterable of (method, params)
+        :return: list of results
+        """
+        return self.receive([self.send(method, params) for method, params in commands])
+
+    def call(self, method, params=None):
+        return self.pipeline([(method, params)])[0]
+
+    def evaluate(self, expression):
+        """ Value of a JavaScript expression in the page """
+        result = self.call('Runtime.evaluate', {'expression': expression, 'returnByValue': True})
+        if 'exceptionDetails' in result:
+            raise DevToolsError(result['exceptionDetails'].get('text', 'JavaScript exception'))
+        return result['result'].get('value')
+
+    def first_present(self, locators, visible=False):
+        """
+        Index of the first locator with an element in the page, None if there is none, in one round trip
+        :param locators: Selenium locators (by, value)
+        :param visible: only count elements that are rendered
+        """
+        index = self.evaluate(
+            f"(() => {{{LOCATE_JS}"
+            f"const locators = {json.dumps([list(locator) for locator in locators])};"
+            f"return locators.findIndex(([by, value]) => {{ const e = locate(by, value);"
+            f"return e !== null && (!{json.dumps(visible)} || e.getClientRects().length > 0); }});}})()"
+        )
+        return None if index is None or index < 0 else index
+
+    def _mouse_event(self, kind, x, y, button=None):
+        held = {'mousePressed': button, 'mouseReleased': None}.get(kind, self.pressed)
+        params = {'type': kind, 'x': x, 'y': y, 'button': button or self.pressed or 'none',
+                  'buttons': 1 if held == 'left' else 0}
+        if kind != 'mouseMoved':
+            params['clickCount'] = 1
+        return 'Input.dispatchMouseEvent', params
+
+    def mouse_path(self, points, interval=0.0):
+        """
+        Move the mouse along absolute viewport points, holding the pressed button if any. The events are sent
+        `interval` seconds (humanlike pause) apart without waiting for the browser, then confirmed at once.
+        """
+        ids = []
+        for i, (x, y) in enumerate(points):
+            if i and interval:
+                get_clock().sleep(interval, 'human')
+            ids.append(self.send(*self._mouse_event('mouseMoved', x, y)))
+        self.receive(ids)
+
+    def mouse_down(self, x, y, button='left'):
+        self.call(*self._mouse_event('mousePressed', x, y, button))
+        self.pressed = button
+
+    def mouse_up(self, x, y):
+        button, self.pressed = self.pressed or 'left', None
+        self.call(*self._mouse_event('mouseReleased', x, y, button))
+
+    def screenshot(self, locator):
+        """ PNG bytes of the element of a Selenium locator, like WebElement.screenshot_as_png """
+        clip = self.evaluate(
+            f"(() => {{{LOCATE_JS}const e = locate(...{json.dumps(list(locator))});"
+            f"if (e === null) return null; const r = e.getBoundingClientRect();"
+            f"return {{x: r.x + window.scrollX, y: r.y + window.scrollY, width: r.width, height: r.height, "
+            f"scale: 1}};}})()"
+        )
+        if clip is None:
+            raise DevToolsError(f"No element at {locator}")
+        data = self.call('Page.captureScreenshot', {'format': 'png', 'clip': clip})['data']
+        return base64.b64decode(data)
+
+    def close(self):
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception as e:
+                logger.debug(f"Error while closing DevTools connection: {e}")
+            self._ws = None
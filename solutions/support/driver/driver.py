@@ -1,9 +1,7 @@
+import copy
 import logging
 import random
-import shutil
-import sys
-import time
-from datetime import datetime, timedelta
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Union, Callable, Tuple, Dict, Optional, Any
 
@@ -37,8 +35,12 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.select import Select
 from selenium.webdriver.support.wait import WebDriverWait
 
+from .cache import DriverCache
+from .clock import get_clock
+from .devtools import DevTools, DevToolsError
+
 try:
-    from .proxy import Proxy
+    from .proxy import Proxy, ProxyPool
 except ImportError:
     pass
 
@@ -85,6 +87,10 @@ class Selenium:
         WebDriverException
     )
     current_position = (0, 0)
+    # CommandAccounting installed on every driver this instance starts
+    accounting = None
+    # Humanlike pause between the mouse events of move_human over DevTools
+    DEVTOOLS_MOUSE_INTERVAL = 0.004
 
     def __init__(
             self,
@@ -102,6 +108,7 @@ class Selenium:
             extensions: List[str] or Tuple[str] = (),
             options: Optional[Any] = None,
             user_agent: str = None,
+            devtools: bool = False,
             start: bool = False,
     ):
         """
@@ -109,7 +116,7 @@ class Selenium:
         :param webdriver_name: The webdriver to use for the class. Default is "chrome" (chrome|uc|seleniumbase)
         :param user_data_dir: The path to the user data directory. Default is None
         :param incognito: A boolean indicating whether to start the browser in incognito mode. Default is False
-        :param proxy: Proxy object
+        :param proxy: Proxy object, or a ProxyPool to acquire one from (rotated by rotate_proxy when it turns unhealthy)
         :param headless: A boolean indicating whether to run the browser in headless mode. Default is False (Old method)
         :param headless2: A boolean indicating whether to run the browser in headless mode. Default is False
         :param load_full: A boolean indicating whether to load the full page or just the visible content. Default is False
@@ -118,6 +125,7 @@ class Selenium:
         :param args: A tuple of strings representing command line arguments to pass to the browser
         :param extensions: A tuple of strings representing the path to the browser extensions to be loaded
         :param options: An instance of a class that contains additional options for the browser. Default is None
+        :param devtools: A boolean indicating whether direct_transport may use the DevTools websocket. Default is False
         :param start: A boolean indicating whether to start the browser immediately after initialization. Default is False
         """
         self._webdriver = webdriver_name
@@ -131,18 +139,23 @@ class Selenium:
         self._extensions = extensions
         self._args = args
         self._zoom = zoom
-        self._proxy = proxy
+        self._proxy = proxy.acquire() if isinstance(proxy, ProxyPool) else proxy
         self._current_dir = Path(__file__).resolve().parent
         self._driver_executable_dir = self._current_dir / '.wdm'
-        self._driver_name = 'chromedriver.exe' if sys.platform == 'win32' else 'chromedriver'
-        self._driver_executable_path = self._driver_executable_dir / self._driver_name
-        self._driver_dist_path = self._driver_executable_dir / 'dist-info.txt'
+        self._driver_executable_path = None
+        # Untouched copy of the given options: a browser takes ownership of its options object (undetected
+        # chromedriver refuses to start with one used before), so every start gets fresh options
+        self._given_options = None if options is None else copy.deepcopy(options)
         self._options = self._init_options() if options is None else options
 
         self.driver: webdriver.Chrome = None  # noqa
         self.actions: ActionChains = None  # noqa
         self.wait: WebDriverWait = None  # noqa
         self.timeout = timeout
+        self._devtools = devtools
+        self._devtools_sessions = {}
+        # DevTools connection of the current window inside direct_transport, else None
+        self.devtools: Optional[DevTools] = None
 
         self.start() if start else None
         self._load_wind_mouse()
@@ -153,32 +166,10 @@ class Selenium:
             from .wind_mouse import wind_mouse
             self.wind_mouse = wind_mouse
 
-    def _install_chromedriver(self):
-        from webdriver_manager.chrome import ChromeDriverManager
-
-        self._driver_executable_dir.mkdir(parents=True, exist_ok=True)
-        wdm_driver_path = Path(ChromeDriverManager().install()).resolve().parent / self._driver_name
-        shutil.copy2(wdm_driver_path, self._driver_executable_path)
-        with open(self._driver_dist_path, 'w') as f:
-            f.write(datetime.now().strftime('%y/%m/%d'))
-
     def _install_webdriver(self):
-        if not self._driver_executable_path.exists():
-            logger.info("Driver not found. Downloading a new one ...")
-            self._install_chromedriver()
-            logger.info("Chromedriver downloaded.")
-        else:
-            with open(self._driver_dist_path, 'r') as f:
-                date = datetime.strptime(f.read(), '%y/%m/%d')
-            if datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=7) > date:
-                logger.info("Webdriver is older than 7 days.\nUpdating ...")
-                try:
-                    shutil.rmtree(self._driver_executable_dir)
-                except (OSError, PermissionError):
-                    logger.error("Failed to delete webdriver directory. Terminating ...")
-                    sys.exit(1)
-
-                self._install_chromedriver()
+        """ Resolve chromedriver from the host wide cache, see DriverCache """
+        cache = DriverCache(self._driver_executable_dir, patch_uc=self._webdriver == 'uc')
+        self._driver_executable_path = cache.executable_path()
 
     def _init_options(self):
         """ Initialize Options class using given params """
@@ -189,6 +180,7 @@ class Selenium:
         options.add_argument("--headless=new") if self._headless2 else None
         options.add_argument("--blink-settings=imagesEnabled=false") if self._remove_images else None
         options.add_argument("--headless") if self._headless and not self._headless2 else None
+        options.add_argument("--window-size=1920,1080") if self._headless or self._headless2 else None
         options.add_argument(f"--user-data-dir={self._user_data_dir}") if self._user_data_dir else None
         options.add_argument("--incognito") if self._incognito else ''
         options.add_argument(f"--force-device-scale-factor={self._zoom} --high-dpi-support={self._zoom}") \
@@ -219,7 +211,6 @@ class Selenium:
         """ Start webdriver (uc, webdriver, seleniumBase) """
         logger.debug(f"Starting webdriver {self._webdriver}")
         if self._webdriver.lower() == "chrome":
-            from webdriver_manager.chrome import ChromeDriverManager
             from selenium.webdriver.chrome.service import Service
 
             self._install_webdriver()
@@ -242,6 +233,8 @@ class Selenium:
         else:
             raise NotImplementedError(f"{self._webdriver} is not implemented yet!")
 
+        if self.accounting is not None:
+            self.accounting.install(self.driver)
         self.wait = WebDriverWait(self.driver, self.timeout)
         self.actions = ActionChains(self.driver, duration=0)
         logger.debug(f"Webdriver \"{self._webdriver}\" is ready to use!")
@@ -279,22 +272,132 @@ class Selenium:
         # If no element is found in any iframe, return None
         return None
 
-    def clear_cache(self):
-        self.driver.get('chrome://settings/clearBrowserData')
-        script = """
-        document.querySelector("body > settings-ui").shadowRoot.querySelector("#main").shadowRoot.querySelector(
-        "settings-basic-page").shadowRoot.querySelector("#basicPage > settings-section:nth-child(
-        10) > settings-privacy-page").shadowRoot.querySelector(
-        "settings-clear-browsing-data-dialog").shadowRoot.querySelector("#clearBrowsingDataConfirm").click()
+    def clear_cache(self, origin=None):
+        """
+        Clear browser cache and cookies through CDP, and the storage of `origin` (e.g. "https://www.oocl.com")
+        or of the current page if not given
         """
-        for _ in range(15):
+        origin = origin or self.driver.execute_script("return window.location.origin;")
+        try:
+            self.driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+            self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            if origin and origin.startswith('http'):
+                self.driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+        except WebDriverException as e:
+            logger.warning(f"Failed to clear browser data: {e}")
+            return False
+        logger.debug(f"Cleared browser cache and storage of {origin}")
+        return True
+
+    def close_other_windows(self, keep=None):
+        """
+        Close every window except `keep` and switch back to the current window, or to the first kept one if the
+        current window was closed
+        :param keep: window handle or collection of handles, default the current window
+        """
+        current = self.driver.current_window_handle
+        keep = [keep or current] if keep is None or isinstance(keep, str) else list(keep)
+        for handle in self.driver.window_handles:
+            if handle not in keep:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+        self.driver.switch_to.window(current if current in keep else keep[0])
+
+    def browser_rss(self):
+        """ Resident memory in bytes of chromedriver and the browser processes, None if psutil is missing """
+        try:
+            import psutil
+        except ImportError:
+            return None
+        pid = getattr(self.driver, 'browser_pid', None) or self.driver.service.process.pid
+        try:
+            process = psutil.Process(pid)
+            processes = [process, *process.children(recursive=True)]
+        except psutil.Error:
+            return None
+        rss = 0
+        for p in processes:
             try:
-                self.driver.execute_script(script)
-            except JavascriptException:
-                time.sleep(1)
-            else:
-                return True
-        return False
+                rss += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def devtools_session(self, handle=None):
+        """
+        DevTools connection of a window, default the current one, reused while it stays open
+        :return: None if the DevTools transport is off or can't connect, callers then use chromedriver
+        """
+        if not self._devtools:
+            return None
+        handle = handle or self.driver.current_window_handle
+        session = self._devtools_sessions.get(handle)
+        if session is not None and session.connected:
+            return session
+        # Connections of closed windows are closed by the browser
+        self._devtools_sessions = {h: s for h, s in self._devtools_sessions.items() if s.connected}
+        try:
+            session = DevTools.attach(self.driver, handle, timeout=self.timeout, accounting=self.accounting)
+        except Exception as e:  # websocket-client missing, no debugger address or the handshake failed
+            logger.warning(f"DevTools transport unavailable, using chromedriver: {e}")
+            self._devtools = False
+            return None
+        self._devtools_sessions[handle] = session
+        return session
+
+    @contextmanager
+    def direct_transport(self):
+        """
+        Send the mouse moves, element screenshots and multiWait polls of the current window over its DevTools
+        websocket instead of chromedriver, if the transport is on
+        """
+        previous, self.devtools = self.devtools, self.devtools_session()
+        try:
+            yield self.devtools
+        finally:
+            self.devtools = previous
+
+    def _close_devtools(self):
+        for session in self._devtools_sessions.values():
+            session.close()
+        self._devtools_sessions = {}
+        self.devtools = None
+
+    def recycle(self):
+        """ Restart the browser with the same (freshly built) options, e.g. to give back memory on long runs """
+        logger.info("Recycling browser")
+        self._close_devtools()
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error while quitting browser: {e}")
+        self.current_position = (0, 0)
+        self._options = self._init_options() if self._given_options is None else copy.deepcopy(self._given_options)
+        self.start()
+
+    def proxy_healthy(self):
+        """ False once the proxy taken from a ProxyPool is evicted or cooling down """
+        pool = getattr(self._proxy, 'pool', None)
+        return pool is None or pool.healthy(self._proxy)
+
+    def rotate_proxy(self):
+        """
+        Restart the browser with the healthiest proxy of the pool once the current one is evicted or cooling down
+        :return: True if the browser was restarted with another proxy
+        """
+        if self.proxy_healthy():
+            return False
+        pool = self._proxy.pool
+        try:
+            proxy = pool.acquire()
+        except LookupError:
+            logger.warning(f"Proxy {self._proxy.host}:{self._proxy.port} is unhealthy and no other proxy is available")
+            return False
+        logger.info(f"Switching from proxy {self._proxy.host}:{self._proxy.port} to {proxy.host}:{proxy.port}")
+        pool.release(self._proxy)
+        self._proxy = proxy
+        self.recycle()
+        return True
 
     def text(self, by, value, timeout=10, js_text=True, multiple=False, joiner=', ', ignore_values=(),
              ignore_exceptions=(StaleElementReferenceException, NoSuchElementException),
@@ -317,10 +420,10 @@ class Selenium:
                     if not t:
                         raise NoSuchElementException
             except ignore_exceptions:
-                time.sleep(1)
+                get_clock().sleep(1)
             else:
                 if ignore_values and t in ignore_values:
-                    time.sleep(1)
+                    get_clock().sleep(1)
                 else:
                     return t.strip()
 
@@ -340,7 +443,7 @@ class Selenium:
                 else:
                     e.click()
             except (StaleElementReferenceException, JavascriptException, NoSuchElementException):
-                time.sleep(1)
+                get_clock().sleep(1)
             else:
                 return True
 
@@ -374,7 +477,7 @@ class Selenium:
                 else:
                     return a
             except (StaleElementReferenceException, NoSuchElementException):
-                time.sleep(1)
+                get_clock().sleep(1)
 
             i += 1
             if i == timeout:
@@ -398,6 +501,21 @@ class Selenium:
             y = int(rect['y'] + rect['height'] / 2)
         x, y = self.current_position[0] + x, self.current_position[1] + y
         points = self.wind_mouse(*self.current_position, x, y, W_0=7, M_0=8, rel_points=True)
+        if self.devtools is not None:
+            path = []
+            px, py = self.current_position
+            for dx, dy in points:
+                px, py = px + dx, py + dy
+                path.append((px, py))
+            try:
+                self.devtools.mouse_path(path, self.DEVTOOLS_MOUSE_INTERVAL)
+            except DevToolsError as e:
+                # Finish the move over chromedriver, and stay on it for the rest of the direct_transport block
+                logger.warning(f"DevTools mouse move failed, using chromedriver: {e}")
+                self.devtools = None
+            else:
+                self.current_position = (x, y)
+                return
         for point in points:
             try:
                 self.actions.move_by_offset(xoffset=point[0], yoffset=point[1]).perform()
@@ -422,7 +540,31 @@ class Selenium:
         else:
             assert element is not None, "How can you click_js without knowing element?"
             self.click_js(element)
-        time.sleep(delay)
+        get_clock().sleep(delay, 'human')
+
+    def click_and_hold(self, element):
+        """ Press the left mouse button on the center of an element """
+        if self.devtools is not None:
+            rect = self.driver.execute_script("return arguments[0].getBoundingClientRect()", element)
+            x, y = rect['x'] + rect['width'] / 2, rect['y'] + rect['height'] / 2
+            self.devtools.mouse_path([(x, y)])
+            self.devtools.mouse_down(x, y)
+            self.current_position = (x, y)
+        else:
+            self.actions.click_and_hold(element).perform()
+
+    def release(self, element=None):
+        """ Release the mouse button, over the element if given (the pointer stays put over DevTools) """
+        if self.devtools is not None:
+            self.devtools.mouse_up(*self.current_position)
+        else:
+            self.actions.release(element).perform()
+
+    def element_screenshot(self, by, value):
+        """ PNG bytes of an element, over DevTools inside direct_transport """
+        if self.devtools is not None:
+            return self.devtools.screenshot((by, value))
+        return self.find_element(by, value).screenshot_as_png
 
     def stop_page_loading(self):
         self.driver.execute_cdp_cmd("Page.stopLoading", {})
@@ -437,7 +579,7 @@ class Selenium:
                 self.driver.execute_script(f'arguments[0].value += "{x}"', element)
             else:
                 element.send_keys(x)
-            time.sleep(random.uniform(0.1, 0.4))
+            get_clock().sleep(random.uniform(0.1, 0.4), 'human')
 
     def set_value(self, e, value):
         """ Set value using javascript or simply send keys to input box """
@@ -496,14 +638,36 @@ class Selenium:
                 persistency = 0
             _prev_id = ID
             logger.info(f"Visible locator: {locators[ID]} && Persistency: {persistency + 1} second")
-            time.sleep(1)
+            get_clock().sleep(1)
             persistency += 1
         return ID
 
     def multiWait(self, locators, output_type='id', refresh_url_every_n_sec=None):
-        """ Same as multiWait with driver and timeout param filled """
+        """
+        Same as multiWait with driver and timeout param filled. Inside direct_transport, locator tuples are
+        polled together in one DevTools query instead of one chromedriver request each
+        """
+        if (self.devtools is not None and output_type == 'id' and refresh_url_every_n_sec is None
+                and all(isinstance(loc, tuple) for loc in locators)):
+            try:
+                return self._multiWait_devtools(locators)
+            except DevToolsError as e:
+                logger.debug(f"DevTools multiWait failed, using chromedriver: {e}")
         return multiWait(self.driver, locators, self.timeout, output_type, refresh_url_every_n_sec)
 
+    def _multiWait_devtools(self, locators, poll_frequency=0.25):
+        # multiWait gives every locator up to a second per poll, for at most `timeout` polls
+        clock = get_clock()
+        deadline = clock.monotonic() + self.timeout * len(locators)
+        while True:
+            index = self.devtools.first_present(locators)
+            if index is not None:
+                logger.debug(f"Element found at {locators[index]}")
+                return index
+            if clock.monotonic() >= deadline:
+                raise TimeoutException("None of the given element is present in the DOM!")
+            clock.sleep(poll_frequency)
+
     def is_element_in_viewport(self, element):
         """ Is element visible on viewport """
         size = element.size
@@ -541,6 +705,9 @@ class Selenium:
     def quit(self):
         """ Exit webdriver, also stop recording if needed """
         logger.info("Quitting driver")
+        if self._proxy is not None and getattr(self._proxy, 'pool', None) is not None:
+            self._proxy.pool.release(self._proxy)
+        self._close_devtools()
         self.driver.quit()
 
     def refresh(self):
@@ -606,7 +773,7 @@ class Selenium:
                         _y += incremental_stepY
                     else:
                         is_y = True
-                    time.sleep(sleep)
+                    get_clock().sleep(sleep, 'human')
 
                     if is_x and is_y:
                         break
@@ -622,7 +789,7 @@ class Selenium:
                         _y += incremental_stepY
                     else:
                         is_y = True
-                    time.sleep(sleep)
+                    get_clock().sleep(sleep, 'human')
 
                     if is_x and is_y:
                         break
@@ -676,10 +843,25 @@ class length_of_window_handles_less_than(object):
         return len(driver.window_handles) < self.expected_count
 
 
+def _until(driver, condition, timeout=1, poll_frequency=0.5):
+    """ Same as WebDriverWait(driver, timeout).until(condition), on the clock of get_clock() """
+    clock = get_clock()
+    deadline = clock.monotonic() + timeout
+    while True:
+        try:
+            value = condition(driver)
+            if value:
+                return value
+        except NoSuchElementException:
+            pass
+        if clock.monotonic() >= deadline:
+            raise TimeoutException()
+        clock.sleep(poll_frequency)
+
+
 def _multiWait(driver, locators, max_polls, output_type):
     """ multiWait in given timeout """
     logger.debug(f"Locators: {locators} and Max-Polls: {max_polls}")
-    wait = WebDriverWait(driver, 1)
     cp = 0
     while cp < max_polls:
         cp += 1
@@ -695,14 +877,14 @@ def _multiWait(driver, locators, max_polls, output_type):
                         function_kwds = {}
                     if func(*function_args, **function_kwds):
                         return i
-                    time.sleep(1)
+                    get_clock().sleep(1)
                 else:
                     ec = loc.get('ec')
                     if ec is None:
                         ec = EC.presence_of_element_located(loc.get('locator'))
                     methods = loc.get('methods')
                     try:
-                        element = wait.until(ec)
+                        element = _until(driver, ec)
                         logger.debug(f"Element found at {loc.get('locator')}")
                         if methods is not None:
                             logger.debug(f"{loc.get('locator')} - Methods: {methods}")
@@ -716,10 +898,10 @@ def _multiWait(driver, locators, max_polls, output_type):
                 if callable(loc):
                     if loc():
                         return i
-                    time.sleep(1)
+                    get_clock().sleep(1)
                 else:
                     try:
-                        element = wait.until(EC.presence_of_element_located(loc))
+                        element = _until(driver, EC.presence_of_element_located(loc))
                         logger.debug(f"Element found at {loc}")
                         return i if output_type == 'id' else element
                     except TimeoutException:
@@ -770,7 +952,7 @@ def multiWaitNsec(driver, locators, _time, timeout, refresh_url_every_n_sec=None
     for i in range(_time):
         ID = multiWait(driver, locators, timeout, refresh_url_every_n_sec=refresh_url_every_n_sec)
         logger.info(f"Visible locator: {locators[ID]} && Persistency: {i + 1} seconds")
-        time.sleep(1)
+        get_clock().sleep(1)
     return ID
 
 
@@ -779,7 +961,7 @@ def slow_type(element, content):
     logger.debug(f"Sending {content} to web-element")
     for x in content:
         element.send_keys(x)
-        time.sleep(random.uniform(0.2, 0.4))
+        get_clock().sleep(random.uniform(0.2, 0.4), 'human')
 
 
 from selenium.webdriver.common.by import By
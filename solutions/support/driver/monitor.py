@@ -0,0 +1,63 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceMonitor:
+    """
+    Keeps a long running browser bounded: closes stale windows, clears cache and storage periodically
+    and recycles the browser once its memory or the number of pages it served crosses a threshold.
+    """
+
+    def __init__(self, max_rss_mb=1500, max_windows=1, clear_every=50, recycle_every=1000):
+        """
+        :param max_rss_mb: recycle the browser above this resident memory (needs psutil)
+        :param max_windows: close other windows when more than this many are open
+        :param clear_every: clear cache and storage every n pages, None to disable
+        :param recycle_every: recycle the browser every n pages, None to disable
+        """
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_windows = max_windows
+        self.clear_every = clear_every
+        self.recycle_every = recycle_every
+        self.pages = 0
+        self.recycle_pending = False
+
+    def check(self, selenium, keep=None, busy=False):
+        """
+        Call before loading a new page
+        :param selenium: Selenium instance
+        :param keep: window handles in use (tab mode), every other window is closed
+        :param busy: other tabs are mid search, so clearing is skipped and recycling postponed (`recycle_pending`)
+        :return: True if the browser was recycled
+        """
+        self.pages += 1
+        handles = selenium.driver.window_handles
+        if keep is not None:
+            stale = set(handles) - set(keep)
+            if stale:
+                logger.info(f"Closing {len(stale)} stale windows")
+                selenium.close_other_windows(keep)
+        elif len(handles) > self.max_windows:
+            logger.info(f"Closing {len(handles) - 1} stale windows")
+            selenium.close_other_windows(handles[-1])
+
+        rss = selenium.browser_rss()
+        logger.debug(f"Browser pages: {self.pages}, windows: {len(handles)}, "
+                     f"rss: {rss / 1024 / 1024 if rss else 0:.0f} MB")
+        if rss is not None and rss > self.max_rss or self.recycle_every and self.pages >= self.recycle_every:
+            self.recycle_pending = True
+        if busy:
+            return False
+
+        if self.recycle_pending:
+            logger.info(f"Recycling browser after {self.pages} pages "
+                        f"({rss / 1024 / 1024 if rss else 0:.0f} MB resident)")
+            selenium.recycle()
+            self.pages = 0
+            self.recycle_pending = False
+            return True
+
+        if self.clear_every and self.pages % self.clear_every == 0:
+            selenium.clear_cache()
+        return False
@@ -1,9 +1,20 @@
+import hashlib
+import logging
+import os
 import shutil
+import tempfile
+import threading
 from pathlib import Path
 
+from .clock import get_clock
+
+logger = logging.getLogger(__name__)
+
 
 class Proxy:
-    def __init__(self, proxy_str=None, extension_dir='proxy_extension', replace_extension=True):
+    EXTENSION_ROOT = 'proxy_extensions'
+
+    def __init__(self, proxy_str=None, extension_dir=None, replace_extension=True):
         """
         Proxy class to use with Selenium and Requests.
 
@@ -12,7 +23,8 @@ class Proxy:
         Parameters:
             :param proxy_str: A string representing the proxy:
                 Format: [protocol]://username:password@host:port OR [protocol]://host:port
-            :param extension_dir: path to directory where extension can be created
+            :param extension_dir: path to directory where extension can be created, default is a directory under
+                `proxy_extensions` named after a hash of the proxy, shared by every browser using the same proxy
             :param replace_extension: This can be false in case where old extension_dir is used
 
         Properties:
@@ -29,8 +41,13 @@ class Proxy:
             - remove_chrome_extension (None): Removes the created Chrome proxy extension directory.
         """
         self.proxy_str = proxy_str
+        self.cached_extension = extension_dir is None
+        if self.cached_extension:
+            digest = hashlib.sha1((proxy_str or '').encode()).hexdigest()[:16]
+            extension_dir = Path(self.EXTENSION_ROOT) / digest
         self.extension_dir = Path(extension_dir).resolve()
         self.replace_extension = replace_extension
+        self.pool = None
 
         self.protocol = None
         self.username = None
@@ -159,13 +176,30 @@ class Proxy:
         );
         """ % (self.protocol, self.host, self.port, bg_js_p1)
 
+        if self.cached_extension:
+            # Cached directories are keyed by the proxy and never rewritten, so browsers running at the same
+            # time can share them. A new one is written to a temporary directory and renamed into place.
+            if (self.extension_dir / 'background.js').exists():
+                return
+            self.extension_dir.parent.mkdir(parents=True, exist_ok=True)
+            tmp_dir = Path(tempfile.mkdtemp(dir=self.extension_dir.parent))
+            self._write_extension(tmp_dir, manifest_json, background_js)
+            try:
+                os.rename(tmp_dir, self.extension_dir)
+            except OSError:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
         if self.replace_extension and self.extension_dir.exists():
             shutil.rmtree(self.extension_dir)
         self.extension_dir.mkdir(parents=True, exist_ok=True)
+        self._write_extension(self.extension_dir, manifest_json, background_js)
 
-        with open(self.extension_dir / 'manifest.json', 'w') as f:
+    @staticmethod
+    def _write_extension(directory, manifest_json, background_js):
+        with open(directory / 'manifest.json', 'w') as f:
             f.write(manifest_json)
-        with open(self.extension_dir / 'background.js', 'w') as f:
+        with open(directory / 'background.js', 'w') as f:
             f.write(background_js)
 
     def remove_chrome_extension(self):
@@ -173,3 +207,155 @@ class Proxy:
         Remove proxy extension directory.
         """
         shutil.rmtree(self.extension_dir, ignore_errors=True)
+
+
+class ProxyStats:
+    """ Health statistics of a proxy in a ProxyPool """
+
+    def __init__(self):
+        self.uses = 0
+        self.in_use = 0
+        self.latency = None
+        self.captcha_attempts = 0
+        self.captcha_failures = 0
+        self.requests = 0
+        self.blocks = 0
+        self.consecutive_blocks = 0
+        self.cooldown_until = 0.0
+        self.evicted = False
+
+    @property
+    def captcha_failure_rate(self):
+        return self.captcha_failures / self.captcha_attempts if self.captcha_attempts else 0.0
+
+    @property
+    def block_rate(self):
+        return self.blocks / self.requests if self.requests else 0.0
+
+
+class ProxyPool:
+    """
+    Pool of proxies scored by latency, captcha failure rate and block rate.
+
+    `acquire` hands out the healthiest available proxy, `record` feeds outcomes back and `release` returns it.
+    Proxies that get blocked several times in a row are put in cooldown, proxies whose block or captcha
+    failure rate stays above the limits are evicted.
+    """
+
+    def __init__(self, proxies=(), max_block_rate=0.5, max_captcha_failure_rate=0.8, min_samples=10,
+                 max_consecutive_blocks=3, cooldown=600, latency_smoothing=0.3, max_in_use=None):
+        """
+        :param proxies: iterable of proxy strings or Proxy objects
+        :param max_block_rate: evict proxies blocked more often than this, once they have min_samples requests
+        :param max_captcha_failure_rate: evict proxies failing captchas more often than this
+        :param min_samples: number of requests/captchas needed before a proxy can be evicted
+        :param max_consecutive_blocks: put a proxy in cooldown after this many blocks in a row
+        :param cooldown: cooldown in seconds
+        :param latency_smoothing: weight of the newest latency sample in the moving average
+        :param max_in_use: maximum number of browsers sharing one proxy, default None means unlimited
+        """
+        self.max_block_rate = max_block_rate
+        self.max_captcha_failure_rate = max_captcha_failure_rate
+        self.min_samples = min_samples
+        self.max_consecutive_blocks = max_consecutive_blocks
+        self.cooldown = cooldown
+        self.latency_smoothing = latency_smoothing
+        self.max_in_use = max_in_use
+
+        self._lock = threading.Lock()
+        self.proxies = {}
+        self.stats = {}
+        for proxy in proxies:
+            self.add(proxy)
+
+    @classmethod
+    def from_file(cls, filename, **kwargs):
+        """ Load one proxy per line, empty lines and lines starting with # are skipped """
+        with open(filename, 'r', encoding='utf-8') as f:
+            proxies = [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+        logger.info(f"Loaded {len(proxies)} proxies from {filename}")
+        return cls(proxies, **kwargs)
+
+    def __len__(self):
+        return sum(not stats.evicted for stats in self.stats.values())
+
+    def add(self, proxy):
+        proxy = proxy if isinstance(proxy, Proxy) else Proxy(proxy)
+        proxy.pool = self
+        with self._lock:
+            self.proxies[proxy.proxy_str] = proxy
+            self.stats[proxy.proxy_str] = ProxyStats()
+
+    def score(self, proxy):
+        """ Lower is better, unknown latency is treated as one second """
+        stats = self.stats[proxy.proxy_str]
+        latency = 1.0 if stats.latency is None else stats.latency
+        return latency * (1 + 2 * stats.captcha_failure_rate) * (1 + 4 * stats.block_rate) * (1 + stats.in_use)
+
+    def acquire(self):
+        """
+        Healthiest proxy that is not evicted, cooling down or at max_in_use
+        :raise: LookupError if no proxy is available
+        """
+        now = get_clock().time()
+        with self._lock:
+            candidates = [
+                proxy for key, proxy in self.proxies.items()
+                if not self.stats[key].evicted and self.stats[key].cooldown_until <= now
+                and (self.max_in_use is None or self.stats[key].in_use < self.max_in_use)
+            ]
+            if not candidates:
+                raise LookupError("No healthy proxy available")
+            proxy = min(candidates, key=self.score)
+            stats = self.stats[proxy.proxy_str]
+            stats.uses += 1
+            stats.in_use += 1
+        logger.info(f"Acquired proxy {proxy.host}:{proxy.port} (score {self.score(proxy):.2f})")
+        return proxy
+
+    def healthy(self, proxy):
+        """ The proxy is neither evicted nor cooling down """
+        with self._lock:
+            stats = self.stats[proxy.proxy_str]
+            return not stats.evicted and stats.cooldown_until <= get_clock().time()
+
+    def release(self, proxy):
+        with self._lock:
+            stats = self.stats[proxy.proxy_str]
+            stats.in_use = max(stats.in_use - 1, 0)
+
+    def record(self, proxy, latency=None, captcha_failed=None, blocked=False):
+        """
+        Record the outcome of a request made through a proxy
+        :param proxy: Proxy from this pool
+        :param latency: seconds the request took, None if unknown
+        :param captcha_failed: True/False if a captcha was attempted, None otherwise
+        :param blocked: the request was blocked or throttled
+        """
+        with self._lock:
+            stats = self.stats[proxy.proxy_str]
+            stats.requests += 1
+            if latency is not None:
+                stats.latency = latency if stats.latency is None else \
+                    self.latency_smoothing * latency + (1 - self.latency_smoothing) * stats.latency
+            if captcha_failed is not None:
+                stats.captcha_attempts += 1
+                stats.captcha_failures += bool(captcha_failed)
+            if blocked:
+                stats.blocks += 1
+                stats.consecutive_blocks += 1
+            else:
+                stats.consecutive_blocks = 0
+            self._check_health(proxy, stats)
+
+    def _check_health(self, proxy, stats):
+        if stats.consecutive_blocks >= self.max_consecutive_blocks:
+            stats.cooldown_until = get_clock().time() + self.cooldown
+            stats.consecutive_blocks = 0
+            logger.warning(f"Proxy {proxy.host}:{proxy.port} blocked repeatedly, cooling down for {self.cooldown}s")
+        if stats.requests >= self.min_samples and stats.block_rate > self.max_block_rate or \
+                stats.captcha_attempts >= self.min_samples and \
+                stats.captcha_failure_rate > self.max_captcha_failure_rate:
+            stats.evicted = True
+            logger.warning(f"Evicted proxy {proxy.host}:{proxy.port} (block rate {stats.block_rate:.2f}, "
+                           f"captcha failure rate {stats.captcha_failure_rate:.2f})")
@@ -1 +1,12 @@
-from .model import ONNXModel
+__all__ = ['ONNXModel', 'InferenceServer', 'RemoteModel', ]
+
+
+def __getattr__(name):
+    # onnxruntime and numpy are only imported once a model is needed
+    if name == 'ONNXModel':
+        from .model import ONNXModel
+        return ONNXModel
+    if name in ('InferenceServer', 'RemoteModel'):
+        from . import server
+        return getattr(server, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -8,31 +8,65 @@ model_path = Path(__file__).resolve().parent / 'weights' / 'oocl.onnx'
 
 
 class ONNXModel:
-    def __init__(self):
+    def __init__(self, threshold=0.9):
         """
         Initialize the ONNX model by loading it once.
 
         Args:
-        - model_path (str): Path to the ONNX model file.
+        - threshold (float): Minimum raw score of class 0 to consider the captcha solved.
         """
         self.model_path = model_path
+        self.threshold = threshold
         self.session = ort.InferenceSession(model_path)
         self.input_name = self.session.get_inputs()[0].name
 
-    def infer(self, input_data):
+    def scores(self, input_data):
         """
-        Perform inference on the input data.
+        Raw class scores (logits) of the input data, class 0 means the captcha piece is in place.
 
         Args:
         - input_data (numpy.ndarray): The input data to pass to the model.
 
         Returns:
-        - output (numpy.ndarray): The output of the model inference.
+        - scores (numpy.ndarray): Scores of the first item of the batch.
         """
         if not isinstance(input_data, np.ndarray):
             input_data = np.array(input_data)
-        outputs = self.session.run(None, {self.input_name: input_data})
-        return not np.argmax(outputs[0][0]) and np.max(outputs[0][0]) > 0.9
+        return self.session.run(None, {self.input_name: input_data})[0][0]
+
+    @staticmethod
+    def softmax(scores):
+        """ Convert raw class scores to probabilities """
+        exp = np.exp(scores - np.max(scores))
+        return exp / exp.sum()
+
+    def predict(self, input_data):
+        """
+        Class probabilities of the input data, class 0 means the captcha piece is in place.
+
+        Args:
+        - input_data (numpy.ndarray): The input data to pass to the model.
+
+        Returns:
+        - probabilities (numpy.ndarray): Probabilities of the first item of the batch.
+        """
+        return self.softmax(self.scores(input_data))
+
+    def is_solved(self, scores):
+        """ Whether the raw scores returned by `scores` mean the captcha piece is in place """
+        return not np.argmax(scores) and np.max(scores) > self.threshold
+
+    def infer(self, input_data):
+        """
+        Perform inference on the input data.
+
+        Args:
+        - input_data (numpy.ndarray): The input data to pass to the model.
+
+        Returns:
+        - output (bool): Whether the captcha piece is in place.
+        """
+        return self.is_solved(self.scores(input_data))
 
     @staticmethod
     def isolate_color(image, target_colors=((210, 53, 73), (211, 53, 73))):
@@ -0,0 +1,236 @@
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import onnxruntime as ort
+
+from .model import ONNXModel, model_path
+
+logger = logging.getLogger(__name__)
+
+if sys.platform == 'win32':
+    DEFAULT_ADDRESS = ('127.0.0.1', 47811)
+else:
+    DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), 'oocl-inference.sock')
+
+# Request: 4 dimensions (batch, channels, height, width) followed by float32 data
+# Reply: number of scores followed by float32 scores, no scores means the server failed
+REQUEST_HEADER = struct.Struct('!4I')
+REPLY_HEADER = struct.Struct('!I')
+
+
+def parse_address(value):
+    """ "host:port" to a (host, port) tuple for TCP, anything else is a Unix socket path """
+    host, _, port = value.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return value
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def _batched_model():
+    """
+    The exported model has a fixed batch size of 1 (input shape and the flatten Reshape). Rewrite both to a
+    dynamic batch size if the onnx package is installed, otherwise return the model path unchanged.
+    """
+    try:
+        import onnx
+        from onnx import numpy_helper
+    except ImportError:
+        logger.info("onnx is not installed, frames are run one at a time")
+        return str(model_path), False
+
+    model = onnx.load(str(model_path))
+    shapes = {node.input[1] for node in model.graph.node if node.op_type == 'Reshape'}
+    for node in model.graph.node:
+        if node.op_type == 'Constant' and node.output[0] in shapes:
+            # 0 copies the batch dimension of the input
+            node.attribute[0].t.CopyFrom(numpy_helper.from_array(np.array([0, -1], dtype=np.int64)))
+    for value in (*model.graph.input, *model.graph.output):
+        value.type.tensor_type.shape.dim[0].dim_param = 'batch'
+    return model.SerializeToString(), True
+
+
+class InferenceServer:
+    """
+    Local inference service owning a single ONNX session for all scraper processes of a host.
+
+    Workers send preprocessed frames over a Unix socket (TCP on localhost on Windows). Frames arriving
+    within `window` seconds of each other are run as one batch of at most `max_batch` frames.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, window=0.005, max_batch=32, threads=None):
+        """
+        :param address: socket path, or (host, port) tuple for TCP
+        :param window: seconds to wait for more frames after the first one of a batch
+        :param max_batch: maximum number of frames per batch
+        :param threads: intra op threads of the session, default None lets onnxruntime decide
+        """
+        self.address = address
+        self.window = window
+        self.max_batch = max_batch
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if threads:
+            options.intra_op_num_threads = threads
+        model, self.batched = _batched_model()
+        self.session = ort.InferenceSession(model, options)
+        self.input_name = self.session.get_inputs()[0].name
+        self.requests = queue.Queue()
+        self._server = None
+
+    def submit(self, frame):
+        """ Queue a frame of shape (1, channels, height, width), return a Future of its scores """
+        future = Future()
+        self.requests.put((frame, future))
+        return future
+
+    def _next_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, frames):
+        if self.batched:
+            return self.session.run(None, {self.input_name: np.concatenate(frames)})[0]
+        return [self.session.run(None, {self.input_name: frame})[0][0] for frame in frames]
+
+    def _batch_loop(self):
+        while True:
+            batch = self._next_batch()
+            frames, futures = zip(*batch)
+            try:
+                scores = self._run(frames)
+            except Exception as e:
+                logger.exception(f"Inference failed for a batch of {len(batch)}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, score in zip(futures, scores):
+                future.set_result(score)
+            logger.debug(f"Ran a batch of {len(batch)} frames")
+
+    def _handler(self):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        shape = REQUEST_HEADER.unpack(_recv_exactly(self.request, REQUEST_HEADER.size))
+                        data = _recv_exactly(self.request, int(np.prod(shape)) * 4)
+                    except ConnectionError:
+                        return
+                    frame = np.frombuffer(data, dtype='>f4').astype(np.float32).reshape(shape)
+                    try:
+                        scores = np.asarray(server.submit(frame).result(), dtype=np.float32)
+                    except Exception:
+                        scores = np.empty(0, dtype=np.float32)
+                    self.request.sendall(REPLY_HEADER.pack(len(scores)) + scores.astype('>f4').tobytes())
+
+        return Handler
+
+    def serve_forever(self):
+        threading.Thread(target=self._batch_loop, name='inference-batches', daemon=True).start()
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        server_class.daemon_threads = True
+        with server_class(self.address, self._handler()) as self._server:
+            logger.info(f"Inference server listening on {self.address} (batched: {self.batched})")
+            self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class RemoteModel(ONNXModel):
+    """
+    Drop in replacement of ONNXModel that runs inference on an InferenceServer. Falls back to a local session
+    if the server can't be reached or doesn't answer within `timeout` seconds.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, threshold=0.9, timeout=2.0, fallback=True):
+        """
+        :param address: socket path, (host, port) tuple or "host:port" string for TCP
+        :param threshold: minimum raw score of class 0 to consider the captcha solved
+        :param timeout: seconds to wait for the server
+        :param fallback: load a local session when the server fails instead of raising
+        """
+        self.model_path = model_path
+        self.threshold = threshold
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.timeout = timeout
+        self.fallback = fallback
+        self.session = None
+        self._socket = None
+
+    def _connect(self):
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.address)
+        return sock
+
+    def _remote_scores(self, input_data):
+        if self._socket is None:
+            self._socket = self._connect()
+        frame = np.ascontiguousarray(input_data, dtype='>f4')
+        self._socket.sendall(REQUEST_HEADER.pack(*frame.shape) + frame.tobytes())
+        count, = REPLY_HEADER.unpack(_recv_exactly(self._socket, REPLY_HEADER.size))
+        if not count:
+            raise RuntimeError("Inference server failed")
+        return np.frombuffer(_recv_exactly(self._socket, count * 4), dtype='>f4').astype(np.float32)
+
+    def scores(self, input_data):
+        if self.session is not None:
+            return super().scores(input_data)
+        try:
+            return self._remote_scores(np.asarray(input_data))
+        except (OSError, ConnectionError, RuntimeError) as e:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+            if not self.fallback:
+                raise
+            logger.warning(f"Inference server {self.address} failed ({e}), using a local session")
+            self.session = ort.InferenceSession(str(model_path))
+            self.input_name = self.session.get_inputs()[0].name
+            return super().scores(input_data)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    InferenceServer(parse_address(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ADDRESS).serve_forever()
@@ -0,0 +1,69 @@
+from solutions.support.driver.clock import get_clock
+
+
+class TabTask:
+    """
+    One container search running in its own browser tab, see Scraper.scrape_tabs.
+
+    A task goes through LOADING (search form loading), SEARCHING (search submitted, waiting for the captcha or
+    the result) and DONE. `handle` is the window handle the task currently owns; it changes when the site opens
+    the result in a new window. `slot` is the holder id of the rate governor's search slot, held from the submit
+    until the task is done.
+    """
+    LOADING = 'LOADING'
+    SEARCHING = 'SEARCHING'
+    DONE = 'DONE'
+    __slots__ = ('item', 'handle', 'state', 'started', 'state_since', 'captcha_attempts', 'captcha_failed', 'result',
+                 'slot')
+
+    def __init__(self, item, handle):
+        self.item = item
+        self.handle = handle
+        self.state = self.LOADING
+        self.started = self.state_since = get_clock().time()
+        self.captcha_attempts = 0
+        self.captcha_failed = None
+        self.result = None
+        self.slot = None
+
+    @property
+    def container_number(self):
+        return self.item['container_number']
+
+    def set_state(self, state):
+        self.state = state
+        self.state_since = get_clock().time()
+
+    def finish(self, result):
+        """ :param result: output document or the exception the task failed with """
+        self.result = result
+        self.set_state(self.DONE)
+
+    def waited(self):
+        """ Seconds spent in the current state """
+        return get_clock().time() - self.state_since
+
+    def __repr__(self):
+        return f"TabTask({self.container_number!r}, {self.state}, handle={self.handle!r})"
+
+
+class Throughput:
+    """ Containers per hour of a run, per GB of browser memory when the resident memory is known """
+
+    def __init__(self):
+        self.started = get_clock().time()
+        self.done = 0
+        self.peak_rss = 0
+
+    def add(self, rss=None):
+        self.done += 1
+        if rss:
+            self.peak_rss = max(self.peak_rss, rss)
+
+    def __str__(self):
+        per_hour = self.done * 3600 / max(get_clock().time() - self.started, 1e-9)
+        text = f"{self.done} containers, {per_hour:.1f} containers/hour"
+        if self.peak_rss:
+            gb = self.peak_rss / 1024 ** 3
+            text += f", peak browser memory {gb:.2f} GB, {per_hour / gb:.1f} containers/hour/GB"
+        return text
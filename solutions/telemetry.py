@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class CaptchaAttempt:
+    """ One captcha solving attempt, see CaptchaTelemetry.start """
+
+    def __init__(self, telemetry, attempt_id):
+        self.telemetry = telemetry
+        self.attempt_id = attempt_id
+        self.started = time.time()
+        self.frames = 0
+
+    def frame(self, png, offset, score, confidence, solved):
+        """
+        Record a captcha frame seen during the attempt
+        :param png: screenshot of the captcha canvas
+        :param offset: slider offset in pixels
+        :param score: raw model score of class 0
+        :param confidence: model probability of class 0
+        :param solved: whether the model considered the captcha solved
+        """
+        frame_hash = self.telemetry.save_frame(png)
+        with self.telemetry.connection:
+            self.telemetry.connection.execute(
+                "INSERT INTO frames (attempt_id, sequence, slider_offset, score, confidence, solved, frame_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.attempt_id, self.frames, offset, score, confidence, int(solved), frame_hash)
+            )
+        self.frames += 1
+
+    def finish(self, outcome, steps, offset):
+        """
+        :param outcome: 'solved' (Cargo Tracking shown) or 'failed' (Validation failed)
+        :param steps: number of slider moves
+        :param offset: final slider offset
+        """
+        with self.telemetry.connection:
+            self.telemetry.connection.execute(
+                "UPDATE attempts SET outcome = ?, steps = ?, final_offset = ?, duration = ? WHERE id = ?",
+                (outcome, steps, offset, time.time() - self.started, self.attempt_id)
+            )
+
+
+class CaptchaTelemetry:
+    """
+    Persistent store of captcha attempts: frames (by content hash), slider offsets, model scores and the
+    validation outcome. The analysis methods are meant to run in a separate process (see __main__) to
+    mine hard examples for retraining, tune the solve threshold and detect captcha variant drift.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS attempts (
+        id INTEGER PRIMARY KEY,
+        started REAL NOT NULL,
+        search TEXT,
+        proxy TEXT,
+        threshold REAL,
+        steps INTEGER,
+        final_offset INTEGER,
+        outcome TEXT,
+        duration REAL
+    );
+    CREATE TABLE IF NOT EXISTS frames (
+        attempt_id INTEGER NOT NULL REFERENCES attempts (id),
+        sequence INTEGER NOT NULL,
+        slider_offset INTEGER,
+        score REAL,
+        confidence REAL,
+        solved INTEGER,
+        frame_hash TEXT,
+        PRIMARY KEY (attempt_id, sequence)
+    );
+    CREATE INDEX IF NOT EXISTS attempts_started ON attempts (started);
+    CREATE INDEX IF NOT EXISTS frames_hash ON frames (frame_hash);
+    """
+
+    def __init__(self, filename, frames_dir=None):
+        """
+        :param filename: SQLite file
+        :param frames_dir: directory to keep captcha frames in, named by hash, default None keeps only hashes
+        """
+        self.filename = Path(filename).resolve()
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.frames_dir = Path(frames_dir).resolve() if frames_dir else None
+        self.connection = sqlite3.connect(self.filename, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def save_frame(self, png):
+        frame_hash = hashlib.sha1(png).hexdigest()
+        if self.frames_dir is not None:
+            path = self.frames_dir / frame_hash[:2] / f'{frame_hash}.png'
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(png)
+        return frame_hash
+
+    def start(self, search=None, proxy=None, threshold=None):
+        """ Start recording a captcha attempt """
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO attempts (started, search, proxy, threshold) VALUES (?, ?, ?, ?)",
+                (time.time(), search, proxy, threshold)
+            )
+        return CaptchaAttempt(self, cursor.lastrowid)
+
+    def hard_examples(self, limit=100, margin=0.1):
+        """
+        Frames worth labelling for retraining: final frames of failed attempts (false positives) and frames of
+        solved attempts whose confidence was close to the decision boundary
+        :return: list of dict with frame_hash, score, confidence, solved, outcome
+        """
+        rows = self.connection.execute(
+            "SELECT f.frame_hash, f.score, f.confidence, f.solved, a.outcome FROM frames f "
+            "JOIN attempts a ON a.id = f.attempt_id "
+            "WHERE (a.outcome = 'failed' AND f.solved = 1) OR ABS(f.confidence - 0.5) < ? "
+            "GROUP BY f.frame_hash ORDER BY a.started DESC LIMIT ?",
+            (margin, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def suggest_threshold(self, max_false_positive_rate=0.05, tolerance=2):
+        """
+        Lowest raw score threshold (scores above it are accepted) whose share of misplaced pieces among the frames
+        it accepts stays below `max_false_positive_rate`, or None if there is not enough data.
+
+        Frames are labelled by slider offset, whether the model accepted them or not: within `tolerance` pixels of
+        the final offset of a solved attempt the piece is in place, elsewhere in a solved attempt or at the final
+        offset of a failed attempt it is not. The other frames of failed attempts are left out. As frames below the
+        current threshold count too, the suggestion can be lower as well as higher than the current threshold.
+        """
+        rows = self.connection.execute(
+            "SELECT f.score, a.outcome = 'solved' AND ABS(f.slider_offset - a.final_offset) <= :tolerance AS placed "
+            "FROM frames f JOIN attempts a ON a.id = f.attempt_id "
+            "WHERE f.score IS NOT NULL AND f.slider_offset IS NOT NULL AND a.final_offset IS NOT NULL AND "
+            "(a.outcome = 'solved' OR a.outcome = 'failed' AND ABS(f.slider_offset - a.final_offset) <= :tolerance)",
+            {'tolerance': tolerance}
+        ).fetchall()
+        if len(rows) < 20:
+            return None
+        rows = sorted(rows, key=lambda row: row['score'])
+        misplaced = sum(not row['placed'] for row in rows)
+        for i, row in enumerate(rows):
+            # A threshold accepts the scores above it
+            misplaced -= not row['placed']
+            accepted = len(rows) - i - 1
+            if accepted and rows[i + 1]['score'] > row['score'] and misplaced / accepted <= max_false_positive_rate:
+                return row['score']
+        return None
+
+    def stats(self, since=0.0, until=None):
+        """ Solve rate, average steps and share of never seen frames of the attempts in a time window """
+        until = time.time() if until is None else until
+        row = self.connection.execute(
+            "SELECT COUNT(*) AS attempts, AVG(outcome = 'solved') AS solve_rate, AVG(steps) AS steps "
+            "FROM attempts WHERE started >= ? AND started < ? AND outcome IS NOT NULL",
+            (since, until)
+        ).fetchone()
+        new_frames = self.connection.execute(
+            "SELECT AVG(NOT EXISTS (SELECT 1 FROM frames g JOIN attempts b ON b.id = g.attempt_id "
+            "WHERE g.frame_hash = f.frame_hash AND b.started < ?)) FROM frames f "
+            "JOIN attempts a ON a.id = f.attempt_id WHERE a.started >= ? AND a.started < ?",
+            (since, since, until)
+        ).fetchone()[0]
+        return {**dict(row), 'new_frame_share': new_frames}
+
+    def drift(self, window=24 * 3600, tolerance=0.15):
+        """
+        Compare the last `window` seconds against everything before it
+        :return: list of warnings, empty if nothing changed noticeably
+        """
+        now = time.time()
+        recent = self.stats(now - window, now)
+        baseline = self.stats(0.0, now - window)
+        warnings = []
+        if not recent['attempts'] or not baseline['attempts']:
+            return warnings
+        if recent['solve_rate'] < baseline['solve_rate'] - tolerance:
+            warnings.append(f"Solve rate dropped from {baseline['solve_rate']:.2f} to {recent['solve_rate']:.2f}")
+        if recent['steps'] > baseline['steps'] * (1 + tolerance):
+            warnings.append(f"Average steps rose from {baseline['steps']:.1f} to {recent['steps']:.1f}")
+        return warnings
+
+    def report(self):
+        """ Log a summary, meant to be run periodically in a separate process """
+        logger.info(f"Captcha stats (all time): {self.stats()}")
+        logger.info(f"Suggested threshold: {self.suggest_threshold()}")
+        logger.info(f"Hard examples: {len(self.hard_examples())}")
+        for warning in self.drift():
+            logger.warning(f"Captcha drift: {warning}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    CaptchaTelemetry(sys.argv[1]).report()
@@ -0,0 +1,234 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from solutions.negative_cache import NegativeCache
+from solutions.results import ResultStore
+from solutions.utils import is_valid_container_number, normalise_container_number
+from solutions.work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+# HTTP status of every lookup status
+HTTP_STATUS = {'OK': 200, 'QUEUED': 202, 'SCRAPING': 202, 'INVALID': 400, 'NO_RECORD': 404, 'EXPIRED': 504}
+
+
+class TrackingService:
+    """
+    On-demand container lookups on top of the workers of a WorkQueue.
+
+    A result scraped less than `max_age` seconds ago is answered from the ResultStore right away. Otherwise
+    the container is requested at the front of the queue and the lookup waits for a worker to scrape it.
+    Lookups of a container that is already requested share one in-flight Future, so a burst of duplicate
+    lookups costs one queue request and one scrape.
+    """
+
+    def __init__(self, work_queue, results, negative_cache=None, max_age=3600, poll_interval=1.0, expire=3600):
+        """
+        :param work_queue: WorkQueue the workers scrape from (with drain=False)
+        :param results: ResultStore the workers write to
+        :param negative_cache: NegativeCache, answer "no record" without queueing
+        :param max_age: seconds a stored result is fresh enough to answer with
+        :param poll_interval: seconds between checks of the in-flight containers
+        :param expire: seconds after which an in-flight container is given up, a later lookup requests it again
+        """
+        self.work_queue = work_queue
+        self.results = results
+        self.negative_cache = negative_cache
+        self.max_age = max_age
+        self.poll_interval = poll_interval
+        self.expire = expire
+        # The stores share one connection each between the request threads, so each has its own lock: fresh
+        # results and "no record" answers never wait for a queue write, which may wait for a busy queue file
+        self._store_lock = threading.Lock()
+        self._queue_lock = threading.Lock()
+        # Guards _in_flight, container number -> (Future of the answer, requested time or None until requested)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._poll_loop, name='tracking-poll', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _answer(container_number, status, document=None, scraped=None):
+        return {'container_number': container_number, 'status': status, 'scraped': scraped, 'result': document}
+
+    def lookup(self, container_number):
+        """
+        Answer of a lookup right away, or the Future of the in-flight scrape shared by all its lookups
+        :return: (answer dict, Future or None)
+        """
+        container_number = normalise_container_number(container_number)
+        if not is_valid_container_number(container_number):
+            return self._answer(container_number, 'INVALID'), None
+        with self._store_lock:
+            cached = self.results.get(container_number, self.max_age)
+            if cached is not None:
+                return self._answer(container_number, 'OK', *cached), None
+            if self.negative_cache is not None and self.negative_cache.get(container_number) is not None:
+                return self._answer(container_number, 'NO_RECORD'), None
+        with self._lock:
+            request = container_number not in self._in_flight
+            if request:
+                self._in_flight[container_number] = (Future(), None)
+            future = self._in_flight[container_number][0]
+        if request:
+            requested = time.time()
+            with self._queue_lock:
+                self.work_queue.request(container_number)
+            with self._lock:
+                self._in_flight[container_number] = (future, requested)
+        with self._queue_lock:
+            status = self.work_queue.status(container_number)
+        return self._answer(container_number, 'SCRAPING' if status == 'SCRAPING' else 'QUEUED'), future
+
+    def track(self, container_number, wait=0):
+        """
+        Look a container up, waiting up to `wait` seconds for the scrape if there is no fresh result
+        :return: answer dict with the container number, status (OK, QUEUED, SCRAPING, INVALID, NO_RECORD or
+            EXPIRED), scraped time and result document
+        """
+        answer, future = self.lookup(container_number)
+        if future is None or wait <= 0:
+            return answer
+        try:
+            return future.result(timeout=wait)
+        except TimeoutError:
+            with self._queue_lock:
+                status = self.work_queue.status(answer['container_number'])
+            return {**answer, 'status': 'SCRAPING' if status == 'SCRAPING' else 'QUEUED'}
+
+    def _settle(self, container_number, requested):
+        """ Answer of an in-flight container once it is scraped, None while it isn't """
+        with self._store_lock:
+            stored = self.results.get(container_number)
+        if stored is not None and stored[1] >= requested:
+            return self._answer(container_number, 'OK', *stored)
+        with self._queue_lock:
+            status = self.work_queue.status(container_number)
+        if status in ('NO_RECORD', 'INVALID'):
+            return self._answer(container_number, status)
+        if status == 'DONE' and stored is not None:
+            # Scraped by a worker that claimed it just before the request
+            return self._answer(container_number, 'OK', *stored)
+        if time.time() - requested > self.expire:
+            return self._answer(container_number, 'EXPIRED')
+        return None
+
+    def poll(self):
+        """ Resolve the Futures of the in-flight containers that were scraped """
+        with self._lock:
+            # Containers whose queue request is still being made are left for the next poll
+            in_flight = [(container_number, future, requested)
+                         for container_number, (future, requested) in self._in_flight.items() if requested is not None]
+        settled = []
+        for container_number, future, requested in in_flight:
+            answer = self._settle(container_number, requested)
+            if answer is not None:
+                settled.append((container_number, future, answer))
+        with self._lock:
+            for container_number, _, _ in settled:
+                del self._in_flight[container_number]
+        for container_number, future, answer in settled:
+            logger.info(f"Lookup of {container_number} settled: {answer['status']}")
+            future.set_result(answer)
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Failed to poll in-flight containers: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class TrackingHandler(BaseHTTPRequestHandler):
+    """
+    GET /track/<container number>[?wait=<seconds>] answers the JSON of TrackingService.track, with HTTP status
+    200 (OK), 202 (QUEUED, SCRAPING), 400 (INVALID), 404 (NO_RECORD) or 504 (EXPIRED)
+    """
+    server_version = 'OOCLTracking/1.0'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'track':
+            self._send_json(404, {'error': "Use GET /track/<container number>"})
+            return
+        try:
+            wait = min(float(parse_qs(url.query).get('wait', [self.server.default_wait])[0]), self.server.max_wait)
+        except ValueError:
+            self._send_json(400, {'error': "wait must be a number of seconds"})
+            return
+        answer = self.server.service.track(unquote(parts[1]), wait)
+        self._send_json(HTTP_STATUS[answer['status']], answer)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+class TrackingAPI(ThreadingHTTPServer):
+    """ HTTP server of a TrackingService, one thread per request """
+    daemon_threads = True
+
+    def __init__(self, service, address=('127.0.0.1', 8080), default_wait=30, max_wait=300):
+        """
+        :param service: TrackingService
+        :param address: (host, port) to listen on
+        :param default_wait: seconds a lookup waits for the scrape when the request has no wait parameter
+        :param max_wait: maximum seconds a lookup may wait
+        """
+        self.service = service
+        self.default_wait = default_wait
+        self.max_wait = max_wait
+        super().__init__(address, TrackingHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API for on-demand container lookups served by queue workers")
+    parser.add_argument('queue', help="WorkQueue SQLite file of the workers")
+    parser.add_argument('results', help="ResultStore SQLite file the workers write to")
+    parser.add_argument('--negative-cache', help="NegativeCache SQLite file of the workers")
+    parser.add_argument('--shards', type=int, default=16, help="number of queue shards, same as the workers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--max-age', type=float, default=3600, help="seconds a stored result is fresh")
+    parser.add_argument('--wait', type=float, default=30, help="default seconds a lookup waits for the scrape")
+    args = parser.parse_args()
+
+    service = TrackingService(
+        WorkQueue(args.queue, shards=args.shards),
+        ResultStore(args.results),
+        negative_cache=NegativeCache(args.negative_cache) if args.negative_cache else None,
+        max_age=args.max_age
+    )
+    server = TrackingAPI(service, (args.host, args.port), default_wait=args.wait)
+    logger.info(f"Tracking API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s')
+    main()
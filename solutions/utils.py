@@ -0,0 +1,106 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+MONTHS = {month: i for i, month in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), start=1)}
+# Trailing timezone abbreviations (e.g. "CST") are matched and ignored
+OOCL_DATETIME = re.compile(r'(\d{1,2})[ -]([A-Z][a-z]{2})[ -](\d{4})(?:,? (\d{1,2}):(\d{2}))?(?:\s+[A-Z]{2,5})?')
+TIMEZONE = re.compile(r'\s+[A-Z]{2,5}$')
+NUMBER = re.compile(r'-?\d[\d,]*(\.\d+)?')
+DATETIME_FORMATS = (
+    '%d %b %Y, %H:%M',
+    '%d %b %Y %H:%M',
+    '%d-%b-%Y %H:%M',
+    '%d %b %Y',
+    '%d-%b-%Y',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d',
+)
+
+
+def parse_datetime(value):
+    """
+    Parse a date/time string as shown on the OOCL website (e.g. "18 Oct 2024, 14:35 CST").
+    Trailing timezone abbreviations and extra lines are ignored.
+    :param value: string, datetime or None
+    :return: naive datetime or None if the value cannot be parsed
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    return _parse_datetime_text(str(value))
+
+
+@lru_cache(maxsize=65536)
+def _parse_datetime_text(value):
+    # Cached: the same event times repeat across the activities and containers of a run, and sharing the
+    # (immutable) datetimes also saves memory in the records
+    value = value.strip()
+    if not value:
+        return None
+    if '\n' in value:
+        value = value.split('\n', 1)[0].strip()
+    match = OOCL_DATETIME.fullmatch(value)
+    if match is not None:
+        day, month, year, hour, minute = match.groups()
+        if month in MONTHS:
+            try:
+                return datetime(int(year), MONTHS[month], int(day), int(hour or 0), int(minute or 0))
+            except ValueError:
+                return None
+    value = TIMEZONE.sub('', value)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_number(value, cast=float):
+    """
+    Parse the first number in a string, e.g. "22,000.50 KGS" -> 22000.5 or "7 Day(s)" -> 7
+    :param value: string or None
+    :param cast: type of the result (float or int)
+    :return: number or None if the value holds no number
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    match = NUMBER.search(str(value))
+    if match is None:
+        return None
+    return cast(float(match.group().replace(',', '')))
+
+
+CONTAINER_NUMBER = re.compile(r'[A-Z]{3}[UJZ]\d{7}')
+# ISO 6346 character values: digits as is, A=10 ... Z=38 skipping multiples of 11
+CHECK_DIGIT_VALUES = {
+    **{str(digit): digit for digit in range(10)},
+    **{chr(ord('A') + i): 10 + i + (9 + i) // 10 for i in range(26)},
+}
+
+
+def normalise_container_number(value):
+    """ Upper case container number without spaces or dashes, e.g. "oolu 123456-7" -> "OOLU1234567" """
+    return re.sub(r'[\s-]', '', str(value)).upper()
+
+
+def iso6346_check_digit(code):
+    """
+    Check digit of the first 10 characters of an ISO 6346 container number (owner code, category, serial)
+    :param code: e.g. "OOLU123456"
+    :return: int 0-9
+    """
+    return sum(CHECK_DIGIT_VALUES[char] << i for i, char in enumerate(code[:10])) % 11 % 10
+
+
+def is_valid_container_number(value):
+    """ Whether a container number has the ISO 6346 format and a correct check digit """
+    value = normalise_container_number(value)
+    return CONTAINER_NUMBER.fullmatch(value) is not None and iso6346_check_digit(value) == int(value[10])
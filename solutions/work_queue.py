@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from solutions.scheduler import Scheduler
+from solutions.support.driver.clock import get_clock
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(container_number, shards):
+    """ Stable shard of a container number """
+    return int(hashlib.sha1(container_number.encode()).hexdigest()[:8], 16) % shards
+
+
+class WorkQueue:
+    """
+    Container queue shared by several workers or hosts, backed by a SQLite file (e.g. on shared storage).
+
+    Workers claim containers with a time limited lease and extend it with heartbeats while scraping.
+    Containers whose lease expired (crashed worker) are claimable again, so nothing stays stuck in
+    SCRAPING and no container is scraped by two workers at the same time. Containers are assigned to
+    `shards` shards by a hash of their number; a worker only claims from its `shard_ids` (default all).
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS queue (
+        container_number TEXT PRIMARY KEY,
+        shard INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'INITIAL',
+        priority REAL NOT NULL DEFAULT 0,
+        worker TEXT,
+        lease_until REAL,
+        next_attempt REAL NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        item TEXT NOT NULL,
+        updated REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS queue_claim ON queue (shard, status, priority);
+    """
+    # Priority of requested containers, below any urgency of the Scheduler
+    URGENT = -1e12
+
+    def __init__(self, filename, worker_id=None, lease=300, shards=16, shard_ids=None, backoff=60, max_backoff=3600,
+                 poll_interval=5):
+        """
+        :param filename: SQLite file shared by all workers
+        :param worker_id: unique name of this worker, default hostname and a random suffix
+        :param lease: seconds a claim stays valid without heartbeat
+        :param shards: number of shards, must be the same for every worker
+        :param shard_ids: shards this worker claims from, default None means all
+        :param backoff: base failure backoff in seconds, doubled on every failed attempt
+        :param max_backoff: maximum backoff in seconds
+        :param poll_interval: seconds to wait when nothing is claimable
+        """
+        self.filename = Path(filename).resolve()
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.lease = lease
+        self.shards = shards
+        self.shard_ids = tuple(range(shards)) if shard_ids is None else tuple(shard_ids)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self._urgency = Scheduler().urgency
+        self.connection = self._connect()
+        self.connection.executescript(self.SCHEMA)
+        logger.info(f"Worker {self.worker_id} using queue {self.filename} (shards {self.shard_ids})")
+
+    def _connect(self):
+        # check_same_thread=False: the tracking API uses the queue from its request threads, one at a time
+        connection = sqlite3.connect(self.filename, timeout=60, isolation_level=None, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def _transaction(self, connection=None):
+        connection = connection or self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+
+    def put_many(self, items):
+        """
+        Add queue items, containers already in the queue are left untouched. Items are queued with their status,
+        INITIAL by default; any other status (e.g. INVALID) is final.
+        :return: number of containers added
+        """
+        now = get_clock().time()
+        rows = [
+            (item['container_number'], shard_of(item['container_number'], self.shards), item.get('status', 'INITIAL'),
+             self._urgency(item, now), json.dumps(item, ensure_ascii=False), now)
+            for item in items
+        ]
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO queue (container_number, shard, status, priority, item, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            added = connection.total_changes - before
+        logger.info(f"Added {added} of {len(rows)} containers to the queue")
+        return added
+
+    def request(self, container_number):
+        """
+        Put a container at the front of the queue, e.g. for an on-demand lookup. A container that is queued or
+        waiting for its backoff is moved up, one that is done (or was skipped) is queued again and one that is
+        being scraped is left alone. Requesting a container again is harmless, so duplicates cost nothing.
+        :return: status of the container before the request, None if it was not in the queue
+        """
+        now = get_clock().time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT status, lease_until FROM queue WHERE container_number = ?", (container_number,)
+            ).fetchone()
+            if row is None:
+                item = {'container_number': container_number, 'status': 'INITIAL'}
+                connection.execute(
+                    "INSERT INTO queue (container_number, shard, priority, item, updated) VALUES (?, ?, ?, ?, ?)",
+                    (container_number, shard_of(container_number, self.shards), self.URGENT, json.dumps(item), now)
+                )
+            elif row['status'] == 'SCRAPING' and row['lease_until'] >= now:
+                pass
+            else:
+                connection.execute(
+                    "UPDATE queue SET status = 'INITIAL', priority = ?, next_attempt = 0, worker = NULL, "
+                    "lease_until = NULL, updated = ? WHERE container_number = ?",
+                    (self.URGENT, now, container_number)
+                )
+        status = None if row is None else row['status']
+        logger.info(f"Requested {container_number} (was {status or 'not queued'})")
+        return status
+
+    def status(self, container_number):
+        """ Queue status of a container, None if it is not in the queue """
+        row = self.connection.execute(
+            "SELECT status FROM queue WHERE container_number = ?", (container_number,)
+        ).fetchone()
+        return None if row is None else row['status']
+
+    def claim(self, limit=1):
+        """
+        Lease up to `limit` containers of this worker's shards, most urgent first. Expired leases and NO_RECORD
+        containers whose retry time has come are claimable.
+        :return: list of queue items
+        """
+        now = get_clock().time()
+        shard_marks = ', '.join('?' * len(self.shard_ids))
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f"SELECT container_number, item FROM queue WHERE shard IN ({shard_marks}) AND next_attempt <= ? "
+                f"AND (status = 'INITIAL' OR (status = 'SCRAPING' AND lease_until < ?) "
+                f"OR (status = 'NO_RECORD' AND next_attempt > 0)) "
+                f"ORDER BY priority LIMIT ?",
+                (*self.shard_ids, now, now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE queue SET status = 'SCRAPING', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated = ? WHERE container_number = ?",
+                [(self.worker_id, now + self.lease, now, row['container_number']) for row in rows]
+            )
+        items = [json.loads(row['item']) for row in rows]
+        if items:
+            logger.info(f"Claimed {', '.join(item['container_number'] for item in items)}")
+        return items
+
+    def _update_owned(self, container_number, sql, params, connection=None):
+        with self._transaction(connection) as connection:
+            cursor = connection.execute(
+                f"UPDATE queue SET {sql}, updated = ? WHERE container_number = ? AND worker = ? "
+                f"AND status = 'SCRAPING'",
+                (*params, get_clock().time(), container_number, self.worker_id)
+            )
+        if not cursor.rowcount:
+            logger.warning(f"Lease of {container_number} was lost by {self.worker_id}")
+        return bool(cursor.rowcount)
+
+    def extend(self, container_number, connection=None):
+        """ Extend the lease of a claimed container, False if the lease was lost """
+        return self._update_owned(container_number, "lease_until = ?", (get_clock().time() + self.lease,), connection)
+
+    def complete(self, container_number, status='DONE', retry_at=None):
+        """
+        Mark a claimed container as done, or with another final status such as 'INVALID' or 'NO_RECORD'
+        :param retry_at: time at which a 'NO_RECORD' container is claimable again, e.g. when its negative cache
+            entry expires. It doesn't count as pending until then. None keeps the status final.
+        """
+        return self._update_owned(container_number, "status = ?, lease_until = NULL, next_attempt = ?",
+                                  (status, retry_at or 0))
+
+    def release(self, container_number, failed=True):
+        """ Put a claimed container back in the queue, with exponential backoff if it failed """
+        delay = 0
+        if failed:
+            attempts = self.connection.execute(
+                "SELECT attempts FROM queue WHERE container_number = ?", (container_number,)
+            ).fetchone()['attempts']
+            delay = min(self.backoff * 2 ** max(attempts - 1, 0), self.max_backoff)
+        return self._update_owned(container_number, "status = 'INITIAL', lease_until = NULL, next_attempt = ?",
+                                  (get_clock().time() + delay,))
+
+    def pending(self):
+        """ Number of containers not done yet, in all shards of this worker """
+        shard_marks = ', '.join('?' * len(self.shard_ids))
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM queue WHERE shard IN ({shard_marks}) AND status IN ('INITIAL', 'SCRAPING')",
+            self.shard_ids
+        ).fetchone()[0]
+
+    @contextmanager
+    def heartbeat(self, container_number, interval=None):
+        """ Extend the lease of a container in a background thread while the block runs """
+        interval = interval or self.lease / 3
+        stop = threading.Event()
+
+        def beat():
+            connection = self._connect()
+            try:
+                while not stop.wait(interval):
+                    self.extend(container_number, connection)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{container_number}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,58 @@
+import pytest
+
+from solutions.support.driver.accounting import CommandAccounting, CommandBudgetExceeded
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, command, params):
+        self.calls += 1
+        return {'value': 'ok'}
+
+
+class FakeDriver:
+    def __init__(self):
+        self.command_executor = FakeExecutor()
+
+
+def test_reinstall_counts_every_command_once():
+    driver = FakeDriver()
+    first = CommandAccounting()
+    first.install(driver)
+    first.install(driver)
+    second = CommandAccounting()
+    second.install(driver)
+
+    driver.command_executor.execute('findElement', {'using': 'xpath', 'value': '//a'})
+    assert driver.command_executor.calls == 1
+    assert second.lap()['findElement'].count == 1
+    assert first.lap() == {}
+
+
+def laps(**counts):
+    accounting = CommandAccounting()
+    for command, count in counts.items():
+        for _ in range(count):
+            accounting.record(command)
+    return accounting.lap()
+
+
+def test_check_within_budget():
+    accounting = CommandAccounting({'total': 10, 'findElement': 5}, strict=True)
+    assert accounting.check(laps(findElement=5, executeScript=5))
+
+
+def test_check_strict_raises():
+    accounting = CommandAccounting({'total': 10, 'findElement': 5}, strict=True)
+    with pytest.raises(CommandBudgetExceeded, match='findElement 6 > 5'):
+        accounting.check(laps(findElement=6), 'for container OOLU1234567')
+    with pytest.raises(CommandBudgetExceeded, match='total 11 > 10'):
+        accounting.check(laps(findElement=1, executeScript=10))
+
+
+def test_check_not_strict_warns(caplog):
+    accounting = CommandAccounting({'total': 10}, strict=False)
+    assert accounting.check(laps(executeScript=11), 'for container OOLU1234567') is False
+    assert 'total 11 > 10' in caplog.text
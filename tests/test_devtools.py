@@ -0,0 +1,37 @@
+import pytest
+
+websocket = pytest.importorskip('websocket')
+
+from solutions.support.driver.devtools import DevTools, DevToolsError  # noqa: E402
+
+
+class BrokenSocket:
+    """ Websocket whose every send or receive fails with the given exception """
+    connected = True
+
+    def __init__(self, error):
+        self.error = error
+
+    def send(self, message):
+        raise self.error
+
+    def recv(self):
+        raise self.error
+
+
+def devtools_over(ws, monkeypatch):
+    monkeypatch.setattr(websocket, 'create_connection', lambda url, **kwargs: ws)
+    return DevTools('127.0.0.1:9222', 'page', timeout=1)
+
+
+def test_receive_timeout_is_a_devtools_error(monkeypatch):
+    devtools = devtools_over(BrokenSocket(websocket.WebSocketTimeoutException('timed out')), monkeypatch)
+    devtools._sent[1] = ('Runtime.evaluate', 0)
+    with pytest.raises(DevToolsError):
+        devtools.receive([1])
+
+
+def test_closed_connection_is_a_devtools_error(monkeypatch):
+    devtools = devtools_over(BrokenSocket(websocket.WebSocketConnectionClosedException('closed')), monkeypatch)
+    with pytest.raises(DevToolsError):
+        devtools.call('Runtime.evaluate', {'expression': '1'})
@@ -0,0 +1,56 @@
+import sys
+import types
+
+import pytest
+
+pytest.importorskip('selenium')
+
+from solutions.support.driver import driver as driver_module  # noqa: E402
+
+
+class FakeChrome:
+    """ Like undetected_chromedriver 3.5.5, refuses an options object that started a browser before """
+    started = []
+
+    def __init__(self, use_subprocess=True, options=None, driver_executable_path=None):
+        if getattr(options, '_session', None) is not None:
+            raise RuntimeError("you cannot reuse the ChromeOptions object")
+        options._session = self
+        self.options = options
+        self.quit_called = False
+        FakeChrome.started.append(self)
+
+    def maximize_window(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture(autouse=True)
+def fake_uc(monkeypatch):
+    FakeChrome.started = []
+    monkeypatch.setitem(sys.modules, 'undetected_chromedriver', types.SimpleNamespace(Chrome=FakeChrome))
+    monkeypatch.setattr(driver_module.Selenium, '_install_webdriver', lambda self: None)
+    monkeypatch.setattr(driver_module, 'ActionChains', lambda driver, duration=0: None)
+
+
+def test_recycle_twice_starts_a_new_browser_each_time():
+    selenium = driver_module.Selenium('uc', start=True)
+    selenium.recycle()
+    selenium.recycle()
+
+    assert len(FakeChrome.started) == 3
+    assert all(browser.quit_called for browser in FakeChrome.started[:2])
+    assert selenium.driver is FakeChrome.started[-1]
+    assert len({id(browser.options) for browser in FakeChrome.started}) == 3
+
+
+def test_recycle_keeps_given_options():
+    options = driver_module.Options()
+    options.add_argument('--lang=en')
+    selenium = driver_module.Selenium('uc', options=options, start=True)
+    selenium.recycle()
+
+    assert len(FakeChrome.started) == 2
+    assert '--lang=en' in FakeChrome.started[-1].options.arguments
@@ -0,0 +1,52 @@
+import os
+import time
+
+import pytest
+
+from solutions.support.driver.cache import DriverCache
+
+
+@pytest.fixture
+def releases(tmp_path, monkeypatch):
+    """ Every update check downloads a new chromedriver release """
+    monkeypatch.setattr(DriverCache, '_resolved', {})
+    downloads = []
+
+    def download(self):
+        source = tmp_path / 'downloads' / str(len(downloads)) / self.driver_name
+        source.parent.mkdir(parents=True)
+        source.write_bytes(f'chromedriver {len(downloads)}'.encode())
+        downloads.append(source)
+        return source
+
+    monkeypatch.setattr(DriverCache, '_download', download)
+    return downloads
+
+
+def age(directory, seconds):
+    then = time.time() - seconds
+    os.utime(directory, (then, then))
+
+
+def test_prune_spares_a_driver_another_worker_uses(tmp_path, releases):
+    cache = DriverCache(tmp_path / 'cache', max_age=0)
+    in_use = cache.executable_path()
+    for _ in range(DriverCache.KEEP):
+        DriverCache._resolved.clear()
+        cache.executable_path()
+    assert in_use.is_file()
+
+    age(in_use.parent, DriverCache.GRACE)
+    DriverCache._resolved.clear()
+    cache.executable_path()
+    assert not in_use.is_file()
+
+
+def test_memoised_driver_is_resolved_again_once_pruned(tmp_path, releases):
+    cache = DriverCache(tmp_path / 'cache', max_age=0)
+    first = cache.executable_path()
+    assert cache.executable_path() == first
+    # Pruned by another process regardless, e.g. by an older version
+    os.remove(first)
+    second = cache.executable_path()
+    assert second.is_file() and second != first
@@ -0,0 +1,35 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ('selenium', 'undetected_chromedriver', 'onnxruntime', 'cv2', 'pyarrow', 'bs4', 'PIL', 'numpy', 'pyautogui')
+
+# Records every attempt to import a heavy package, whether or not it is installed
+SCRIPT = f"""
+import sys
+
+HEAVY = {HEAVY!r}
+attempted = set()
+
+
+class Recorder:
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] in HEAVY:
+            attempted.add(name.split('.')[0])
+        return None
+
+
+sys.meta_path.insert(0, Recorder())
+import solutions
+import solutions.support.driver
+import solutions.support.model
+from solutions.support.driver import ProxyPool, CommandAccounting, VirtualClock
+print(','.join(sorted(attempted | {{name for name in HEAVY if name in sys.modules}})))
+"""
+
+
+def test_package_imports_stay_lazy():
+    result = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
@@ -0,0 +1,50 @@
+import io
+import json
+
+import pytest
+
+from solutions.ingest import Ingestion, _iter_json_array, iter_items
+from solutions.work_queue import WorkQueue
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 4, 5, 7, 64])
+def test_json_array_values_across_chunks(chunk_size):
+    values = [12345, 678, -1.5e3, "OOLU1234567", {"container_number": "MSCU1234566", "n": 10}, [1, 22], True, None]
+    text = json.dumps(values)
+    assert list(_iter_json_array(io.StringIO(text), chunk_size)) == values
+
+
+def test_json_array_number_split_at_chunk_boundary():
+    assert list(_iter_json_array(io.StringIO('[12345, 678]'), chunk_size=3)) == [12345, 678]
+
+
+def test_json_array_errors():
+    with pytest.raises(ValueError):
+        list(_iter_json_array(io.StringIO('{"a": 1}'), chunk_size=4))
+    with pytest.raises(ValueError):
+        list(_iter_json_array(io.StringIO('[1, 2'), chunk_size=4))
+
+
+def test_non_object_items_are_skipped(tmp_path):
+    feed = tmp_path / 'feed.json'
+    feed.write_text(json.dumps(["OOLU1234567", 42, None, [1], {"container_number": "MSCU1234566"}]))
+    assert [item['container_number'] for item in iter_items(feed)] == ['OOLU1234567', 'MSCU1234566']
+
+    ingestion = Ingestion(WorkQueue(tmp_path / 'queue.sqlite'))
+    counts = ingestion.ingest(feed)
+    assert counts['read'] == 2
+    assert counts['added'] == 2
+
+
+def test_invalid_numbers_are_queued_as_invalid(tmp_path):
+    feed = tmp_path / 'feed.ndjson'
+    feed.write_text('"OOLU1234567"\n"OOLU1234561"\n{"container_number": ""}\n')
+    work_queue = WorkQueue(tmp_path / 'queue.sqlite')
+    counts = Ingestion(work_queue).ingest(feed)
+
+    assert counts['invalid'] == 2
+    assert counts['added'] == 1
+    assert work_queue.status('OOLU1234567') == 'INITIAL'
+    assert work_queue.status('OOLU1234561') == 'INVALID'
+    assert work_queue.pending() == 1
+    assert [item['container_number'] for item in work_queue.claim(limit=10)] == ['OOLU1234567']
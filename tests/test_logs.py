@@ -0,0 +1,29 @@
+import logging
+
+from solutions.logs import CorrelationFilter, correlation, get_correlation
+
+
+def test_correlation_is_restored_after_the_block():
+    assert get_correlation() is None
+    with correlation(['OOLU1234567', 'MSCU1234566']):
+        assert get_correlation() == 'OOLU1234567,MSCU1234566'
+        with correlation('MSCU1234566'):
+            assert get_correlation() == 'MSCU1234566'
+        assert get_correlation() == 'OOLU1234567,MSCU1234566'
+    assert get_correlation() is None
+
+
+def test_correlation_is_restored_after_an_exception():
+    try:
+        with correlation('OOLU1234567'):
+            raise ValueError
+    except ValueError:
+        pass
+    assert get_correlation() is None
+
+
+def test_filter_tags_records():
+    record = logging.LogRecord('solutions', logging.INFO, __file__, 1, 'message', None, None)
+    with correlation('OOLU1234567'):
+        assert CorrelationFilter().filter(record)
+    assert record.container == 'OOLU1234567'
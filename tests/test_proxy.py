@@ -0,0 +1,15 @@
+from solutions.support.driver.clock import VirtualClock, use_clock
+from solutions.support.driver.proxy import ProxyPool
+
+
+def test_cooldown_follows_the_clock():
+    with use_clock(VirtualClock(start=1_000_000.0)) as clock:
+        pool = ProxyPool(['http://10.0.0.1:8080', 'http://10.0.0.2:8080'], max_consecutive_blocks=3, cooldown=600)
+        proxy = pool.acquire()
+        for _ in range(3):
+            pool.record(proxy, blocked=True)
+        assert not pool.healthy(proxy)
+        assert pool.acquire() is not proxy
+
+        clock.advance(600)
+        assert pool.healthy(proxy)
@@ -0,0 +1,41 @@
+from solutions.records import Activity, ContainerResult, ContainerSummary, DetentionAndDemurrage, Routing
+from solutions.scheduler import Scheduler
+from solutions.support.driver.clock import VirtualClock
+
+
+def test_failure_backoff_on_a_virtual_clock():
+    clock = VirtualClock(start=1_000_000.0)
+    scheduler = Scheduler([{'container_number': 'OOLU1234567'}], backoff=60, max_backoff=200, clock=clock.time)
+
+    for delay in (60, 120, 200, 200):
+        item = scheduler.pop()
+        assert item['container_number'] == 'OOLU1234567'
+        scheduler.fail(item)
+        assert scheduler.pop() is None
+        assert scheduler.next_ready_in() == delay
+        clock.sleep(delay - 1)
+        assert scheduler.pop() is None
+        assert scheduler.next_ready_in() == 1
+        clock.advance(1)
+    assert scheduler.pop()['failures'] == 4
+
+
+def _result(latest_event):
+    return ContainerResult(
+        containers=ContainerSummary.from_cells(['OOLU1234567', '', '', '', '', latest_event, '', '', '']),
+        routing=Routing.from_cells([''] * 10),
+        detention_and_demurrage=DetentionAndDemurrage.from_cells(['OOLU1234567'] + [''] * 10),
+        equipment_activities=[Activity.from_cells([latest_event, '', '', '', '', ''])],
+    )
+
+
+def test_rescrape_on_a_virtual_clock():
+    clock = VirtualClock(start=1_000_000.0)
+    scheduler = Scheduler([{'container_number': 'OOLU1234567'}], rescrape_interval=3600, clock=clock.time)
+    item = scheduler.pop()
+    scheduler.observe(item, _result('Discharged'))
+    assert scheduler.reschedule(item)
+    assert item['last_changed'] == clock.time()
+    assert scheduler.next_ready_in() == 3600
+    clock.advance(3600)
+    assert scheduler.pop() is item
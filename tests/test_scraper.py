@@ -0,0 +1,98 @@
+import pytest
+
+pytest.importorskip('selenium')
+pytest.importorskip('PIL')
+pytest.importorskip('bs4')
+
+from solutions.parser import NoRecordError  # noqa: E402
+from solutions.scraper import PageLoadError, Scraper  # noqa: E402
+from solutions.support.driver.clock import VirtualClock, use_clock  # noqa: E402
+from solutions.tabs import TabTask  # noqa: E402
+
+
+class FakeSite:
+    """ Answers "no record" to every search that includes an unknown container number """
+
+    def __init__(self, unknown):
+        self.unknown = set(unknown)
+        self.searches = []
+
+    def search_and_solve(self, container_numbers):
+        container_numbers = [container_numbers] if isinstance(container_numbers, str) else container_numbers
+        self.searches.append(list(container_numbers))
+        if self.unknown & set(container_numbers):
+            raise NoRecordError("No record found.")
+
+
+def scraper_for(site):
+    # No browser: only the search is faked, batch splitting runs as is
+    scraper = object.__new__(Scraper)
+    scraper.search_and_solve = site.search_and_solve
+    scraper.select_container = lambda container_number: None
+    scraper.capture = lambda container_number: container_number
+    scraper.write_result = lambda container_number, future, check=False: {'container_number': future}
+    return scraper
+
+
+def test_no_record_in_batch_only_fails_the_unknown_container():
+    site = FakeSite(unknown=['MSCU1234566'])
+    batch = [{'container_number': number} for number in
+             ('OOLU1234561', 'MSCU1234566', 'OOLU7654321', 'TGHU1111110')]
+    results = scraper_for(site).scrape_batch(batch)
+
+    assert isinstance(results['MSCU1234566'], NoRecordError)
+    for number in ('OOLU1234561', 'OOLU7654321', 'TGHU1111110'):
+        assert results[number] == {'container_number': number}
+    # The unknown container was searched on its own before it was marked as having no record
+    assert ['MSCU1234566'] in site.searches
+
+
+class SlowForm:
+    """ Browser tab whose cargo selector only shows up after `loads` looks at the form """
+
+    def __init__(self, loads):
+        self.loads = loads
+        self.submitted = []
+        self.window_handles = ['tab']
+        self.switch_to = self
+
+    def window(self, handle):
+        pass
+
+    def submit_search_form(self, container_number):
+        self.loads -= 1
+        if self.loads > 0:
+            raise AttributeError("'NoneType' object has no attribute 'tag_name'")
+        self.submitted.append(container_number)
+
+
+def tab_scraper_for(tab):
+    scraper = object.__new__(Scraper)
+    scraper.driver = tab
+    scraper.find_element = lambda by, value: object()
+    scraper.submit_search_form = tab.submit_search_form
+    return scraper
+
+
+def test_tab_waits_for_the_form_to_load():
+    with use_clock(VirtualClock(start=1_000_000.0)) as clock:
+        tab = SlowForm(loads=3)
+        scraper = tab_scraper_for(tab)
+        task = TabTask({'container_number': 'OOLU1234567'}, 'tab')
+        for _ in range(2):
+            scraper.advance_tab(task, timeout=60)
+            assert task.state == TabTask.LOADING
+            clock.advance(1)
+        scraper.advance_tab(task, timeout=60)
+        assert task.state == TabTask.SEARCHING
+        assert tab.submitted == ['OOLU1234567']
+
+
+def test_tab_form_not_loaded_in_time():
+    with use_clock(VirtualClock(start=1_000_000.0)) as clock:
+        scraper = tab_scraper_for(SlowForm(loads=100))
+        task = TabTask({'container_number': 'OOLU1234567'}, 'tab')
+        scraper.advance_tab(task, timeout=60)
+        clock.advance(61)
+        with pytest.raises(PageLoadError):
+            scraper.advance_tab(task, timeout=60)
@@ -0,0 +1,33 @@
+from solutions.telemetry import CaptchaTelemetry
+
+
+def record(telemetry, frames, outcome):
+    """ :param frames: (offset, score) of the frames of one attempt, the last one is where the slider stopped """
+    attempt = telemetry.start(threshold=0.9)
+    for offset, score in frames:
+        attempt.frame(f"{attempt.attempt_id}-{offset}".encode(), offset, score, score, score > 0.9)
+    attempt.finish(outcome, len(frames), frames[-1][0])
+
+
+def test_suggest_threshold_can_lower_the_threshold(tmp_path):
+    telemetry = CaptchaTelemetry(tmp_path / 'captcha.sqlite')
+    # The piece is in place from a score of 0.7 on, frames between 0.7 and 0.9 were rejected needlessly
+    for _ in range(10):
+        record(telemetry, [(40, 0.1), (80, 0.3), (120, 0.7), (121, 0.95)], 'solved')
+    threshold = telemetry.suggest_threshold()
+    assert 0.3 <= threshold < 0.7
+
+
+def test_suggest_threshold_can_raise_the_threshold(tmp_path):
+    telemetry = CaptchaTelemetry(tmp_path / 'captcha.sqlite')
+    # Pieces accepted at 0.92 fail validation, the ones at 0.97 pass
+    for _ in range(10):
+        record(telemetry, [(40, 0.1), (90, 0.5), (100, 0.92)], 'failed')
+        record(telemetry, [(40, 0.1), (110, 0.97)], 'solved')
+    assert 0.92 <= telemetry.suggest_threshold() < 0.97
+
+
+def test_suggest_threshold_needs_data(tmp_path):
+    telemetry = CaptchaTelemetry(tmp_path / 'captcha.sqlite')
+    record(telemetry, [(40, 0.1), (120, 0.95)], 'solved')
+    assert telemetry.suggest_threshold() is None
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from solutions.results import ResultStore
+from solutions.tracking import TrackingService
+
+
+class SlowQueue:
+    """ WorkQueue stand-in whose requests wait until released, like a write behind a busy queue file """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.requests = []
+
+    def request(self, container_number):
+        self.requests.append(container_number)
+        self.release.wait(10)
+
+    def status(self, container_number):
+        return 'INITIAL'
+
+
+def test_fresh_result_does_not_wait_for_a_queue_request(tmp_path):
+    results = ResultStore(tmp_path / 'results.sqlite')
+    results.add('MSCU1234566', {'containers': {'container_number': 'MSCU1234566'}})
+    work_queue = SlowQueue()
+    service = TrackingService(work_queue, results, poll_interval=0.05)
+    try:
+        waiting = threading.Thread(target=service.lookup, args=('OOLU1234567',))
+        waiting.start()
+        while not work_queue.requests:
+            time.sleep(0.01)
+
+        start = time.perf_counter()
+        answer, future = service.lookup('MSCU1234566')
+        assert time.perf_counter() - start < 1
+        assert answer['status'] == 'OK' and future is None
+    finally:
+        work_queue.release.set()
+        waiting.join()
+        service.close()
+
+
+def test_duplicate_lookups_share_one_request(tmp_path):
+    work_queue = SlowQueue()
+    work_queue.release.set()
+    service = TrackingService(work_queue, ResultStore(tmp_path / 'results.sqlite'), poll_interval=0.05)
+    try:
+        threads = [threading.Thread(target=service.lookup, args=('OOLU1234567',)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert work_queue.requests == ['OOLU1234567']
+    finally:
+        service.close()
@@ -0,0 +1,49 @@
+from solutions.support.driver.clock import VirtualClock, use_clock
+from solutions.work_queue import WorkQueue
+
+
+def test_failure_backoff_follows_the_clock(tmp_path):
+    with use_clock(VirtualClock(start=1_000_000.0)) as clock:
+        work_queue = WorkQueue(tmp_path / 'queue.sqlite', backoff=60, lease=300)
+        work_queue.put_many([{'container_number': 'OOLU1234567'}])
+        [item] = work_queue.claim()
+        work_queue.release(item['container_number'], failed=True)
+
+        assert work_queue.claim() == []
+        clock.sleep(59)
+        assert work_queue.claim() == []
+        clock.sleep(1)
+        assert [item['container_number'] for item in work_queue.claim()] == ['OOLU1234567']
+
+
+def test_expired_lease_follows_the_clock(tmp_path):
+    with use_clock(VirtualClock(start=1_000_000.0)) as clock:
+        first = WorkQueue(tmp_path / 'queue.sqlite', worker_id='first', lease=300)
+        second = WorkQueue(tmp_path / 'queue.sqlite', worker_id='second', lease=300)
+        first.put_many([{'container_number': 'OOLU1234567'}])
+        assert len(first.claim()) == 1
+        assert second.claim() == []
+        clock.advance(301)
+        assert len(second.claim()) == 1
+        assert not first.complete('OOLU1234567')
+        assert second.complete('OOLU1234567')
+        assert second.status('OOLU1234567') == 'DONE'
+
+
+def test_no_record_is_claimable_again_at_its_retry_time(tmp_path):
+    with use_clock(VirtualClock(start=1_000_000.0)) as clock:
+        work_queue = WorkQueue(tmp_path / 'queue.sqlite')
+        work_queue.put_many([{'container_number': 'OOLU1234567'}, {'container_number': 'MSCU1234566'}])
+        work_queue.claim(limit=2)
+        work_queue.complete('OOLU1234567', 'NO_RECORD', retry_at=clock.time() + 3600)
+        work_queue.complete('MSCU1234566', 'NO_RECORD')
+
+        assert work_queue.pending() == 0
+        assert work_queue.status('OOLU1234567') == 'NO_RECORD'
+        clock.advance(3599)
+        assert work_queue.claim() == []
+        clock.advance(1)
+        assert [item['container_number'] for item in work_queue.claim()] == ['OOLU1234567']
+        work_queue.complete('OOLU1234567')
+        clock.advance(10 * 86400)
+        assert work_queue.claim() == []